@@ -0,0 +1,70 @@
+"""
+Benchmark: audit overhead of require_verification per wrapped call.
+
+Compares the default decorator, lean mode, and lean mode with the buffered
+action_log writer, reporting wall time and pool checkouts per call.
+
+Run: python benchmarks/bench_require_verification.py [calls]
+"""
+
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from helpers import db_helper
+from helpers.db_helper import (
+    init_database,
+    create_workspace,
+    get_pool,
+    close_pool,
+    enable_buffered_action_log,
+    disable_buffered_action_log,
+)
+from helpers.reliability import require_verification
+
+
+def _noop(workspace_id: int) -> int:
+    return workspace_id
+
+
+def _run(label: str, wrapped, calls: int, workspace_id: int) -> None:
+    pool = get_pool()
+    wrapped(workspace_id)  # Warm the pool
+    before = pool.stats()["checkouts"]
+    start = time.perf_counter()
+    for _ in range(calls):
+        wrapped(workspace_id)
+    elapsed = time.perf_counter() - start
+    checkouts = pool.stats()["checkouts"] - before
+    print(
+        f"{label:<24} {elapsed / calls * 1e6:>9.1f} us/call "
+        f"{checkouts / calls:>6.2f} checkouts/call"
+    )
+
+
+def main(calls: int = 2000) -> None:
+    # The default path logs a verification warning per call
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        init_database(db_path)
+        db_helper.DB_PATH = db_path
+        workspace_id = create_workspace("bench")
+        
+        _run("default", require_verification(_noop), calls, workspace_id)
+        _run("lean", require_verification(lean=True)(_noop), calls, workspace_id)
+        
+        enable_buffered_action_log()
+        _run("lean + buffered writer", require_verification(lean=True)(_noop),
+             calls, workspace_id)
+        disable_buffered_action_log()
+        
+        close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -14,26 +14,45 @@ from .db_helper import (
     get_template,
     list_templates,
     log_action,
+    update_action_status,
+    enable_buffered_action_log,
+    disable_buffered_action_log,
+    flush_action_log,
     get_context,
     set_context,
     get_rule_documents,
+    iter_rule_documents,
+    transaction,
 )
 from .utils import generate_workspace, get_client
-from .rule_loader import load_rules_for_context, get_rule_by_file
+from .rule_loader import load_rules_for_context, get_rule_by_file, get_rule_bundle
 from .agent_brain import (
     store_knowledge,
+    store_knowledge_many,
     recall_knowledge,
+    iter_knowledge,
+    flush_knowledge_usage,
+    search_knowledge,
     record_decision,
+    record_decisions_many,
     update_decision_outcome,
     record_pattern,
+    record_patterns_many,
+    update_pattern_success,
+    update_pattern_success_many,
     recall_patterns,
+    iter_patterns,
     set_agent_state,
+    set_agent_state_many,
     get_agent_state,
     get_agent_intelligence,
+    rebuild_intelligence_counters,
 )
 
 # Reliability and utility modules (consolidated)
 from . import reliability
+from . import statements
+from . import action_archive
 from . import utils
 
 __all__ = [
@@ -51,27 +70,47 @@ __all__ = [
     "get_template",
     "list_templates",
     "log_action",
+    "update_action_status",
+    "enable_buffered_action_log",
+    "disable_buffered_action_log",
+    "flush_action_log",
     "get_context",
     "set_context",
     "get_rule_documents",
+    "iter_rule_documents",
+    "transaction",
     # Workspace generation and integration clients (from utils)
     "generate_workspace",
     "get_client",
     # Rule loading (from rule_loader)
     "load_rules_for_context",
     "get_rule_by_file",
+    "get_rule_bundle",
     # Reliability modules (consolidated)
     "reliability",
+    "statements",
+    "action_archive",
     "utils",
     # Agent brain
     "agent_brain",
     "store_knowledge",
+    "store_knowledge_many",
     "recall_knowledge",
+    "iter_knowledge",
+    "flush_knowledge_usage",
+    "search_knowledge",
     "record_decision",
+    "record_decisions_many",
     "update_decision_outcome",
     "record_pattern",
+    "record_patterns_many",
+    "update_pattern_success",
+    "update_pattern_success_many",
     "recall_patterns",
+    "iter_patterns",
     "set_agent_state",
+    "set_agent_state_many",
     "get_agent_state",
     "get_agent_intelligence",
+    "rebuild_intelligence_counters",
 ]
@@ -0,0 +1,394 @@
+"""
+Month-partitioned archive for action_log.
+Recent actions stay in the main database's action_log table; whole months
+of finished actions are moved into one SQLite file per month
+(<db>_archive/action_log_YYYY_MM.db). Queries attach only the months their
+timestamp range touches, newest first and no more than SQLite's attach
+limit at a time, and retention is deleting (or moving) files instead of a
+multi-million-row DELETE.
+Run: python helpers/action_archive.py [list|archive [keep_months]|drop <YYYY-MM>]
+"""
+
+import os
+import re
+import sys
+import sqlite3
+import logging
+from pathlib import Path
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Any, Iterator
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from helpers import db_helper
+
+logger = logging.getLogger(__name__)
+
+# Only actions that can no longer change are archived
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+_ARCHIVE_RE = re.compile(r"^action_log_(\d{4})_(\d{2})\.db$")
+
+_ARCHIVE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS action_log (
+        id INTEGER PRIMARY KEY,
+        agent_session_id INTEGER,
+        project_id INTEGER,
+        workspace_id INTEGER,
+        timestamp TIMESTAMP,
+        action_type TEXT NOT NULL,
+        target TEXT,
+        description TEXT,
+        status TEXT,
+        rollback_info TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_action_log_timestamp ON action_log(timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_action_log_workspace ON action_log(workspace_id, timestamp)",
+)
+
+_COLUMNS = ("id, agent_session_id, project_id, workspace_id, timestamp, action_type, "
+            "target, description, status, rollback_info")
+
+
+def _db_path(db_path: Optional[Path]) -> Path:
+    return Path(db_path) if db_path is not None else db_helper.DB_PATH
+
+
+def archive_dir(db_path: Optional[Path] = None) -> Path:
+    """Directory holding a database's monthly archives (ACTION_LOG_ARCHIVE_DIR overrides)."""
+    override = os.getenv("ACTION_LOG_ARCHIVE_DIR")
+    if override:
+        return Path(override)
+    db_path = _db_path(db_path)
+    return db_path.parent / f"{db_path.stem}_archive"
+
+
+def _month(value: str) -> str:
+    """Validate and normalise a 'YYYY-MM' month."""
+    try:
+        return datetime.strptime(value[:7], "%Y-%m").strftime("%Y-%m")
+    except ValueError:
+        raise ValueError(f"Expected a YYYY-MM month, got {value!r}")
+
+
+def _next_month(month: str) -> str:
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+
+
+def _add_months(month: str, delta: int) -> str:
+    index = int(month[:4]) * 12 + int(month[5:7]) - 1 + delta
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def archive_path(month: str, db_path: Optional[Path] = None) -> Path:
+    """File that holds one month of archived actions."""
+    month = _month(month)
+    return archive_dir(db_path) / f"action_log_{month[:4]}_{month[5:]}.db"
+
+
+def list_archives(db_path: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """Archived months, oldest first.
+    
+    Returns:
+        list: {month, path, size_bytes} per archive file
+    """
+    directory = archive_dir(db_path)
+    if not directory.is_dir():
+        return []
+    archives = []
+    for path in directory.iterdir():
+        match = _ARCHIVE_RE.match(path.name)
+        if match:
+            archives.append({
+                'month': f"{match.group(1)}-{match.group(2)}",
+                'path': path,
+                'size_bytes': path.stat().st_size,
+            })
+    return sorted(archives, key=lambda a: a['month'])
+
+
+def _uri(path: Path, mode: Optional[str] = None) -> str:
+    """file: URI for a database path (as_uri() percent-encodes '?', '#' and '%')."""
+    uri = Path(path).resolve().as_uri()
+    return f"{uri}?mode={mode}" if mode else uri
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    # uri=True also makes SQLite parse the file: URIs given to ATTACH, on
+    # builds compiled without SQLITE_USE_URI
+    conn = sqlite3.connect(_uri(db_path), timeout=30.0, isolation_level=None, uri=True)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")  # checkpoints cascade like a normal delete
+    conn.execute("PRAGMA busy_timeout = 30000")
+    return conn
+
+
+def archive_action_log(before_month: Optional[str] = None, keep_months: int = 2,
+                       batch_size: int = 5000, db_path: Optional[Path] = None) -> Dict[str, int]:
+    """Move finished actions of whole past months into per-month archive files.
+    
+    Each batch is first committed to the archive file, then deleted from
+    action_log in its own short transaction, so a crash can at worst leave a
+    batch in both places (the next run finishes it) and never loses rows.
+    Checkpoints of archived actions are removed by the ON DELETE CASCADE, as
+    with any other delete. Pending and in-progress actions are never moved.
+    
+    Args:
+        before_month: Archive months strictly before this 'YYYY-MM'
+        keep_months: When before_month is None, months (including the
+                     current one) to keep in action_log
+        batch_size: Rows moved per transaction
+        db_path: Optional database path
+    
+    Returns:
+        dict: Rows archived per month ('YYYY-MM' -> count)
+    """
+    if before_month is None:
+        current = datetime.now(timezone.utc).strftime("%Y-%m")
+        before_month = _add_months(current, -(max(keep_months, 1) - 1))
+    before_month = _month(before_month)
+    db_path = _db_path(db_path)
+    db_helper.flush_action_log()
+    
+    statuses = ", ".join("?" * len(FINISHED_STATUSES))
+    conn = _connect(db_path)
+    moved: Dict[str, int] = {}
+    try:
+        months = [row[0] for row in conn.execute(
+            f"""
+            SELECT DISTINCT substr(timestamp, 1, 7) FROM action_log
+            WHERE timestamp < ? AND status IN ({statuses})
+            """,
+            (f"{before_month}-01",) + FINISHED_STATUSES
+        )]
+        for month in sorted(m for m in months if m):
+            path = archive_path(month, db_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            conn.execute("ATTACH DATABASE ? AS archive", (_uri(path),))
+            try:
+                for statement in _ARCHIVE_SCHEMA:
+                    conn.execute(statement.replace("EXISTS ", "EXISTS archive.", 1))
+                moved[month] = _move_month(conn, month, batch_size, statuses)
+            finally:
+                conn.execute("DETACH DATABASE archive")
+            logger.info(f"Archived {moved[month]} actions from {month} to {path}")
+    finally:
+        conn.close()
+    return moved
+
+
+def _move_month(conn: sqlite3.Connection, month: str, batch_size: int, statuses: str) -> int:
+    start, end = f"{month}-01", f"{_next_month(month)}-01"
+    moved = 0
+    last_id = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                f"""
+                SELECT MAX(id) FROM (
+                    SELECT id FROM main.action_log
+                    WHERE id > ? AND timestamp >= ? AND timestamp < ? AND status IN ({statuses})
+                    ORDER BY id LIMIT ?
+                )
+                """,
+                (last_id, start, end) + FINISHED_STATUSES + (batch_size,)
+            ).fetchone()
+            if row[0] is not None:
+                conn.execute(
+                    f"""
+                    INSERT OR IGNORE INTO archive.action_log ({_COLUMNS})
+                    SELECT {_COLUMNS} FROM main.action_log
+                    WHERE id > ? AND id <= ? AND timestamp >= ? AND timestamp < ? AND status IN ({statuses})
+                    """,
+                    (last_id, row[0], start, end) + FINISHED_STATUSES
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if row[0] is None:
+            return moved
+        
+        # Only rows now safely committed to the archive are deleted
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(
+                """
+                DELETE FROM main.action_log WHERE id IN (
+                    SELECT id FROM archive.action_log WHERE id > ? AND id <= ?
+                )
+                """,
+                (last_id, row[0])
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        moved += cursor.rowcount
+        last_id = row[0]
+
+
+def drop_action_log_archives(before_month: str, db_path: Optional[Path] = None) -> List[str]:
+    """Delete archive files for months strictly before ``before_month``.
+    
+    Retention is one unlink per month, however many rows the month holds.
+    
+    Returns:
+        list: Months whose archives were removed
+    """
+    before_month = _month(before_month)
+    dropped = []
+    for archive in list_archives(db_path):
+        if archive['month'] < before_month:
+            for path in (archive['path'], Path(f"{archive['path']}-journal"),
+                         Path(f"{archive['path']}-wal"), Path(f"{archive['path']}-shm")):
+                if path.exists():
+                    path.unlink()
+            dropped.append(archive['month'])
+    if dropped:
+        logger.info(f"Dropped action_log archives: {', '.join(dropped)}")
+    return dropped
+
+
+def _archives_in_range(start: Optional[str], end: Optional[str],
+                       db_path: Path) -> List[Dict[str, Any]]:
+    """Archives whose month overlaps [start, end), oldest first."""
+    return [
+        a for a in list_archives(db_path)
+        if (start is None or f"{_next_month(a['month'])}-01" > start)
+        and (end is None or f"{a['month']}-01" < end)
+    ]
+
+
+def _attach(conn: sqlite3.Connection, archives: List[Dict[str, Any]]) -> List[str]:
+    """Attach archives read-only as a0, a1, ...; returns the schema names."""
+    schemas = []
+    for i, archive in enumerate(archives):
+        conn.execute(f"ATTACH DATABASE ? AS a{i}", (_uri(archive['path'], mode="ro"),))
+        schemas.append(f"a{i}")
+    return schemas
+
+
+@contextmanager
+def action_log_view(start: Optional[str] = None, end: Optional[str] = None,
+                    db_path: Optional[Path] = None) -> Iterator[sqlite3.Connection]:
+    """Connection with a TEMP VIEW ``action_log_all`` over live and archived actions.
+    
+    Only archives whose month overlaps [start, end) are attached, so the
+    view's UNION ALL never touches months outside the range. For ranges
+    that may span more months than SQLite can attach, use query_action_log().
+    
+    Args:
+        start: Inclusive lower timestamp bound ('YYYY-MM-DD[ HH:MM:SS]'), None for unbounded
+        end: Exclusive upper timestamp bound, None for unbounded
+        db_path: Optional database path
+    
+    Yields:
+        sqlite3.Connection: Read connection (closed on exit)
+    
+    Raises:
+        ValueError: If the range spans more archives than SQLite can attach
+    """
+    db_path = _db_path(db_path)
+    archives = _archives_in_range(start, end, db_path)
+    conn = _connect(db_path)
+    try:
+        limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        if len(archives) > limit:
+            raise ValueError(
+                f"Range spans {len(archives)} archived months; at most {limit} can be queried at once"
+            )
+        schemas = ["main"] + _attach(conn, archives)
+        branches = " UNION ALL ".join(f"SELECT {_COLUMNS} FROM {schema}.action_log" for schema in schemas)
+        conn.execute(f"CREATE TEMP VIEW action_log_all AS {branches}")
+        yield conn
+    finally:
+        conn.close()
+
+
+def query_action_log(start: Optional[str] = None, end: Optional[str] = None,
+                     workspace_id: Optional[int] = None, action_type: Optional[str] = None,
+                     limit: Optional[int] = 100, db_path: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """Query live and archived actions, newest first.
+    
+    Archives are read newest month first, as many at a time as SQLite can
+    attach, and once ``limit`` rows are collected older months are skipped,
+    so any number of archived months can be queried.
+    
+    Args:
+        start: Inclusive lower timestamp bound, None for unbounded
+        end: Exclusive upper timestamp bound, None for unbounded
+        workspace_id: Optional workspace filter
+        action_type: Optional action type filter
+        limit: Maximum rows (None for all)
+        db_path: Optional database path
+    
+    Returns:
+        list: Action rows as dicts
+    """
+    where, params = [], []
+    for clause, value in (("timestamp >= ?", start), ("timestamp < ?", end),
+                          ("workspace_id = ?", workspace_id), ("action_type = ?", action_type)):
+        if value is not None:
+            where.append(clause)
+            params.append(value)
+    where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+    order_sql = " ORDER BY timestamp DESC, id DESC"
+    limit_params = []
+    if limit is not None:
+        order_sql += " LIMIT ?"
+        limit_params.append(limit)
+    
+    db_path = _db_path(db_path)
+    archives = _archives_in_range(start, end, db_path)[::-1]
+    conn = _connect(db_path)
+    try:
+        group_size = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        rows = [dict(row) for row in conn.execute(
+            f"SELECT {_COLUMNS} FROM main.action_log{where_sql}{order_sql}", params + limit_params
+        )]
+        for i in range(0, len(archives), group_size):
+            group = archives[i:i + group_size]
+            # An archive only holds its own month, so once the limit-th row is
+            # newer than the group's newest month no older row can displace it
+            if (limit is not None and 0 < limit <= len(rows)
+                    and (rows[limit - 1]['timestamp'] or "") >= f"{_next_month(group[0]['month'])}-01"):
+                break
+            schemas = _attach(conn, group)
+            branches = " UNION ALL ".join(
+                f"SELECT {_COLUMNS} FROM {schema}.action_log{where_sql}" for schema in schemas
+            )
+            rows.extend(dict(row) for row in conn.execute(
+                f"SELECT * FROM ({branches}){order_sql}", params * len(schemas) + limit_params
+            ))
+            for schema in schemas:
+                conn.execute(f"DETACH DATABASE {schema}")
+            rows.sort(key=lambda row: (row['timestamp'] or "", row['id']), reverse=True)
+            if limit is not None:
+                del rows[limit:]
+        return rows
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "list":
+        for archive in list_archives():
+            print(f"{archive['month']}  {archive['size_bytes'] / (1024 * 1024):8.2f} MB  {archive['path']}")
+    elif command == "archive":
+        keep = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+        moved = archive_action_log(keep_months=keep)
+        print(f"Archived {sum(moved.values())} actions from {len(moved)} months")
+    elif command == "drop" and len(sys.argv) > 2:
+        dropped = drop_action_log_archives(sys.argv[2])
+        print(f"Dropped {len(dropped)} archived months: {', '.join(dropped) or 'none'}")
+    else:
+        print("Usage: python action_archive.py [list|archive [keep_months]|drop <YYYY-MM>]")
@@ -3,13 +3,95 @@ Agent Brain - Database-backed intelligence and memory system.
 The database serves as the agent's persistent brain, storing knowledge, decisions, and learning.
 """
 
+import re
+import time
+import atexit
+import sqlite3
 import logging
-from typing import Optional, List, Dict, Any
+import threading
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Union, Sequence
 from datetime import datetime, timedelta
-from helpers.db_helper import get_connection
+from helpers.db_helper import (
+    get_connection, current_transaction, _db_key, _iter_keyset, ITER_BATCH_SIZE,
+)
+from helpers.statements import statement
+from helpers.db_migrations import BACKFILL_INTELLIGENCE_COUNTERS
+from helpers.vector_index import (
+    decision_text, search_decisions, store_decision_vector, store_decision_vectors,
+)
 
 logger = logging.getLogger(__name__)
 
+# A batch row: dict keyed by the single-row function's parameter names, or a
+# tuple in the same positional order (trailing optional values may be omitted)
+BatchRow = Union[Dict[str, Any], Sequence[Any]]
+
+
+# Batch inserts
+_INSERT_VERBS = {
+    'abort': 'INSERT',              # any constraint failure rolls back the whole batch
+    'ignore': 'INSERT OR IGNORE',   # rows violating NOT NULL/CHECK/UNIQUE are skipped
+}
+
+
+def _insert_verb(on_conflict: str) -> str:
+    try:
+        return _INSERT_VERBS[on_conflict]
+    except KeyError:
+        raise ValueError(f"on_conflict must be one of {sorted(_INSERT_VERBS)}, got {on_conflict!r}")
+
+
+def _batch_rows(rows: Iterable[BatchRow], prefix: tuple, columns: Sequence[str],
+                defaults: Dict[str, Any]) -> Iterable[tuple]:
+    """Normalise batch rows into parameter tuples (prefix + columns), lazily."""
+    for row in rows:
+        if isinstance(row, dict):
+            yield prefix + tuple(row.get(c, defaults.get(c)) for c in columns)
+        else:
+            row = tuple(row)
+            yield prefix + row + tuple(defaults.get(c) for c in columns[len(row):])
+
+
+def _last_id(conn, table: str) -> int:
+    """Highest id AUTOINCREMENT has handed out for table."""
+    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    max_id = conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0]
+    return max(seq[0] if seq else 0, max_id or 0)
+
+
+def _insert_many(conn, table: str, sql: str, params: Iterable[tuple],
+                 upsert: bool = False) -> List[range]:
+    """executemany an insert and return the ids of the new rows as ranges.
+    
+    The write lock is taken up front so no other writer can interleave ids.
+    Conflicting rows (ignored or upserted) still consume AUTOINCREMENT values,
+    so in that case the new ids are read back to find the gaps.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    before = _last_id(conn, table)
+    cursor = conn.executemany(sql, params)
+    after = _last_id(conn, table)
+    
+    if after == before:
+        return []
+    if not upsert and cursor.rowcount == after - before:
+        return [range(before + 1, after + 1)]
+    
+    ranges = []
+    start = prev = None
+    for (row_id,) in conn.execute(f"SELECT id FROM {table} WHERE id > ? ORDER BY id", (before,)):
+        if prev is not None and row_id == prev + 1:
+            prev = row_id
+            continue
+        if start is not None:
+            ranges.append(range(start, prev + 1))
+        start = prev = row_id
+    if start is not None:
+        ranges.append(range(start, prev + 1))
+    return ranges
+
 
 # Knowledge Management
 def store_knowledge(workspace_id: Optional[int], topic: str, fact: str, 
@@ -37,72 +119,325 @@ def store_knowledge(workspace_id: Optional[int], topic: str, fact: str,
         return cursor.lastrowid
 
 
+def store_knowledge_many(workspace_id: Optional[int], facts: Iterable[BatchRow],
+                         on_conflict: str = 'abort') -> List[range]:
+    """Store many facts with one executemany in a single transaction.
+    
+    Args:
+        workspace_id: Workspace ID
+        facts: Rows of (topic, fact, source, confidence), as dicts or tuples
+        on_conflict: 'abort' (fail the whole batch) or 'ignore' (skip invalid rows)
+        
+    Returns:
+        list: Ranges of the inserted knowledge IDs
+    """
+    sql = f"""
+        {_insert_verb(on_conflict)} INTO agent_knowledge (workspace_id, topic, fact, source, confidence)
+        VALUES (?, ?, ?, ?, ?)
+    """
+    rows = _batch_rows(facts, (workspace_id,), ('topic', 'fact', 'source', 'confidence'),
+                       {'confidence': 1.0})
+    
+    with get_connection() as conn:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        # Index the batch with one statement instead of the per-row trigger;
+        # the suspension is never visible outside this transaction
+        conn.execute("INSERT INTO fts_suspended (table_name) VALUES ('agent_knowledge')")
+        try:
+            ranges = _insert_many(conn, 'agent_knowledge', sql, rows)
+            if ranges:
+                conn.execute(
+                    """
+                    INSERT INTO agent_knowledge_fts (rowid, topic, fact, source)
+                    SELECT id, topic, fact, source FROM agent_knowledge WHERE id BETWEEN ? AND ?
+                    """,
+                    (ranges[0].start, ranges[-1].stop - 1)
+                )
+        finally:
+            conn.execute("DELETE FROM fts_suspended WHERE table_name = 'agent_knowledge'")
+        return ranges
+
+
+_KNOWLEDGE = statement('agent_brain.knowledge', """
+    SELECT * FROM agent_knowledge
+    WHERE workspace_id IS ? AND confidence >= ?
+    ORDER BY confidence DESC, usage_count DESC
+""")
+_KNOWLEDGE_BY_TOPIC = statement('agent_brain.knowledge_by_topic', """
+    SELECT * FROM agent_knowledge
+    WHERE workspace_id IS ? AND topic = ? AND confidence >= ?
+    ORDER BY confidence DESC, usage_count DESC
+""")
+
+
 def recall_knowledge(workspace_id: Optional[int], topic: Optional[str] = None,
-                    min_confidence: float = 0.5) -> List[Dict[str, Any]]:
+                    min_confidence: float = 0.5, live_usage: bool = False) -> List[Dict[str, Any]]:
     """Recall facts from the agent's knowledge base.
     
     Args:
         workspace_id: Workspace ID to filter by (None for global knowledge)
         topic: Optional topic to filter by
         min_confidence: Minimum confidence level
+        live_usage: Include usage not yet flushed to the database in
+                    usage_count (and therefore in the ranking)
         
     Returns:
         list: List of knowledge entries
     """
     with get_connection() as conn:
         if topic:
-            if workspace_id is not None:
-                cursor = conn.execute(
-                    """
-                    SELECT * FROM agent_knowledge
-                    WHERE workspace_id = ? AND topic = ? AND confidence >= ?
-                    ORDER BY confidence DESC, usage_count DESC
-                    """,
-                    (workspace_id, topic, min_confidence)
-                )
-            else:
-                cursor = conn.execute(
-                    """
-                    SELECT * FROM agent_knowledge
-                    WHERE workspace_id IS NULL AND topic = ? AND confidence >= ?
-                    ORDER BY confidence DESC, usage_count DESC
-                    """,
-                    (topic, min_confidence)
-                )
+            cursor = _KNOWLEDGE_BY_TOPIC.execute(conn, (workspace_id, topic, min_confidence))
         else:
-            if workspace_id is not None:
-                cursor = conn.execute(
-                    """
-                    SELECT * FROM agent_knowledge
-                    WHERE workspace_id = ? AND confidence >= ?
-                    ORDER BY confidence DESC, usage_count DESC
-                    """,
-                    (workspace_id, min_confidence)
-                )
-            else:
-                cursor = conn.execute(
-                    """
-                    SELECT * FROM agent_knowledge
-                    WHERE workspace_id IS NULL AND confidence >= ?
-                    ORDER BY confidence DESC, usage_count DESC
-                    """,
-                    (min_confidence,)
-                )
-        return [dict(row) for row in cursor.fetchall()]
+            cursor = _KNOWLEDGE.execute(conn, (workspace_id, min_confidence))
+        results = [dict(row) for row in cursor.fetchall()]
+    
+    if live_usage:
+        pending = _usage_accumulator.pending_counts()
+        if pending:
+            for fact in results:
+                fact['usage_count'] = (fact['usage_count'] or 0) + pending.get(fact['id'], 0)
+            results.sort(key=lambda f: (-f['confidence'], -f['usage_count']))
+    return results
 
 
-def update_knowledge_usage(knowledge_id: int) -> None:
-    """Update knowledge usage statistics."""
-    with get_connection() as conn:
-        conn.execute(
+def iter_knowledge(workspace_id: Optional[int], topic: Optional[str] = None,
+                   min_confidence: float = 0.5, columns: Optional[Sequence[str]] = None,
+                   after_id: Optional[int] = None, limit: Optional[int] = None,
+                   batch_size: int = ITER_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """Stream facts from the knowledge base in id order.
+    
+    Memory-bounded alternative to recall_knowledge() for large workspaces:
+    rows are fetched a page at a time and only the requested columns are
+    read. Pass the last seen id as ``after_id`` to resume.
+    
+    Args:
+        workspace_id: Workspace ID to filter by (None for global knowledge)
+        topic: Optional topic to filter by
+        min_confidence: Minimum confidence level
+        columns: Columns to return (None for all); ``id`` is always included
+        after_id: Only facts with id greater than this
+        limit: Maximum facts to yield
+        batch_size: Rows fetched per database round trip
+        
+    Yields:
+        dict: Knowledge entries
+    """
+    where = "workspace_id IS ? AND confidence >= ?"
+    params = (workspace_id, min_confidence)
+    if topic:
+        where += " AND topic = ?"
+        params += (topic,)
+    return _iter_keyset('agent_knowledge', where, params, columns, after_id, limit, batch_size)
+
+
+class KnowledgeUsageAccumulator:
+    """Coalesces knowledge usage increments in memory.
+    
+    Uses are counted per (database, knowledge_id) and written as one batched
+    UPDATE: flush_interval seconds after the first pending use, when
+    max_pending ids are pending, at the end of an enclosing transaction()
+    (sharing its commit), or at interpreter exit.
+    """
+    
+    def __init__(self, flush_interval: float = 5.0, max_pending: int = 1000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[tuple, List] = {}  # (db_key, id) -> [count, last_used]
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+    
+    def record(self, knowledge_id: int) -> None:
+        """Count one use of a fact."""
+        key = _db_key(None)
+        now = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())  # CURRENT_TIMESTAMP format
+        with self._lock:
+            entry = self._pending.get((key, knowledge_id))
+            if entry is None:
+                self._pending[(key, knowledge_id)] = [1, now]
+            else:
+                entry[0] += 1
+                entry[1] = now
+            full = len(self._pending) >= self.max_pending
+            self._arm_timer()
+        
+        scope = current_transaction()
+        if scope is not None:
+            scope.on_commit(self._flush_in_transaction)
+        elif full:
+            self.flush()
+    
+    def _arm_timer(self) -> None:
+        """Make sure a timed flush is scheduled (caller holds the lock)."""
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+    
+    def pending_counts(self, db_path: Optional[Path] = None) -> Dict[int, int]:
+        """Uses not yet written to the database, by knowledge_id."""
+        key = _db_key(db_path)
+        with self._lock:
+            return {kid: entry[0] for (db, kid), entry in self._pending.items() if db == key}
+    
+    def _take(self, key: str) -> List[tuple]:
+        with self._lock:
+            taken = [(kid, entry) for (db, kid), entry in self._pending.items() if db == key]
+            for kid, _ in taken:
+                del self._pending[(key, kid)]
+            if not self._pending and self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        return taken
+    
+    def _restore(self, key: str, taken: List[tuple]) -> None:
+        with self._lock:
+            for kid, (count, last_used) in taken:
+                entry = self._pending.setdefault((key, kid), [0, last_used])
+                entry[0] += count
+                entry[1] = max(entry[1], last_used)
+            self._arm_timer()
+    
+    def _write(self, conn, taken: List[tuple]) -> None:
+        conn.executemany(
             """
             UPDATE agent_knowledge
-            SET usage_count = usage_count + 1,
-                last_used = CURRENT_TIMESTAMP
+            SET usage_count = COALESCE(usage_count, 0) + ?,
+                last_used = max(COALESCE(last_used, ''), ?)
             WHERE id = ?
             """,
-            (knowledge_id,)
+            [(count, last_used, kid) for kid, (count, last_used) in taken]
         )
+    
+    def _flush_in_transaction(self, conn) -> None:
+        key = _db_key(None)
+        taken = self._take(key)
+        if taken:
+            # Counts taken here may include other threads' uses; put them back
+            # if the commit fails so they are written by a later flush
+            current_transaction().on_rollback(lambda: self._restore(key, taken))
+            self._write(conn, taken)
+    
+    def flush(self) -> int:
+        """Write all pending uses, one batched UPDATE per database.
+        
+        Returns:
+            int: Number of facts updated
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            keys = {db for db, _ in self._pending}
+        
+        flushed = 0
+        for key in keys:
+            taken = self._take(key)
+            if not taken:
+                continue
+            try:
+                with get_connection(Path(key)) as conn:
+                    self._write(conn, taken)
+            except sqlite3.Error as e:
+                logger.warning(f"Knowledge usage flush failed, will retry: {e}")
+                self._restore(key, taken)
+                continue
+            flushed += len(taken)
+        return flushed
+
+
+_usage_accumulator = KnowledgeUsageAccumulator()
+atexit.register(_usage_accumulator.flush)
+
+
+def update_knowledge_usage(knowledge_id: int) -> None:
+    """Update knowledge usage statistics.
+    
+    The increment is coalesced in memory and written in a batch (see
+    KnowledgeUsageAccumulator); call flush_knowledge_usage() to force it.
+    """
+    _usage_accumulator.record(knowledge_id)
+
+
+def flush_knowledge_usage() -> int:
+    """Write pending knowledge usage counts now.
+    
+    Returns:
+        int: Number of facts updated
+    """
+    return _usage_accumulator.flush()
+
+
+# Full-Text Search
+# Source name -> (FTS table, base table, title column, snippet column index, bm25 weights)
+_SEARCH_SOURCES = {
+    'knowledge': ('agent_knowledge_fts', 'agent_knowledge', 'topic', 1, (2.0, 1.0, 0.5)),
+    'memories': ('agent_memories_fts', 'agent_memories', 'title', 1, (2.0, 1.0, 0.5)),
+    'items': ('knowledge_items_fts', 'knowledge_items', 'title', 1, (2.0, 1.0, 0.5)),
+}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _fts_query(query: str) -> str:
+    """Turn free text into a safe FTS5 query (quoted terms joined by OR).
+    
+    bm25 ranking rewards rows that match more terms, so OR keeps recall high
+    without letting FTS5 syntax characters in user input raise errors.
+    """
+    return " OR ".join(f'"{token}"' for token in _TOKEN_RE.findall(query))
+
+
+def search_knowledge(query: str, workspace_id: Optional[int] = None, limit: int = 10,
+                     sources: Iterable[str] = ('knowledge', 'memories', 'items')) -> List[Dict[str, Any]]:
+    """Full-text search over knowledge, memories and knowledge items.
+    
+    Args:
+        query: Free-text query
+        workspace_id: Workspace ID to search (None for global entries)
+        limit: Maximum number of results
+        sources: Subset of 'knowledge', 'memories', 'items' to search
+        
+    Returns:
+        list: Results ordered by bm25 relevance (lower score = better), each with
+              'source', 'id', 'workspace_id', 'title', 'snippet' and 'score'
+    """
+    match = _fts_query(query)
+    if not match:
+        return []
+    
+    results = []
+    with get_connection() as conn:
+        for source in sources:
+            fts_table, base_table, title_col, snippet_col, weights = _SEARCH_SOURCES[source]
+            cursor = conn.execute(
+                f"""
+                SELECT b.id, b.workspace_id, b.{title_col} AS title,
+                       snippet({fts_table}, {snippet_col}, '[', ']', '...', 12) AS snippet,
+                       bm25({fts_table}, {', '.join(str(w) for w in weights)}) AS score
+                FROM {fts_table}
+                JOIN {base_table} b ON b.id = {fts_table}.rowid
+                WHERE {fts_table} MATCH ? AND b.workspace_id IS ?
+                ORDER BY score
+                LIMIT ?
+                """,
+                (match, workspace_id, limit)
+            )
+            results.extend({'source': source, **dict(row)} for row in cursor.fetchall())
+    
+    results.sort(key=lambda r: r['score'])
+    return results[:limit]
+
+
+def rebuild_search_index() -> None:
+    """Rebuild all FTS indexes from their base tables.
+    
+    Only needed for databases populated before the FTS tables existed;
+    triggers keep the indexes in sync afterwards.
+    """
+    with get_connection() as conn:
+        for fts_table, *_ in _SEARCH_SOURCES.values():
+            conn.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
 
 
 # Decision Recording
@@ -131,7 +466,49 @@ def record_decision(workspace_id: Optional[int], decision_type: str, decision: s
             """,
             (workspace_id, decision_type, input_context, reasoning, decision, learned_from)
         )
-        return cursor.lastrowid
+        decision_id = cursor.lastrowid
+        store_decision_vector(conn, decision_id, workspace_id, decision_type,
+                              decision_text(input_context, reasoning))
+        return decision_id
+
+
+def record_decisions_many(workspace_id: Optional[int], decisions: Iterable[BatchRow],
+                          on_conflict: str = 'abort') -> List[range]:
+    """Record many decisions (and their similarity vectors) in a single transaction.
+    
+    Args:
+        workspace_id: Workspace ID
+        decisions: Rows of (decision_type, decision, input_context, reasoning,
+                   learned_from), as dicts or tuples
+        on_conflict: 'abort' (fail the whole batch) or 'ignore' (skip invalid rows)
+        
+    Returns:
+        list: Ranges of the inserted decision IDs
+    """
+    with get_connection() as conn:
+        ranges = _insert_many(
+            conn, 'agent_decisions',
+            f"""
+            {_insert_verb(on_conflict)} INTO agent_decisions (workspace_id, decision_type, decision,
+                                       input_context, reasoning, learned_from)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            _batch_rows(decisions, (workspace_id,),
+                        ('decision_type', 'decision', 'input_context', 'reasoning', 'learned_from'),
+                        {})
+        )
+        if ranges:
+            rows = conn.execute(
+                """
+                SELECT id, workspace_id, decision_type, input_context, reasoning
+                FROM agent_decisions WHERE id BETWEEN ? AND ?
+                """,
+                (ranges[0].start, ranges[-1].stop - 1)
+            )
+            store_decision_vectors(conn, (
+                (row[0], row[1], row[2], decision_text(row[3], row[4])) for row in rows.fetchall()
+            ))
+        return ranges
 
 
 def update_decision_outcome(decision_id: int, outcome: str, success: bool) -> None:
@@ -153,10 +530,29 @@ def update_decision_outcome(decision_id: int, outcome: str, success: bool) -> No
         )
 
 
+_DECISIONS = statement('agent_brain.decisions', """
+    SELECT * FROM agent_decisions
+    WHERE workspace_id IS ?
+    ORDER BY success DESC, created_at DESC
+    LIMIT 10
+""")
+_DECISIONS_BY_TYPE = statement('agent_brain.decisions_by_type', """
+    SELECT * FROM agent_decisions
+    WHERE workspace_id IS ? AND decision_type = ?
+    ORDER BY success DESC, created_at DESC
+    LIMIT 10
+""")
+
+
 def recall_similar_decisions(workspace_id: Optional[int], decision_type: Optional[str] = None,
                              input_context: Optional[str] = None) -> List[Dict[str, Any]]:
     """Recall similar past decisions to learn from.
     
+    With input_context, decisions are ranked by cosine similarity of their
+    indexed input_context/reasoning (see helpers/vector_index.py) and each
+    result carries a 'similarity' score. Without it, the most recent
+    decisions are returned, successful ones first.
+    
     Args:
         workspace_id: Workspace ID (None for global decisions)
         decision_type: Optional type of decision (use 'any' for all types)
@@ -165,48 +561,28 @@ def recall_similar_decisions(workspace_id: Optional[int], decision_type: Optiona
     Returns:
         list: Similar past decisions
     """
-    with get_connection() as conn:
-        if decision_type and decision_type != 'any':
-            if workspace_id is not None:
+    if input_context:
+        type_filter = decision_type if decision_type and decision_type != 'any' else None
+        matches = search_decisions(input_context, workspace_id, k=10, decision_type=type_filter)
+        if matches:
+            ids = [decision_id for decision_id, _ in matches]
+            with get_connection() as conn:
                 cursor = conn.execute(
-                    """
-                    SELECT * FROM agent_decisions
-                    WHERE workspace_id = ? AND decision_type = ?
-                    ORDER BY success DESC, created_at DESC
-                    LIMIT 10
-                    """,
-                    (workspace_id, decision_type)
-                )
-            else:
-                cursor = conn.execute(
-                    """
-                    SELECT * FROM agent_decisions
-                    WHERE workspace_id IS NULL AND decision_type = ?
-                    ORDER BY success DESC, created_at DESC
-                    LIMIT 10
-                    """,
-                    (decision_type,)
+                    f"SELECT * FROM agent_decisions WHERE id IN ({', '.join('?' * len(ids))})",
+                    ids
                 )
+                rows = {row['id']: dict(row) for row in cursor.fetchall()}
+            return [
+                {**rows[decision_id], 'similarity': similarity}
+                for decision_id, similarity in matches
+                if decision_id in rows
+            ]
+    
+    with get_connection() as conn:
+        if decision_type and decision_type != 'any':
+            cursor = _DECISIONS_BY_TYPE.execute(conn, (workspace_id, decision_type))
         else:
-            if workspace_id is not None:
-                cursor = conn.execute(
-                    """
-                    SELECT * FROM agent_decisions
-                    WHERE workspace_id = ?
-                    ORDER BY success DESC, created_at DESC
-                    LIMIT 10
-                    """,
-                    (workspace_id,)
-                )
-            else:
-                cursor = conn.execute(
-                    """
-                    SELECT * FROM agent_decisions
-                    WHERE workspace_id IS NULL
-                    ORDER BY success DESC, created_at DESC
-                    LIMIT 10
-                    """,
-                )
+            cursor = _DECISIONS.execute(conn, (workspace_id,))
         return [dict(row) for row in cursor.fetchall()]
 
 
@@ -237,6 +613,46 @@ def record_pattern(workspace_id: Optional[int], pattern_name: str, pattern_type:
         return cursor.lastrowid
 
 
+def record_patterns_many(workspace_id: Optional[int], patterns: Iterable[BatchRow],
+                         on_conflict: str = 'abort') -> List[range]:
+    """Record many learned patterns with one executemany in a single transaction.
+    
+    Args:
+        workspace_id: Workspace ID
+        patterns: Rows of (pattern_name, pattern_type, trigger_conditions,
+                  action_taken), as dicts or tuples
+        on_conflict: 'abort' (fail the whole batch) or 'ignore' (skip invalid
+                     rows, e.g. an unknown pattern_type)
+        
+    Returns:
+        list: Ranges of the inserted pattern IDs
+    """
+    with get_connection() as conn:
+        return _insert_many(
+            conn, 'agent_patterns',
+            f"""
+            {_insert_verb(on_conflict)} INTO agent_patterns (workspace_id, pattern_name, pattern_type,
+                                       trigger_conditions, action_taken)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            _batch_rows(patterns, (workspace_id,),
+                        ('pattern_name', 'pattern_type', 'trigger_conditions', 'action_taken'), {})
+        )
+
+
+# Moving average over all outcomes, computed by SQLite so concurrent updates
+# never read a stale rate (clamped against float rounding for the CHECK)
+_PATTERN_SUCCESS_UPDATE = statement('agent_brain.pattern_success', """
+    UPDATE agent_patterns
+    SET success_rate = max(0.0, min(1.0,
+            (COALESCE(success_rate, 0.0) * COALESCE(usage_count, 0) + :successes)
+            / (COALESCE(usage_count, 0) + :uses))),
+        usage_count = COALESCE(usage_count, 0) + :uses,
+        last_used = CURRENT_TIMESTAMP
+    WHERE id = :pattern_id
+""")
+
+
 def update_pattern_success(pattern_id: int, success: bool) -> None:
     """Update pattern success rate based on outcome.
     
@@ -245,27 +661,51 @@ def update_pattern_success(pattern_id: int, success: bool) -> None:
         success: Whether using this pattern was successful
     """
     with get_connection() as conn:
-        # Get current stats
-        cursor = conn.execute(
-            "SELECT success_rate, usage_count FROM agent_patterns WHERE id = ?",
-            (pattern_id,)
+        _PATTERN_SUCCESS_UPDATE.execute(
+            conn,
+            {"pattern_id": pattern_id, "uses": 1, "successes": 1.0 if success else 0.0}
         )
-        row = cursor.fetchone()
-        if row:
-            current_rate = row['success_rate']
-            count = row['usage_count']
-            # Update success rate (moving average)
-            new_rate = ((current_rate * count) + (1.0 if success else 0.0)) / (count + 1)
-            conn.execute(
-                """
-                UPDATE agent_patterns
-                SET success_rate = ?,
-                    usage_count = usage_count + 1,
-                    last_used = CURRENT_TIMESTAMP
-                WHERE id = ?
-                """,
-                (new_rate, pattern_id)
-            )
+
+
+def update_pattern_success_many(outcomes: Iterable[tuple]) -> int:
+    """Apply many pattern outcomes in one transaction.
+    
+    Outcomes are aggregated per pattern first, so each pattern is updated once
+    no matter how many outcomes it has.
+    
+    Args:
+        outcomes: (pattern_id, success) pairs
+        
+    Returns:
+        int: Number of patterns updated
+    """
+    totals: Dict[int, List[float]] = {}
+    for pattern_id, success in outcomes:
+        total = totals.setdefault(pattern_id, [0, 0.0])
+        total[0] += 1
+        total[1] += 1.0 if success else 0.0
+    if not totals:
+        return 0
+    
+    with get_connection() as conn:
+        cursor = _PATTERN_SUCCESS_UPDATE.executemany(
+            conn,
+            [{"pattern_id": pattern_id, "uses": uses, "successes": successes}
+             for pattern_id, (uses, successes) in totals.items()]
+        )
+        return cursor.rowcount
+
+
+_PATTERNS = statement('agent_brain.patterns', """
+    SELECT * FROM agent_patterns
+    WHERE workspace_id IS ? AND success_rate >= ?
+    ORDER BY success_rate DESC, usage_count DESC
+""")
+_PATTERNS_BY_TYPE = statement('agent_brain.patterns_by_type', """
+    SELECT * FROM agent_patterns
+    WHERE workspace_id IS ? AND pattern_type = ? AND success_rate >= ?
+    ORDER BY success_rate DESC, usage_count DESC
+""")
 
 
 def recall_patterns(workspace_id: Optional[int], pattern_type: Optional[str] = None,
@@ -282,46 +722,38 @@ def recall_patterns(workspace_id: Optional[int], pattern_type: Optional[str] = N
     """
     with get_connection() as conn:
         if pattern_type:
-            if workspace_id is not None:
-                cursor = conn.execute(
-                    """
-                    SELECT * FROM agent_patterns
-                    WHERE workspace_id = ? AND pattern_type = ? AND success_rate >= ?
-                    ORDER BY success_rate DESC, usage_count DESC
-                    """,
-                    (workspace_id, pattern_type, min_success_rate)
-                )
-            else:
-                cursor = conn.execute(
-                    """
-                    SELECT * FROM agent_patterns
-                    WHERE workspace_id IS NULL AND pattern_type = ? AND success_rate >= ?
-                    ORDER BY success_rate DESC, usage_count DESC
-                    """,
-                    (pattern_type, min_success_rate)
-                )
+            cursor = _PATTERNS_BY_TYPE.execute(conn, (workspace_id, pattern_type, min_success_rate))
         else:
-            if workspace_id is not None:
-                cursor = conn.execute(
-                    """
-                    SELECT * FROM agent_patterns
-                    WHERE workspace_id = ? AND success_rate >= ?
-                    ORDER BY success_rate DESC, usage_count DESC
-                    """,
-                    (workspace_id, min_success_rate)
-                )
-            else:
-                cursor = conn.execute(
-                    """
-                    SELECT * FROM agent_patterns
-                    WHERE workspace_id IS NULL AND success_rate >= ?
-                    ORDER BY success_rate DESC, usage_count DESC
-                    """,
-                    (min_success_rate,)
-                )
+            cursor = _PATTERNS.execute(conn, (workspace_id, min_success_rate))
         return [dict(row) for row in cursor.fetchall()]
 
 
+def iter_patterns(workspace_id: Optional[int], pattern_type: Optional[str] = None,
+                  min_success_rate: float = 0.0, columns: Optional[Sequence[str]] = None,
+                  after_id: Optional[int] = None, limit: Optional[int] = None,
+                  batch_size: int = ITER_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """Stream learned patterns in id order (see iter_knowledge()).
+    
+    Args:
+        workspace_id: Workspace ID (None for global patterns)
+        pattern_type: Optional type filter
+        min_success_rate: Minimum success rate
+        columns: Columns to return (None for all); ``id`` is always included
+        after_id: Only patterns with id greater than this
+        limit: Maximum patterns to yield
+        batch_size: Rows fetched per database round trip
+        
+    Yields:
+        dict: Patterns
+    """
+    where = "workspace_id IS ? AND success_rate >= ?"
+    params = (workspace_id, min_success_rate)
+    if pattern_type:
+        where += " AND pattern_type = ?"
+        params += (pattern_type,)
+    return _iter_keyset('agent_patterns', where, params, columns, after_id, limit, batch_size)
+
+
 # Agent State Management
 def set_agent_state(workspace_id: Optional[int], state_key: str, state_value: str,
                    state_type: str = 'preference', expires_at: Optional[str] = None) -> None:
@@ -349,6 +781,64 @@ def set_agent_state(workspace_id: Optional[int], state_key: str, state_value: st
         )
 
 
+_STATE_CONFLICT_CLAUSES = {
+    'update': """
+        ON CONFLICT(workspace_id, state_key) DO UPDATE SET
+            state_value = excluded.state_value,
+            state_type = excluded.state_type,
+            expires_at = excluded.expires_at,
+            updated_at = CURRENT_TIMESTAMP
+    """,
+    'ignore': "ON CONFLICT(workspace_id, state_key) DO NOTHING",
+    'abort': "",
+}
+
+
+def set_agent_state_many(workspace_id: Optional[int], states: Iterable[BatchRow],
+                         on_conflict: str = 'update') -> List[range]:
+    """Set many agent state entries with one executemany in a single transaction.
+    
+    Args:
+        workspace_id: Workspace ID
+        states: Rows of (state_key, state_value, state_type, expires_at), as
+                dicts or tuples
+        on_conflict: For existing keys: 'update' (like set_agent_state),
+                     'ignore' (keep the existing value) or 'abort' (fail the batch)
+        
+    Returns:
+        list: Ranges of the IDs of newly created state entries (updated
+              entries keep their IDs)
+    """
+    if on_conflict not in _STATE_CONFLICT_CLAUSES:
+        raise ValueError(
+            f"on_conflict must be one of {sorted(_STATE_CONFLICT_CLAUSES)}, got {on_conflict!r}"
+        )
+    with get_connection() as conn:
+        return _insert_many(
+            conn, 'agent_state',
+            f"""
+            INSERT INTO agent_state (workspace_id, state_key, state_value, state_type, expires_at)
+            VALUES (?, ?, ?, ?, ?)
+            {_STATE_CONFLICT_CLAUSES[on_conflict]}
+            """,
+            _batch_rows(states, (workspace_id,), ('state_key', 'state_value', 'state_type', 'expires_at'),
+                        {'state_type': 'preference'}),
+            upsert=on_conflict != 'abort'
+        )
+
+
+_STATE_VALUE = statement('agent_brain.state_value', """
+    SELECT state_value FROM agent_state
+    WHERE workspace_id IS ? AND state_key = ?
+    AND (expires_at IS NULL OR expires_at > datetime('now'))
+""")
+_STATE_ALL = statement('agent_brain.state_all', """
+    SELECT state_key, state_value FROM agent_state
+    WHERE workspace_id IS ?
+    AND (expires_at IS NULL OR expires_at > datetime('now'))
+""")
+
+
 def get_agent_state(workspace_id: Optional[int], state_key: str) -> Optional[str]:
     """Get agent state.
     
@@ -360,24 +850,7 @@ def get_agent_state(workspace_id: Optional[int], state_key: str) -> Optional[str
         str: State value, or None if not found or expired
     """
     with get_connection() as conn:
-        if workspace_id is not None:
-            cursor = conn.execute(
-                """
-                SELECT state_value FROM agent_state
-                WHERE workspace_id = ? AND state_key = ?
-                AND (expires_at IS NULL OR expires_at > datetime('now'))
-                """,
-                (workspace_id, state_key)
-            )
-        else:
-            cursor = conn.execute(
-                """
-                SELECT state_value FROM agent_state
-                WHERE workspace_id IS NULL AND state_key = ?
-                AND (expires_at IS NULL OR expires_at > datetime('now'))
-                """,
-                (state_key,)
-            )
+        cursor = _STATE_VALUE.execute(conn, (workspace_id, state_key))
         row = cursor.fetchone()
         return row['state_value'] if row else None
 
@@ -392,23 +865,7 @@ def get_all_agent_state(workspace_id: Optional[int]) -> Dict[str, str]:
         dict: All state key-value pairs
     """
     with get_connection() as conn:
-        if workspace_id is not None:
-            cursor = conn.execute(
-                """
-                SELECT state_key, state_value FROM agent_state
-                WHERE workspace_id = ?
-                AND (expires_at IS NULL OR expires_at > datetime('now'))
-                """,
-                (workspace_id,)
-            )
-        else:
-            cursor = conn.execute(
-                """
-                SELECT state_key, state_value FROM agent_state
-                WHERE workspace_id IS NULL
-                AND (expires_at IS NULL OR expires_at > datetime('now'))
-                """
-            )
+        cursor = _STATE_ALL.execute(conn, (workspace_id,))
         return {row['state_key']: row['state_value'] for row in cursor.fetchall()}
 
 
@@ -451,20 +908,67 @@ def learn_from_decision(decision_id: int) -> None:
                 )
 
 
+_INTELLIGENCE_COUNTERS = statement('agent_brain.intelligence_counters', """
+    SELECT * FROM agent_intelligence_counters WHERE workspace_key = ?
+""")
+_EXPIRED_STATE_COUNT = statement('agent_brain.expired_state_count', """
+    SELECT COUNT(*) FROM agent_state
+    WHERE workspace_id IS ? AND expires_at IS NOT NULL AND expires_at <= datetime('now')
+""")
+_TOP_PATTERNS = statement('agent_brain.top_patterns', """
+    SELECT * FROM agent_patterns
+    WHERE workspace_id IS ? AND success_rate >= 0.7
+    ORDER BY success_rate DESC, usage_count DESC
+    LIMIT 5
+""")
+_RECENT_DECISIONS = statement('agent_brain.recent_decisions', """
+    SELECT * FROM agent_decisions
+    WHERE workspace_id IS ?
+    ORDER BY success DESC, created_at DESC
+    LIMIT 5
+""")
+
+
 def get_agent_intelligence(workspace_id: Optional[int]) -> Dict[str, Any]:
     """Get comprehensive agent intelligence summary.
     
+    Counts come from agent_intelligence_counters (maintained by triggers), so
+    the cost doesn't grow with the size of the brain. knowledge_count counts
+    facts recall_knowledge() returns by default (confidence >= 0.5) and
+    state_count excludes expired state.
+    
     Args:
         workspace_id: Workspace ID
         
     Returns:
         dict: Intelligence summary
     """
+    with get_connection() as conn:
+        counters = _INTELLIGENCE_COUNTERS.execute(conn, (workspace_id or 0,)).fetchone()
+        expired_state = _EXPIRED_STATE_COUNT.execute(conn, (workspace_id,)).fetchone()[0]
+        top_patterns = _TOP_PATTERNS.execute(conn, (workspace_id,)).fetchall()
+        recent_decisions = _RECENT_DECISIONS.execute(conn, (workspace_id,)).fetchall()
+    
+    def count(column: str) -> int:
+        return counters[column] if counters else 0
+    
     return {
-        'knowledge_count': len(recall_knowledge(workspace_id)),
-        'decision_count': len(recall_similar_decisions(workspace_id, 'any')),
-        'pattern_count': len(recall_patterns(workspace_id)),
-        'state_count': len(get_all_agent_state(workspace_id)),
-        'top_patterns': recall_patterns(workspace_id, min_success_rate=0.7)[:5],
-        'recent_decisions': recall_similar_decisions(workspace_id, 'any')[:5]
+        'knowledge_count': count('confident_knowledge_count'),
+        'decision_count': count('decision_count'),
+        'pattern_count': count('pattern_count'),
+        'state_count': count('state_count') - expired_state,
+        'memory_count': count('memory_count'),
+        'top_patterns': [dict(row) for row in top_patterns],
+        'recent_decisions': [dict(row) for row in recent_decisions]
     }
+
+
+def rebuild_intelligence_counters() -> None:
+    """Recompute agent_intelligence_counters from the underlying tables.
+    
+    Only needed to repair counters, e.g. after rows were bulk-loaded with
+    triggers disabled; normal writes keep them current.
+    """
+    with get_connection() as conn:
+        conn.execute("DELETE FROM agent_intelligence_counters")
+        conn.execute(BACKFILL_INTELLIGENCE_COUNTERS)
@@ -0,0 +1,216 @@
+"""
+Read-through cache for small, read-mostly configuration tables.
+LRU eviction, per-table TTLs, and cross-process invalidation via PRAGMA data_version
+plus the change_counters table maintained by triggers in schema.sql.
+"""
+
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Any, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds an entry may be served before it is reloaded regardless of invalidation
+DEFAULT_TTLS = {
+    'preferences': 300.0,
+    'templates': 3600.0,
+    'cursor_rules': 300.0,
+    'integrations': 300.0,
+    'rule_documents': 300.0,
+}
+
+
+def _copy(value: Any) -> Any:
+    """Copy a cached result (row dicts or lists of row dicts) for the caller."""
+    if isinstance(value, list):
+        return [dict(item) if isinstance(item, dict) else item for item in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+class _DatabaseWatcher:
+    """Detects committed changes to one database file.
+    
+    PRAGMA data_version on a dedicated connection changes whenever any other
+    connection (in any process) commits; only then is change_counters read
+    to find out which tables moved.
+    """
+    
+    def __init__(self, db_path: str):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.data_version: Optional[int] = None
+        self.versions: Dict[str, int] = {}
+        self.supported = True
+    
+    def changed_tables(self) -> Optional[set]:
+        """Return tables whose counters moved since the last call.
+        
+        Returns:
+            set: Changed table names, or None if the database does not have
+                 change_counters (caching is then disabled for it)
+        """
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self.data_version:
+            return set()
+        self.data_version = data_version
+        try:
+            rows = self.conn.execute("SELECT table_name, version FROM change_counters").fetchall()
+        except sqlite3.OperationalError:
+            self.supported = False
+            return None
+        changed = {table for table, version in rows if self.versions.get(table) != version}
+        self.versions = dict(rows)
+        return changed
+    
+    def close(self) -> None:
+        self.conn.close()
+
+
+class QueryCache:
+    """LRU read-through cache keyed by (database, table, key)."""
+    
+    def __init__(self, max_entries: int = 2048, ttls: Optional[Dict[str, float]] = None):
+        """Initialize cache.
+        
+        Args:
+            max_entries: Maximum number of cached results across all tables
+            ttls: Per-table TTL overrides in seconds (merged over DEFAULT_TTLS)
+        """
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.enabled = True
+        self._entries: "OrderedDict[Tuple[str, str, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._watchers: Dict[str, _DatabaseWatcher] = {}
+        self._lock = threading.RLock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        # Bumped on every invalidation so a load that raced one is not stored
+        self._generations: Dict[Tuple[str, Optional[str]], int] = {}
+    
+    def _count(self, table: str, field: str) -> None:
+        counters = self._stats.setdefault(
+            table, {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+        )
+        counters[field] += 1
+    
+    def _sync(self, db_key: str) -> bool:
+        """Apply cross-process invalidations; return False if caching is unavailable."""
+        watcher = self._watchers.get(db_key)
+        if watcher is None:
+            watcher = self._watchers[db_key] = _DatabaseWatcher(db_key)
+        if not watcher.supported:
+            return False
+        changed = watcher.changed_tables()
+        if changed is None:
+            logger.warning(f"change_counters missing in {db_key}; query cache disabled for it")
+            self._drop(db_key)
+            return False
+        for table in changed:
+            self._drop(db_key, table)
+        return True
+    
+    def _drop(self, db_key: str, table: Optional[str] = None, key: Hashable = None,
+              exact: bool = False) -> None:
+        gen_key = (db_key, table)
+        self._generations[gen_key] = self._generations.get(gen_key, 0) + 1
+        for entry_key in [
+            k for k in self._entries
+            if k[0] == db_key and (table is None or k[1] == table) and (not exact or k[2] == key)
+        ]:
+            del self._entries[entry_key]
+            self._count(entry_key[1], 'invalidations')
+    
+    def _generation(self, db_key: str, table: str) -> Tuple[int, int]:
+        return (self._generations.get((db_key, table), 0),
+                self._generations.get((db_key, None), 0))
+    
+    def get_or_load(self, db_key: str, table: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return a cached result, loading and caching it on a miss.
+        
+        Args:
+            db_key: Database identifier (path string)
+            table: Table the result is derived from (selects TTL and invalidation)
+            key: Hashable key identifying the query and its parameters
+            loader: Zero-argument function that runs the query
+            
+        Returns:
+            A copy of the cached value, so callers may mutate it freely
+        """
+        if not self.enabled:
+            return loader()
+        with self._lock:
+            if not self._sync(db_key):
+                return loader()
+            entry_key = (db_key, table, key)
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(entry_key)
+                self._count(table, 'hits')
+                return _copy(entry[1])
+            self._count(table, 'misses')
+            generation = self._generation(db_key, table)
+        
+        value = loader()
+        
+        with self._lock:
+            if self._generation(db_key, table) != generation:
+                return _copy(value)
+            self._entries[entry_key] = (time.monotonic() + self.ttls.get(table, 60.0), value)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._count(evicted[1], 'evictions')
+        return _copy(value)
+    
+    def invalidate(self, db_key: str, table: str, key: Hashable = None) -> None:
+        """Drop one cached key, or every key of a table when key is None."""
+        with self._lock:
+            self._drop(db_key, table, key, exact=key is not None)
+    
+    def record_local_write(self, db_key: str, table: str, keys: Tuple[Hashable, ...],
+                           version_before: int, version_after: int) -> None:
+        """Invalidate exactly the keys a committed local write touched.
+        
+        The write's own change_counters bumps (version_before -> version_after,
+        read inside the writing transaction) are absorbed so they don't
+        flush the whole table on the next lookup. If another writer got in
+        between, the table is dropped instead.
+        """
+        with self._lock:
+            watcher = self._watchers.get(db_key)
+            if watcher is not None and watcher.versions.get(table) == version_before:
+                watcher.versions[table] = version_after
+                for key in keys:
+                    self._drop(db_key, table, key, exact=True)
+            else:
+                self._drop(db_key, table)
+    
+    def forget(self, db_key: str) -> None:
+        """Drop all state for a database (e.g. when the file is recreated)."""
+        with self._lock:
+            self._drop(db_key)
+            watcher = self._watchers.pop(db_key, None)
+            if watcher is not None:
+                watcher.close()
+    
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+    
+    def reset_stats(self) -> None:
+        """Zero the hit/miss counters (e.g. between tuning runs)."""
+        with self._lock:
+            self._stats = {}
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return per-table hit/miss/invalidation/eviction counters."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'tables': {table: dict(c) for table, c in self._stats.items()},
+            }
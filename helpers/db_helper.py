@@ -4,12 +4,27 @@ SQLite database operations for workspace configuration management.
 """
 
 import os
+import copy
+import time
+import atexit
 import sqlite3
 import logging
+import threading
 from pathlib import Path
-from typing import Optional, Any, List, Dict
+from typing import Optional, Any, List, Dict, Iterator, Sequence
 from contextlib import contextmanager
 
+try:
+    from helpers.cache import QueryCache
+    from helpers.reliability import RetryPolicy, is_transient_db_error
+    from helpers.statements import statement, STATEMENT_CACHE_SIZE
+    from helpers.db_migrations import migrate
+except ImportError:
+    from cache import QueryCache  # When run as python helpers/db_helper.py
+    from reliability import RetryPolicy, is_transient_db_error
+    from statements import statement, STATEMENT_CACHE_SIZE
+    from db_migrations import migrate
+
 logger = logging.getLogger(__name__)
 
 # Get DB path from environment or use default
@@ -17,12 +32,430 @@ _DEFAULT_DB_PATH = Path(__file__).parent.parent / "dexter.db"
 DB_PATH = Path(os.getenv("DB_PATH", str(_DEFAULT_DB_PATH)))
 
 
+# Connection pool defaults (overridable via environment)
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "8"))
+POOL_CHECKOUT_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10.0"))
+
+# PRAGMAs applied once per physical connection
+_CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",  # Enforce referential integrity
+    "PRAGMA journal_mode = WAL",  # Better concurrency (readers don't block writers)
+    "PRAGMA synchronous = NORMAL",  # Balance safety and performance with WAL
+    "PRAGMA busy_timeout = 30000",  # Wait up to 30s for locks (better concurrency)
+)
+
+
+# Retries for opening pooled connections (jittered, see reliability.RetryPolicy).
+# Only lock contention is retried; e.g. "unable to open database file" is not.
+_CONNECT_RETRY = RetryPolicy(
+    max_attempts=3, base_delay=0.1, max_delay=2.0, deadline=POOL_CHECKOUT_TIMEOUT,
+    retry_on=(sqlite3.OperationalError,), never_retry=(sqlite3.IntegrityError,),
+    retry_if=is_transient_db_error, name='db_connect'
+)
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of SQLite connections for one database file.
+    
+    Physical connections are opened lazily (up to ``max_size``) and have their
+    PRAGMAs applied once. Each thread prefers the connection it used last, so
+    single-threaded callers keep hitting the same warm connection. Connections
+    are health-checked on checkout and discarded if they are broken.
+    """
+    
+    def __init__(self, db_path: Path, max_size: int = POOL_MAX_SIZE,
+                 timeout: float = POOL_CHECKOUT_TIMEOUT):
+        """Initialize connection pool.
+        
+        Args:
+            db_path: Path to SQLite database file
+            max_size: Maximum number of physical connections
+            timeout: Seconds to wait for a free connection before failing
+        """
+        self.db_path = Path(db_path)
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle: List[sqlite3.Connection] = []
+        self._size = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._local = threading.local()
+        self._closed = False
+        self._stats = {
+            "created": 0,
+            "checkouts": 0,
+            "affinity_hits": 0,
+            "waits": 0,
+            "discarded": 0,
+        }
+    
+    def _connect(self, retry_count: int) -> sqlite3.Connection:
+        """Open and configure a new physical connection."""
+        policy = _CONNECT_RETRY
+        if retry_count != policy.max_attempts:
+            # Shallow copy shares the attempt counters with the named policy
+            policy = copy.copy(policy)
+            policy.max_attempts = retry_count
+        return policy.call(self._open)
+    
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            str(self.db_path), timeout=10.0, check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        try:
+            conn.row_factory = sqlite3.Row
+            for pragma in _CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+    
+    @staticmethod
+    def _is_healthy(conn: sqlite3.Connection) -> bool:
+        """Cheap liveness probe run on every checkout."""
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+    
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        """Close a connection and free its slot (caller holds the lock)."""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        self._size -= 1
+        self._stats["discarded"] += 1
+        self._cond.notify()
+    
+    def acquire(self, retry_count: int = 3) -> sqlite3.Connection:
+        """Check out a connection, creating one if the pool has room.
+        
+        Raises:
+            sqlite3.OperationalError: If no connection frees up within timeout
+        """
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            if self._closed:
+                raise sqlite3.ProgrammingError(f"Connection pool for {self.db_path} is closed")
+            while True:
+                conn = None
+                preferred = getattr(self._local, "conn", None)
+                if preferred is not None and preferred in self._idle:
+                    self._idle.remove(preferred)
+                    conn = preferred
+                    self._stats["affinity_hits"] += 1
+                elif self._idle:
+                    conn = self._idle.pop()
+                
+                if conn is not None:
+                    if self._is_healthy(conn):
+                        break
+                    self._discard(conn)
+                    continue
+                
+                if self._size < self.max_size:
+                    # Reserve the slot, then connect outside the lock
+                    self._size += 1
+                    break
+                
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError(
+                        f"Connection pool exhausted for {self.db_path} "
+                        f"({self.max_size} connections in use)"
+                    )
+                self._stats["waits"] += 1
+                self._cond.wait(remaining)
+            self._stats["checkouts"] += 1
+        
+        if conn is None:
+            try:
+                conn = self._connect(retry_count)
+            except sqlite3.Error:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats["created"] += 1
+        
+        self._local.conn = conn
+        return conn
+    
+    def release(self, conn: sqlite3.Connection, discard: bool = False) -> None:
+        """Return a connection to the pool.
+        
+        Args:
+            conn: Connection previously returned by acquire()
+            discard: Close the connection instead of reusing it
+        """
+        if not discard and conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                discard = True
+        with self._cond:
+            if discard or self._closed:
+                self._discard(conn)
+            else:
+                self._idle.append(conn)
+                self._cond.notify()
+    
+    def close(self) -> None:
+        """Close all idle connections and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop())
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return pool counters for monitoring and tuning."""
+        with self._cond:
+            return {
+                **self._stats,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+            }
+
+
+def _db_key(db_path: Optional[Path]) -> str:
+    """Normalise a db_path argument into the key used for pools and scopes."""
+    return str(db_path if db_path is not None else DB_PATH)
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(db_path: Optional[Path] = None) -> ConnectionPool:
+    """Get (or lazily create) the connection pool for a database file.
+    
+    Pools are per-process: after a fork the child starts with fresh pools
+    instead of sharing the parent's file handles.
+    """
+    global _pools_pid
+    key = _db_key(db_path)
+    pool = _pools.get(key)
+    if pool is not None and _pools_pid == os.getpid():
+        return pool
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(Path(key))
+            _pools[key] = pool
+        return pool
+
+
+def close_pool(db_path: Optional[Path] = None) -> None:
+    """Close and forget the pool for a database file (if one exists)."""
+    key = _db_key(db_path)
+    with _pools_lock:
+        pool = _pools.pop(key, None)
+    if pool is not None:
+        pool.close()
+    _query_cache.forget(key)
+
+
+def close_all_pools() -> None:
+    """Close every pool in this process (registered to run at exit)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_all_pools)
+
+
+class TransactionScope:
+    """State of an active transaction() block on one thread.
+    
+    Attributes:
+        conn: Connection shared by every helper call inside the scope
+        depth: Current savepoint nesting depth (0 = outermost)
+        statements: Number of SQL statements executed inside the scope
+        connection_calls: Number of get_connection() calls that were batched
+        elapsed: Wall time of the scope in seconds (final once it exits)
+        committed: True once the outermost scope has committed
+    """
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.depth = 0
+        self.statements = 0
+        self.connection_calls = 0
+        self.elapsed = 0.0
+        self.committed = False
+        self._started = time.perf_counter()
+        self._pre_commit: List = []
+        self._on_rollback: List[list] = []
+    
+    def _trace(self, statement: str) -> None:
+        self.statements += 1
+    
+    def on_commit(self, callback) -> None:
+        """Run callback(conn) inside the transaction just before it commits.
+        
+        Lets helpers defer batched writes to the end of the unit of work so
+        they share its commit. Each callback is registered at most once and
+        does not run if the transaction rolls back.
+        """
+        if callback not in self._pre_commit:
+            self._pre_commit.append(callback)
+    
+    def on_rollback(self, callback) -> None:
+        """Run callback() if the work done so far at this nesting level is undone.
+        
+        Fires when the enclosing savepoint rolls back, or when the whole
+        transaction does (including a failed commit), so helpers that moved
+        in-memory state into the transaction can put it back.
+        """
+        self._on_rollback.append([self.depth, callback])
+    
+    def _released(self, depth: int) -> None:
+        """A savepoint at ``depth`` was released: its callbacks now belong to the parent."""
+        for entry in self._on_rollback:
+            if entry[0] >= depth:
+                entry[0] = depth - 1
+    
+    def _rolled_back(self, depth: int) -> None:
+        """Run (once) the rollback callbacks registered at ``depth`` or deeper."""
+        undone = [entry for entry in self._on_rollback if entry[0] >= depth]
+        self._on_rollback = [entry for entry in self._on_rollback if entry[0] < depth]
+        for _, callback in reversed(undone):
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Rollback callback failed: {e}")
+    
+    def summary(self) -> Dict[str, Any]:
+        """Return batching statistics for logging or tuning."""
+        return {
+            "statements": self.statements,
+            "connection_calls": self.connection_calls,
+            "elapsed": self.elapsed,
+            "committed": self.committed,
+        }
+
+
+_tx_local = threading.local()
+
+
+def _active_scope(key: str) -> Optional[TransactionScope]:
+    """Return this thread's active transaction scope for a database, if any."""
+    scopes = getattr(_tx_local, "scopes", None)
+    return scopes.get(key) if scopes else None
+
+
+def current_transaction(db_path: Optional[Path] = None) -> Optional[TransactionScope]:
+    """Return the transaction() scope active on this thread, if any.
+    
+    Args:
+        db_path: Path to SQLite database file (defaults to DB_PATH)
+    """
+    return _active_scope(_db_key(db_path))
+
+
 @contextmanager
-def get_connection(db_path: Path = DB_PATH, retry_count: int = 3):
-    """Get database connection with automatic cleanup and retry logic.
+def transaction(db_path: Optional[Path] = None):
+    """Run several helper calls as one unit of work with a single commit.
+    
+    Every get_connection() call made on this thread inside the block reuses
+    the scope's connection and skips its own commit; the outermost block
+    commits once on exit or rolls everything back on error. Nested
+    transaction() blocks become savepoints, so an inner failure only undoes
+    the inner block.
     
     Args:
-        db_path: Path to SQLite database file
+        db_path: Path to SQLite database file (defaults to DB_PATH)
+        
+    Yields:
+        TransactionScope: Scope with statement/timing counters
+    
+    Example:
+        with transaction() as tx:
+            workspace_id = create_workspace("demo")
+            add_rule(workspace_id, "core", "...")
+        logger.info(tx.summary())
+    """
+    key = _db_key(db_path)
+    scope = _active_scope(key)
+    
+    if scope is not None:
+        scope.depth += 1
+        savepoint = f"dexter_sp_{scope.depth}"
+        scope.conn.execute(f"SAVEPOINT {savepoint}")
+        try:
+            yield scope
+            scope.conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+            scope._released(scope.depth)
+        except BaseException:
+            scope.conn.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+            scope.conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+            scope._rolled_back(scope.depth)
+            raise
+        finally:
+            scope.depth -= 1
+        return
+    
+    pool = get_pool(db_path)
+    conn = pool.acquire()
+    scope = TransactionScope(conn)
+    if not hasattr(_tx_local, "scopes"):
+        _tx_local.scopes = {}
+    _tx_local.scopes[key] = scope
+    conn.set_trace_callback(scope._trace)
+    discard = False
+    
+    try:
+        conn.execute("BEGIN")
+        yield scope
+        for callback in scope._pre_commit:
+            callback(conn)
+        conn.commit()
+        scope.committed = True
+    except sqlite3.Error as e:
+        discard = not _rollback(conn)
+        scope._rolled_back(0)
+        logger.error(f"Transaction rolled back after database error: {e}")
+        raise
+    except BaseException:
+        discard = not _rollback(conn)
+        scope._rolled_back(0)
+        raise
+    finally:
+        conn.set_trace_callback(None)
+        del _tx_local.scopes[key]
+        scope.elapsed = time.perf_counter() - scope._started
+        pool.release(conn, discard=discard)
+        logger.debug(
+            f"Transaction {'committed' if scope.committed else 'rolled back'}: "
+            f"{scope.statements} statements from {scope.connection_calls} calls "
+            f"in {scope.elapsed:.4f}s"
+        )
+
+
+@contextmanager
+def get_connection(db_path: Optional[Path] = None, retry_count: int = 3):
+    """Get pooled database connection with automatic commit/rollback.
+    
+    Connections come from a per-database ConnectionPool, so PRAGMA setup is
+    paid once per physical connection rather than once per call. Inside a
+    transaction() block the scope's connection is yielded instead and the
+    commit is deferred to the end of the scope.
+    
+    Args:
+        db_path: Path to SQLite database file (defaults to DB_PATH)
         retry_count: Number of retry attempts on connection failure
         
     Yields:
@@ -31,80 +464,206 @@ def get_connection(db_path: Path = DB_PATH, retry_count: int = 3):
     Raises:
         sqlite3.Error: If connection fails after retries
     """
-    conn = None
-    last_error = None
+    scope = _active_scope(_db_key(db_path))
+    if scope is not None:
+        scope.connection_calls += 1
+        yield scope.conn
+        return
     
-    for attempt in range(retry_count):
-        try:
-            conn = sqlite3.connect(str(db_path), timeout=10.0)
-            conn.row_factory = sqlite3.Row
-            # Essential PRAGMA settings for reliability and performance
-            conn.execute("PRAGMA foreign_keys = ON")  # Enforce referential integrity
-            conn.execute("PRAGMA journal_mode = WAL")  # Better concurrency (readers don't block writers)
-            conn.execute("PRAGMA synchronous = NORMAL")  # Balance safety and performance with WAL
-            conn.execute("PRAGMA busy_timeout = 30000")  # Wait up to 30s for locks (better concurrency)
-            break
-        except sqlite3.Error as e:
-            last_error = e
-            logger.warning(f"Connection attempt {attempt + 1}/{retry_count} failed: {e}")
-            if attempt < retry_count - 1:
-                import time
-                time.sleep(0.1 * (attempt + 1))  # Exponential backoff
-            else:
-                logger.error(f"All {retry_count} connection attempts failed")
-                raise
+    pool = get_pool(db_path)
+    conn = pool.acquire(retry_count)
+    discard = False
     
     try:
         yield conn
         conn.commit()
     except sqlite3.Error as e:
-        if conn:
-            conn.rollback()
+        discard = not _rollback(conn)
         logger.error(f"Database error: {e}")
         raise
+    except BaseException:
+        discard = not _rollback(conn)
+        raise
     finally:
-        if conn:
-            conn.close()
+        pool.release(conn, discard=discard)
+
+
+def _rollback(conn: sqlite3.Connection) -> bool:
+    """Roll back a connection, returning False if it is no longer usable."""
+    try:
+        conn.rollback()
+        return True
+    except sqlite3.Error:
+        return False
+
+
+_query_cache = QueryCache()
+
+
+def get_query_cache() -> QueryCache:
+    """Return the process-wide read-through cache (for stats, TTLs, or disabling)."""
+    return _query_cache
 
 
-def init_database(db_path: Path = DB_PATH, 
-                  schema_path: Optional[Path] = None) -> None:
-    """Initialize database with consolidated schema file.
+def _cached(table: str, key: tuple, loader):
+    """Serve a read from the query cache, bypassing it inside transaction()."""
+    db_key = _db_key(None)
+    if _active_scope(db_key) is not None:
+        return loader()
+    return _query_cache.get_or_load(db_key, table, key, loader)
+
+
+def _change_version(conn: sqlite3.Connection, table: str) -> Optional[int]:
+    """Read a table's change counter inside the current (writing) transaction."""
+    try:
+        row = conn.execute(
+            "SELECT version FROM change_counters WHERE table_name = ?", (table,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def _invalidate_cached(table: str, version: Optional[int], rowcount: int, *keys: tuple) -> None:
+    """Invalidate the cache keys touched by a committed write.
+    
+    Args:
+        table: Table that was written
+        version: Change counter read after the write (None if unavailable)
+        rowcount: Rows written, i.e. how many counter bumps were ours
+        *keys: Cache keys whose results the write may have changed
+    """
+    db_key = _db_key(None)
+    if version is None or _active_scope(db_key) is not None:
+        # Not committed yet (or no counters): drop the keys now; the table
+        # is dropped when the commit shows up in change_counters.
+        for key in keys:
+            _query_cache.invalidate(db_key, table, key)
+        return
+    _query_cache.record_local_write(db_key, table, keys, version - rowcount, version)
+
+
+# Keyset pagination for the iter_* APIs
+ITER_BATCH_SIZE = 500
+_table_columns_cache: Dict[str, frozenset] = {}
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> frozenset:
+    columns = _table_columns_cache.get(table)
+    if columns is None:
+        columns = frozenset(row[1] for row in conn.execute(f"PRAGMA table_info({table})"))
+        _table_columns_cache[table] = columns
+    return columns
+
+
+def _iter_keyset(table: str, where: str, params: tuple,
+                 columns: Optional[Sequence[str]] = None, after_id: Optional[int] = None,
+                 limit: Optional[int] = None, batch_size: int = ITER_BATCH_SIZE,
+                 db_path: Optional[Path] = None) -> Iterator[Dict[str, Any]]:
+    """Stream rows of ``table`` in id order, one short read per page.
+    
+    Each page is ``WHERE <where> AND id > ? ORDER BY id LIMIT ?`` on a pooled
+    connection that is released before the page's rows are yielded, so a
+    slow consumer never pins a connection or an open read transaction.
+    
+    Args:
+        table: Table name (must have an INTEGER PRIMARY KEY ``id``)
+        where: SQL filter using ``?`` placeholders
+        params: Values for the placeholders in ``where``
+        columns: Columns to select (None for all); ``id`` is always included
+        after_id: Only rows with id greater than this (resume point)
+        limit: Maximum rows to yield in total (None for no limit)
+        batch_size: Rows fetched per page
+        db_path: Optional database path
+        
+    Yields:
+        dict: One row at a time
+        
+    Raises:
+        ValueError: If ``columns`` names a column the table doesn't have
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    last_id = after_id if after_id is not None else -1
+    remaining = limit
+    select = None
+    
+    while remaining is None or remaining > 0:
+        page_size = batch_size if remaining is None else min(batch_size, remaining)
+        with get_connection(db_path) as conn:
+            if select is None:
+                if columns is None:
+                    select = "*"
+                else:
+                    unknown = set(columns) - _table_columns(conn, table)
+                    if unknown:
+                        raise ValueError(f"Unknown {table} columns: {sorted(unknown)}")
+                    select = ", ".join(["id"] + [c for c in dict.fromkeys(columns) if c != "id"])
+            rows = conn.execute(
+                f"SELECT {select} FROM {table} WHERE {where} AND id > ? ORDER BY id LIMIT ?",
+                params + (last_id, page_size)
+            ).fetchall()
+        
+        for row in rows:
+            yield dict(row)
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]["id"]
+        if remaining is not None:
+            remaining -= len(rows)
+
+
+def init_database(db_path: Optional[Path] = None, 
+                  schema_path: Optional[Path] = None,
+                  reset: bool = False) -> Dict[str, Any]:
+    """Create or upgrade the database schema (see helpers/db_migrations.py).
+    
+    An empty database is built from schema.sql; an existing one only gets
+    the migrations it is missing, so calling this on every start is cheap
+    and never loses data.
     
     Args:
         db_path: Path to SQLite database file
         schema_path: Path to schema.sql file (defaults to workspace root)
+        reset: Delete the existing database first (development only)
+        
+    Returns:
+        dict: Migration summary (from_version, to_version, applied, created)
         
     Raises:
         FileNotFoundError: If schema file doesn't exist
         sqlite3.Error: If schema execution fails
     """
     workspace_root = Path(__file__).parent.parent
+    db_path = Path(db_path) if db_path is not None else DB_PATH
     
     if schema_path is None:
         schema_path = workspace_root / "schema.sql"
     
-    # Ensure database directory exists
-    db_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    # Remove existing database if it exists (for clean initialization)
-    if db_path.exists():
-        logger.warning(f"Removing existing database at {db_path}")
-        db_path.unlink()
-    
-    # Load consolidated schema.sql
     if not schema_path.exists():
         raise FileNotFoundError(f"Schema file not found: {schema_path}")
     
-    with open(schema_path, "r", encoding="utf-8") as f:
-        schema_sql = f.read()
+    # Ensure database directory exists
+    db_path.parent.mkdir(parents=True, exist_ok=True)
     
-    # Execute schema
-    with get_connection(db_path) as conn:
-        conn.executescript(schema_sql)
+    if reset:
+        close_pool(db_path)
+        for path in (db_path, Path(f"{db_path}-wal"), Path(f"{db_path}-shm")):
+            if path.exists():
+                logger.warning(f"Removing existing database file {path}")
+                path.unlink()
     
-    logger.info(f"Database initialized at {db_path}")
-    print(f"Database initialized at {db_path}")
+    result = migrate(db_path, schema_path)
+    
+    if result["created"]:
+        logger.info(f"Database initialized at {db_path}")
+        print(f"Database initialized at {db_path}")
+    elif result["applied"]:
+        logger.info(
+            f"Database {db_path} migrated from version {result['from_version']} "
+            f"to {result['to_version']}: {', '.join(result['applied'])}"
+        )
+    return result
 
 
 def create_workspace(name: str, description: str = "", project_type: str = "general") -> int:
@@ -184,7 +743,17 @@ def add_rule(workspace_id: int, rule_name: str, content: str,
             """,
             (workspace_id, rule_name, description, globs, rule_type, content)
         )
-        return cursor.lastrowid
+        version = _change_version(conn, 'cursor_rules')
+    _invalidate_cached('cursor_rules', version, cursor.rowcount, ('get_rules', workspace_id))
+    return cursor.lastrowid
+
+
+_RULE_DOCUMENTS = statement('db_helper.rule_documents', """
+    SELECT * FROM rule_documents WHERE workspace_id IS ? ORDER BY rule_file
+""")
+_RULE_DOCUMENT_BY_FILE = statement('db_helper.rule_document_by_file', """
+    SELECT * FROM rule_documents WHERE rule_file = ? AND workspace_id IS ?
+""")
 
 
 def get_rule_documents(workspace_id: Optional[int] = None, rule_file: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -197,29 +766,37 @@ def get_rule_documents(workspace_id: Optional[int] = None, rule_file: Optional[s
     Returns:
         list: Rule documents
     """
-    with get_connection() as conn:
-        if rule_file:
-            if workspace_id is not None:
-                cursor = conn.execute(
-                    "SELECT * FROM rule_documents WHERE rule_file = ? AND workspace_id = ?",
-                    (rule_file, workspace_id)
-                )
+    def load():
+        with get_connection() as conn:
+            if rule_file:
+                cursor = _RULE_DOCUMENT_BY_FILE.execute(conn, (rule_file, workspace_id))
             else:
-                cursor = conn.execute(
-                    "SELECT * FROM rule_documents WHERE rule_file = ? AND workspace_id IS NULL",
-                    (rule_file,)
-                )
-        else:
-            if workspace_id is not None:
-                cursor = conn.execute(
-                    "SELECT * FROM rule_documents WHERE workspace_id = ? ORDER BY rule_file",
-                    (workspace_id,)
-                )
-            else:
-                cursor = conn.execute(
-                    "SELECT * FROM rule_documents WHERE workspace_id IS NULL ORDER BY rule_file"
-                )
-        return [dict(row) for row in cursor.fetchall()]
+                cursor = _RULE_DOCUMENTS.execute(conn, (workspace_id,))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    return _cached('rule_documents', ('get_rule_documents', workspace_id, rule_file), load)
+
+
+def iter_rule_documents(workspace_id: Optional[int] = None, columns: Optional[Sequence[str]] = None,
+                        after_id: Optional[int] = None, limit: Optional[int] = None,
+                        batch_size: int = ITER_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """Stream rule documents in id order without materialising them all.
+    
+    Unlike get_rule_documents() this bypasses the query cache; pass the last
+    seen id as ``after_id`` to resume.
+    
+    Args:
+        workspace_id: Optional workspace ID (None for global rules)
+        columns: Columns to return (None for all); ``id`` is always included
+        after_id: Only documents with id greater than this
+        limit: Maximum documents to yield
+        batch_size: Rows fetched per database round trip
+        
+    Yields:
+        dict: Rule documents
+    """
+    return _iter_keyset('rule_documents', 'workspace_id IS ?', (workspace_id,),
+                        columns, after_id, limit, batch_size)
 
 
 def get_rules(workspace_id: int) -> list[dict[str, Any]]:
@@ -231,12 +808,15 @@ def get_rules(workspace_id: int) -> list[dict[str, Any]]:
     Returns:
         list[dict[str, Any]]: List of active rules
     """
-    with get_connection() as conn:
-        cursor = conn.execute(
-            "SELECT * FROM cursor_rules WHERE workspace_id = ? AND is_active = 1",
-            (workspace_id,)
-        )
-        return [dict(row) for row in cursor.fetchall()]
+    def load():
+        with get_connection() as conn:
+            cursor = conn.execute(
+                "SELECT * FROM cursor_rules WHERE workspace_id = ? AND is_active = 1",
+                (workspace_id,)
+            )
+            return [dict(row) for row in cursor.fetchall()]
+    
+    return _cached('cursor_rules', ('get_rules', workspace_id), load)
 
 
 def add_integration(workspace_id: int, integration_type: str, name: str,
@@ -261,7 +841,9 @@ def add_integration(workspace_id: int, integration_type: str, name: str,
             """,
             (workspace_id, integration_type, name, config_json, api_key_env_var)
         )
-        return cursor.lastrowid
+        version = _change_version(conn, 'integrations')
+    _invalidate_cached('integrations', version, cursor.rowcount, ('get_integrations', workspace_id))
+    return cursor.lastrowid
 
 
 def get_integrations(workspace_id: int) -> list[dict[str, Any]]:
@@ -273,29 +855,31 @@ def get_integrations(workspace_id: int) -> list[dict[str, Any]]:
     Returns:
         list[dict[str, Any]]: List of active integrations
     """
-    with get_connection() as conn:
-        cursor = conn.execute(
-            "SELECT * FROM integrations WHERE workspace_id = ? AND is_active = 1",
-            (workspace_id,)
-        )
-        return [dict(row) for row in cursor.fetchall()]
+    def load():
+        with get_connection() as conn:
+            cursor = conn.execute(
+                "SELECT * FROM integrations WHERE workspace_id = ? AND is_active = 1",
+                (workspace_id,)
+            )
+            return [dict(row) for row in cursor.fetchall()]
+    
+    return _cached('integrations', ('get_integrations', workspace_id), load)
+
+
+_PREFERENCE = statement('db_helper.preference', """
+    SELECT value FROM preferences WHERE workspace_id IS ? AND key = ?
+""")
 
 
 def get_preference(key: str, workspace_id: Optional[int] = None) -> Optional[str]:
     """Get a preference value (workspace-scoped or global)."""
-    with get_connection() as conn:
-        if workspace_id is None:
-            cursor = conn.execute(
-                "SELECT value FROM preferences WHERE workspace_id IS NULL AND key = ?",
-                (key,),
-            )
-        else:
-            cursor = conn.execute(
-                "SELECT value FROM preferences WHERE workspace_id = ? AND key = ?",
-                (workspace_id, key),
-            )
-        row = cursor.fetchone()
-        return row["value"] if row else None
+    def load():
+        with get_connection() as conn:
+            cursor = _PREFERENCE.execute(conn, (workspace_id, key))
+            row = cursor.fetchone()
+            return row["value"] if row else None
+    
+    return _cached('preferences', ('get_preference', key, workspace_id), load)
 
 
 def set_preference(
@@ -306,7 +890,7 @@ def set_preference(
 ) -> None:
     """Set a preference value (workspace-scoped or global)."""
     with get_connection() as conn:
-        conn.execute(
+        cursor = conn.execute(
             """
             INSERT INTO preferences (workspace_id, key, value, description)
             VALUES (?, ?, ?, ?)
@@ -317,6 +901,8 @@ def set_preference(
             """,
             (workspace_id, key, value, description),
         )
+        version = _change_version(conn, 'preferences')
+    _invalidate_cached('preferences', version, cursor.rowcount, ('get_preference', key, workspace_id))
 
 
 def get_template(name: str) -> Optional[dict[str, Any]]:
@@ -328,13 +914,16 @@ def get_template(name: str) -> Optional[dict[str, Any]]:
     Returns:
         dict[str, Any]: Template data as dictionary, or None if not found
     """
-    with get_connection() as conn:
-        cursor = conn.execute(
-            "SELECT * FROM templates WHERE name = ?",
-            (name,)
-        )
-        row = cursor.fetchone()
-        return dict(row) if row else None
+    def load():
+        with get_connection() as conn:
+            cursor = conn.execute(
+                "SELECT * FROM templates WHERE name = ?",
+                (name,)
+            )
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    
+    return _cached('templates', ('get_template', name), load)
 
 
 def list_templates() -> list[dict[str, Any]]:
@@ -343,9 +932,12 @@ def list_templates() -> list[dict[str, Any]]:
     Returns:
         list[dict[str, Any]]: List of all templates ordered by name
     """
-    with get_connection() as conn:
-        cursor = conn.execute("SELECT * FROM templates ORDER BY name")
-        return [dict(row) for row in cursor.fetchall()]
+    def load():
+        with get_connection() as conn:
+            cursor = conn.execute("SELECT * FROM templates ORDER BY name")
+            return [dict(row) for row in cursor.fetchall()]
+    
+    return _cached('templates', ('list_templates',), load)
 
 
 def log_action(
@@ -374,6 +966,20 @@ def log_action(
     Returns:
         int: ID of the logged action
     """
+    row = (
+        agent_session_id,
+        project_id,
+        workspace_id,
+        action_type,
+        target,
+        description,
+        status,
+        rollback_info,
+    )
+    writer = _active_action_log_writer()
+    if writer is not None:
+        return writer.submit(row)
+    
     with get_connection() as conn:
         cursor = conn.execute(
             """
@@ -389,20 +995,453 @@ def log_action(
             )
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """,
-            (
-                agent_session_id,
-                project_id,
-                workspace_id,
-                action_type,
-                target,
-                description,
-                status,
-                rollback_info,
-            ),
+            row,
         )
         return cursor.lastrowid
 
 
+def update_action_status(
+    action_id: int,
+    status: str,
+    description: Optional[str] = None,
+    rollback_info: Optional[str] = None,
+) -> None:
+    """Update the status (and optionally description/rollback info) of an action.
+    
+    Goes through the buffered writer when one is enabled, so updates to rows
+    that have not been flushed yet are applied in memory.
+    
+    Args:
+        action_id: ID of the action
+        status: New status
+        description: Optional new description (unchanged if None)
+        rollback_info: Optional new rollback information (unchanged if None)
+    """
+    writer = _active_action_log_writer()
+    if writer is not None:
+        writer.update(action_id, status, description, rollback_info)
+        return
+    
+    with get_connection() as conn:
+        conn.execute(
+            """
+            UPDATE action_log
+            SET status = ?,
+                description = COALESCE(?, description),
+                rollback_info = COALESCE(?, rollback_info)
+            WHERE id = ?
+            """,
+            (status, description, rollback_info, action_id),
+        )
+
+
+class ActionLogWriter:
+    """Write-behind buffer for action_log rows.
+    
+    Rows are queued in memory and written by a background thread with a
+    single executemany per flush, triggered when ``max_batch`` rows are queued
+    or every ``flush_interval`` seconds. Row ids are reserved up front in
+    blocks (by advancing action_log's AUTOINCREMENT sequence), so submit()
+    returns the real id the row will have once flushed, even across
+    processes sharing the database.
+    """
+    
+    _INSERT_SQL = """
+        INSERT INTO action_log (
+            id,
+            timestamp,
+            agent_session_id,
+            project_id,
+            workspace_id,
+            action_type,
+            target,
+            description,
+            status,
+            rollback_info
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    _UPDATE_SQL = """
+        UPDATE action_log
+        SET status = ?,
+            description = COALESCE(?, description),
+            rollback_info = COALESCE(?, rollback_info)
+        WHERE id = ?
+    """
+    
+    def __init__(self, db_path: Optional[Path] = None, max_batch: int = 500,
+                 flush_interval: float = 0.5, id_block: int = 256):
+        """Initialize writer and start its flush thread.
+        
+        Args:
+            db_path: Path to SQLite database file (defaults to DB_PATH)
+            max_batch: Queue length that triggers an immediate flush
+            flush_interval: Maximum seconds a row waits before being flushed
+            id_block: Number of row ids reserved per sequence bump
+        """
+        self.db_path = Path(db_path) if db_path is not None else DB_PATH
+        self.key = _db_key(self.db_path)
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.id_block = id_block
+        self._pending: Dict[int, list] = {}
+        self._updates: List[tuple] = []
+        self._next_id = 0
+        self._last_id = -1
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._stats = {"submitted": 0, "flushed": 0, "flushes": 0, "errors": 0}
+        self._thread = threading.Thread(
+            target=self._run, name="dexter-action-log-writer", daemon=True
+        )
+        self._thread.start()
+    
+    def _reserve_ids(self) -> None:
+        """Advance action_log's AUTOINCREMENT sequence by one id block."""
+        pool = get_pool(self.db_path)
+        conn = pool.acquire()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'action_log'"
+            ).fetchone()
+            max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM action_log").fetchone()[0]
+            start = max(row[0] if row else 0, max_id)
+            end = start + self.id_block
+            if row:
+                conn.execute(
+                    "UPDATE sqlite_sequence SET seq = ? WHERE name = 'action_log'", (end,)
+                )
+            else:
+                conn.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES ('action_log', ?)", (end,)
+                )
+            conn.commit()
+        except sqlite3.Error:
+            _rollback(conn)
+            raise
+        finally:
+            pool.release(conn)
+        self._next_id = start + 1
+        self._last_id = end
+    
+    def submit(self, row: tuple) -> int:
+        """Queue an action_log row and return its reserved id.
+        
+        Args:
+            row: (agent_session_id, project_id, workspace_id, action_type,
+                  target, description, status, rollback_info)
+        """
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("ActionLogWriter is closed")
+            if self._next_id > self._last_id:
+                self._reserve_ids()
+            action_id = self._next_id
+            self._next_id += 1
+            self._pending[action_id] = [action_id, timestamp, *row]
+            self._stats["submitted"] += 1
+            queued = len(self._pending)
+        if queued >= self.max_batch:
+            self._wakeup.set()
+        return action_id
+    
+    def update(self, action_id: int, status: str, description: Optional[str] = None,
+               rollback_info: Optional[str] = None) -> None:
+        """Update a queued row in place, or queue an UPDATE for a flushed one."""
+        with self._lock:
+            pending = self._pending.get(action_id)
+            if pending is not None:
+                pending[8] = status
+                if description is not None:
+                    pending[7] = description
+                if rollback_info is not None:
+                    pending[9] = rollback_info
+                return
+            self._updates.append((status, description, rollback_info, action_id))
+    
+    def reserved_ids(self) -> int:
+        """Number of reserved ids left; submit() only touches the database when this is 0."""
+        with self._lock:
+            return max(self._last_id - self._next_id + 1, 0)
+    
+    def pending_status(self, action_id: int) -> Optional[str]:
+        """Return the status a row will have once queued writes are flushed.
+        
+        None if nothing is queued for ``action_id``; action_log is then
+        up to date for it.
+        """
+        with self._lock:
+            pending = self._pending.get(action_id)
+            if pending is not None:
+                return pending[8]
+            for status, _, _, update_id in reversed(self._updates):
+                if update_id == action_id:
+                    return status
+            return None
+    
+    def _take(self) -> tuple:
+        with self._lock:
+            rows = list(self._pending.values())
+            updates = self._updates
+            self._pending = {}
+            self._updates = []
+        return rows, updates
+    
+    def _requeue(self, rows: List[list], updates: List[tuple]) -> None:
+        """Put rows and updates taken by a failed flush back in front of the queue."""
+        with self._lock:
+            requeued = {row[0]: row for row in rows}
+            requeued.update(self._pending)
+            self._pending = requeued
+            self._updates = updates + self._updates
+    
+    def _write(self, conn: sqlite3.Connection, rows: List[list], updates: List[tuple]) -> int:
+        """Insert rows and apply updates on ``conn`` inside a savepoint.
+        
+        A batch that violates a constraint is retried one statement at a
+        time; the offending rows are logged, counted in stats()["errors"]
+        and dropped, so a single bad row cannot hold up the rest.
+        
+        Returns:
+            int: Number of rows inserted
+        """
+        conn.execute("SAVEPOINT action_log_flush")
+        try:
+            try:
+                if rows:
+                    conn.executemany(self._INSERT_SQL, rows)
+                if updates:
+                    conn.executemany(self._UPDATE_SQL, updates)
+                written = len(rows)
+            except sqlite3.IntegrityError:
+                conn.execute("ROLLBACK TO SAVEPOINT action_log_flush")
+                written = 0
+                for row in rows:
+                    try:
+                        conn.execute(self._INSERT_SQL, row)
+                        written += 1
+                    except sqlite3.IntegrityError as e:
+                        self._stats["errors"] += 1
+                        logger.error(f"Dropping action_log row {row[0]} ({row[5]!r}): {e}")
+                for update in updates:
+                    try:
+                        conn.execute(self._UPDATE_SQL, update)
+                    except sqlite3.IntegrityError as e:
+                        self._stats["errors"] += 1
+                        logger.error(f"Dropping status update for action {update[3]}: {e}")
+            conn.execute("RELEASE SAVEPOINT action_log_flush")
+        except sqlite3.Error:
+            try:
+                conn.execute("ROLLBACK TO SAVEPOINT action_log_flush")
+                conn.execute("RELEASE SAVEPOINT action_log_flush")
+            except sqlite3.Error:
+                pass  # The caller rolls back or discards the connection
+            raise
+        return written
+    
+    def flush(self) -> int:
+        """Write all queued rows and updates in one transaction.
+        
+        Rows that violate a constraint are dropped (see _write). On lock
+        contention the batch is re-queued for the next attempt; any other
+        database error drops it, so the queue cannot grow without bound.
+        
+        Returns:
+            int: Number of rows inserted
+        """
+        with self._flush_lock:
+            rows, updates = self._take()
+            if not rows and not updates:
+                return 0
+            
+            pool = get_pool(self.db_path)
+            conn = pool.acquire()
+            try:
+                written = self._write(conn, rows, updates)
+                conn.commit()
+            except sqlite3.Error as e:
+                _rollback(conn)
+                if is_transient_db_error(e):
+                    self._stats["errors"] += 1
+                    logger.warning(f"Action log flush failed, re-queueing {len(rows)} rows: {e}")
+                    self._requeue(rows, updates)
+                else:
+                    self._stats["errors"] += len(rows) + len(updates)
+                    logger.error(
+                        f"Action log flush failed, dropping {len(rows)} rows "
+                        f"and {len(updates)} updates: {e}"
+                    )
+                raise
+            finally:
+                pool.release(conn)
+            
+            self._stats["flushed"] += written
+            self._stats["flushes"] += 1
+            return written
+    
+    def flush_into(self, scope: TransactionScope) -> int:
+        """Write queued rows on an active transaction() scope's connection.
+        
+        The scope already holds the write lock, so a flush on another
+        connection would wait for it until busy_timeout. The rows commit with
+        the scope and are queued again if it rolls back. While a background
+        flush is in progress, queued updates are left for it to pick up next:
+        they may target rows it is still writing.
+        
+        Returns:
+            int: Number of rows inserted
+        """
+        idle = self._flush_lock.acquire(blocking=False)
+        try:
+            with self._lock:
+                rows = list(self._pending.values())
+                self._pending = {}
+                updates = []
+                if idle:
+                    updates, self._updates = self._updates, []
+            if not rows and not updates:
+                return 0
+            try:
+                written = self._write(scope.conn, rows, updates)
+            except sqlite3.Error:
+                self._requeue(rows, updates)
+                raise
+            scope.on_rollback(lambda: self._requeue(rows, updates))
+            self._stats["flushed"] += written
+            self._stats["flushes"] += 1
+            return written
+        finally:
+            if idle:
+                self._flush_lock.release()
+    
+    def _run(self) -> None:
+        """Background loop: flush on size trigger or interval."""
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass  # Already logged by flush(), which re-queues transient failures and drops the rest
+    
+    def close(self) -> None:
+        """Stop the flush thread and write any remaining rows."""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+        self._wakeup.set()
+        self._thread.join(timeout=5.0)
+        self.flush()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return writer counters for monitoring and tuning."""
+        with self._lock:
+            return {**self._stats, "queued": len(self._pending) + len(self._updates)}
+
+
+_action_log_writer: Optional[ActionLogWriter] = None
+
+
+def _active_action_log_writer() -> Optional[ActionLogWriter]:
+    """Return the buffered writer if it applies to the current call.
+    
+    Writes made inside a transaction() scope bypass the buffer: the scope
+    already batches them, and the writer's id reservation would otherwise
+    wait on the scope's own write lock.
+    """
+    writer = _action_log_writer
+    if writer is None or writer.key != _db_key(None):
+        return None
+    if _active_scope(writer.key) is not None:
+        return None
+    return writer
+
+
+def action_log_is_buffered() -> bool:
+    """Return True if log_action() calls on this thread are currently buffered."""
+    return _active_action_log_writer() is not None
+
+
+def buffered_action_ids() -> int:
+    """Number of log_action() calls on this thread that can be buffered without a database round trip.
+    
+    0 when buffering is off or the writer has to reserve a new id block
+    (a BEGIN IMMEDIATE that can wait on other writers).
+    """
+    writer = _active_action_log_writer()
+    return writer.reserved_ids() if writer is not None else 0
+
+
+def pending_action_status(action_id: int) -> Optional[str]:
+    """Return the queued status of an action_log row in the buffered writer.
+    
+    Args:
+        action_id: ID of the action
+        
+    Returns:
+        Optional[str]: Status the row will have once flushed, or None when
+        buffering is off or nothing is queued for it
+    """
+    writer = _action_log_writer
+    if writer is None or writer.key != _db_key(None):
+        return None
+    return writer.pending_status(action_id)
+
+
+def enable_buffered_action_log(db_path: Optional[Path] = None, **kwargs) -> ActionLogWriter:
+    """Opt in to write-behind action logging for this process.
+    
+    log_action() and update_action_status() are routed through an
+    ActionLogWriter until disable_buffered_action_log() is called. Queued
+    rows are flushed at interpreter exit.
+    
+    Args:
+        db_path: Path to SQLite database file (defaults to DB_PATH)
+        **kwargs: Passed through to ActionLogWriter
+        
+    Returns:
+        ActionLogWriter: The active writer
+    """
+    global _action_log_writer
+    disable_buffered_action_log()
+    _action_log_writer = ActionLogWriter(db_path, **kwargs)
+    return _action_log_writer
+
+
+def disable_buffered_action_log() -> None:
+    """Flush and stop the buffered writer, returning to synchronous logging."""
+    global _action_log_writer
+    writer, _action_log_writer = _action_log_writer, None
+    if writer is not None:
+        writer.close()
+
+
+def flush_action_log() -> int:
+    """Flush queued action_log rows now (no-op when buffering is off).
+    
+    Inside a transaction() block the rows are written on the block's own
+    connection and commit with it.
+    
+    Returns:
+        int: Number of rows written
+    """
+    writer = _action_log_writer
+    if writer is None:
+        return 0
+    scope = _active_scope(writer.key)
+    if scope is not None:
+        return writer.flush_into(scope)
+    return writer.flush()
+
+
+atexit.register(disable_buffered_action_log)
+
+
 def get_context(
     workspace_id: Optional[int],
     key: str,
@@ -469,8 +1508,8 @@ if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     
     if len(sys.argv) > 1 and sys.argv[1] == "init":
-        init_database()
+        init_database(reset="--reset" in sys.argv[2:])
         print("Database helper ready")
     else:
-        print("Usage: python db_helper.py init")
-        print("This will initialize the database from schema.sql")
+        print("Usage: python db_helper.py init [--reset]")
+        print("This will create or migrate the database (--reset recreates it from schema.sql)")
@@ -0,0 +1,294 @@
+"""
+Versioned, non-destructive schema migrations.
+schema.sql describes the current schema and is applied as a whole only to an
+empty database. Existing databases record their schema version in
+PRAGMA user_version and get just the pending numbered migrations, all in one
+transaction, so starting against an up-to-date database is a single PRAGMA read.
+"""
+
+import re
+import sqlite3
+import logging
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple, Callable, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = Path(__file__).parent.parent / "schema.sql"
+
+_CREATE_RE = re.compile(
+    r"^\s*CREATE\s+(?:VIRTUAL\s+|UNIQUE\s+)?(TABLE|INDEX|TRIGGER|VIEW)\s+IF\s+NOT\s+EXISTS\s+(\w+)",
+    re.IGNORECASE
+)
+
+
+def _normalise(sql: str) -> str:
+    sql = re.sub(r"\s+IF\s+NOT\s+EXISTS\s+", " ", sql, flags=re.IGNORECASE)
+    return " ".join(sql.replace("(", " ( ").replace(")", " ) ").split()).rstrip(";").strip()
+
+
+class SchemaObjects:
+    """CREATE statements from schema.sql, by (kind, name).
+    
+    Migrations create objects from the current schema.sql definitions rather
+    than from copies of them, so schema.sql stays the single source of truth.
+    """
+    
+    def __init__(self, schema_sql: str):
+        self.sql = schema_sql
+        self.objects: Dict[Tuple[str, str], str] = {}
+        statement = ""
+        for line in schema_sql.splitlines(keepends=True):
+            if not statement.strip() and (not line.strip() or line.lstrip().startswith("--")):
+                continue
+            statement += line
+            if sqlite3.complete_statement(statement):
+                match = _CREATE_RE.match(statement)
+                if match:
+                    self.objects[(match.group(1).lower(), match.group(2))] = statement.strip()
+                statement = ""
+    
+    def names(self, kind: str, pattern: str = ".*") -> List[str]:
+        """Names of schema.sql objects of ``kind`` matching regex ``pattern``."""
+        return [name for (k, name) in self.objects if k == kind and re.search(pattern, name)]
+    
+    def ensure(self, conn: sqlite3.Connection, kind: str, name: str) -> bool:
+        """Create ``name`` if missing; recreate indexes, triggers and views whose definition changed.
+        
+        Tables are never recreated - changing a table needs an explicit migration.
+        
+        Returns:
+            bool: True if the object was created or rebuilt
+        """
+        sql = self.objects[(kind, name)]
+        row = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = ? AND name = ?", (kind, name)
+        ).fetchone()
+        if row is not None:
+            if kind == "table" or _normalise(row[0] or "") == _normalise(sql):
+                return False
+            logger.info(f"Rebuilding {kind} {name} (definition changed)")
+            conn.execute(f"DROP {kind.upper()} {name}")
+        conn.execute(sql)
+        return True
+    
+    def ensure_all(self, conn: sqlite3.Connection, kind: str, pattern: str = ".*") -> int:
+        """ensure() every schema.sql object of ``kind`` matching ``pattern``; returns how many changed."""
+        return sum(self.ensure(conn, kind, name) for name in self.names(kind, pattern))
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection, SchemaObjects], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str):
+    """Register a migration; versions must be consecutive starting at 1.
+    
+    A migration runs inside the migration transaction and must be
+    idempotent: databases created from intermediate schema.sql revisions may
+    already contain some of its objects.
+    """
+    def register(func):
+        if version != len(MIGRATIONS) + 1:
+            raise ValueError(f"Migration {version} registered out of order")
+        MIGRATIONS.append(Migration(version, description, func))
+        return func
+    return register
+
+
+# Version 0 is a database created from the original schema.sql (no user_version).
+
+@migration(1, "change counters for cache invalidation")
+def _change_counters(conn: sqlite3.Connection, schema: SchemaObjects) -> None:
+    schema.ensure(conn, "table", "change_counters")
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO change_counters (table_name) VALUES
+            ('preferences'), ('templates'), ('cursor_rules'), ('integrations'), ('rule_documents')
+        """
+    )
+    schema.ensure_all(conn, "trigger", r"^(preferences|templates|cursor_rules|integrations|rule_documents)_cc_a[iud]$")
+
+
+@migration(2, "decision vectors for similarity recall")
+def _decision_vectors(conn: sqlite3.Connection, schema: SchemaObjects) -> None:
+    try:
+        from helpers.vector_index import decision_text, store_decision_vectors
+    except ImportError:
+        from vector_index import decision_text, store_decision_vectors  # Run as a script
+    
+    schema.ensure(conn, "table", "agent_decision_vectors")
+    cursor = conn.execute(
+        """
+        SELECT d.id, d.workspace_id, d.decision_type, d.input_context, d.reasoning
+        FROM agent_decisions d
+        WHERE NOT EXISTS (SELECT 1 FROM agent_decision_vectors v WHERE v.decision_id = d.id)
+        """
+    )
+    while True:
+        rows = cursor.fetchmany(5000)
+        if not rows:
+            break
+        store_decision_vectors(conn, [
+            (decision_id, workspace_id, decision_type, decision_text(input_context, reasoning))
+            for decision_id, workspace_id, decision_type, input_context, reasoning in rows
+        ])
+
+
+@migration(3, "full-text search indexes")
+def _full_text_search(conn: sqlite3.Connection, schema: SchemaObjects) -> None:
+    schema.ensure(conn, "table", "fts_suspended")
+    for fts_table in schema.names("table", r"_fts$"):
+        if schema.ensure(conn, "table", fts_table):
+            conn.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+    schema.ensure_all(conn, "trigger", r"_fts_a[iud]$")
+
+
+@migration(4, "rule bundles, rule sync state and shared rate limits")
+def _rules_and_rate_limits(conn: sqlite3.Connection, schema: SchemaObjects) -> None:
+    for table in ("rule_bundles", "rule_sync_state", "rate_limit_buckets"):
+        schema.ensure(conn, "table", table)
+
+
+# Recomputes agent_intelligence_counters from the agent tables (see agent_brain.rebuild_intelligence_counters)
+BACKFILL_INTELLIGENCE_COUNTERS = """
+INSERT INTO agent_intelligence_counters (
+    workspace_key, knowledge_count, confident_knowledge_count,
+    decision_count, pattern_count, state_count, memory_count
+)
+SELECT workspace_key, SUM(k), SUM(ck), SUM(d), SUM(p), SUM(st), SUM(m)
+FROM (
+    SELECT COALESCE(workspace_id, 0) AS workspace_key, 1 AS k,
+           COALESCE(confidence >= 0.5, 0) AS ck, 0 AS d, 0 AS p, 0 AS st, 0 AS m
+    FROM agent_knowledge
+    UNION ALL
+    SELECT COALESCE(workspace_id, 0), 0, 0, 1, 0, 0, 0 FROM agent_decisions
+    UNION ALL
+    SELECT COALESCE(workspace_id, 0), 0, 0, 0, 1, 0, 0 FROM agent_patterns
+    UNION ALL
+    SELECT COALESCE(workspace_id, 0), 0, 0, 0, 0, 1, 0 FROM agent_state
+    UNION ALL
+    SELECT COALESCE(workspace_id, 0), 0, 0, 0, 0, 0, 1 FROM agent_memories
+)
+GROUP BY workspace_key
+"""
+
+
+@migration(5, "agent intelligence counters")
+def _intelligence_counters(conn: sqlite3.Connection, schema: SchemaObjects) -> None:
+    if schema.ensure(conn, "table", "agent_intelligence_counters"):
+        conn.execute(BACKFILL_INTELLIGENCE_COUNTERS)
+    schema.ensure_all(conn, "trigger", r"_ic_a[iud]$")
+    schema.ensure(conn, "view", "view_agent_intelligence")
+
+
+@migration(6, "composite and partial indexes for hot queries")
+def _query_indexes(conn: sqlite3.Connection, schema: SchemaObjects) -> None:
+    for index in ("idx_cursor_rules_active", "idx_integrations_active", "idx_rule_docs_file",
+                  "idx_knowledge_topic", "idx_knowledge_confidence"):
+        conn.execute(f"DROP INDEX IF EXISTS {index}")
+    schema.ensure_all(conn, "index")
+
+
+@migration(7, "change counter for decision vector updates and deletes")
+def _decision_vector_counter(conn: sqlite3.Connection, schema: SchemaObjects) -> None:
+    conn.execute("INSERT OR IGNORE INTO change_counters (table_name) VALUES ('agent_decision_vectors')")
+    schema.ensure_all(conn, "trigger", r"^agent_decision_vectors_cc_a[ud]$")
+
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def _is_empty(conn: sqlite3.Connection) -> bool:
+    return conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    ).fetchone()[0] == 0
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Return the database's PRAGMA user_version."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db_path: Path, schema_path: Optional[Path] = None,
+            target: int = SCHEMA_VERSION) -> Dict[str, object]:
+    """Bring a database up to ``target``, creating it from schema.sql if empty.
+    
+    Pending migrations run in one BEGIN IMMEDIATE transaction together with
+    the user_version bump, so a failure leaves the database untouched and
+    concurrent starters serialise: the second one finds nothing to do.
+    Index rebuilds happen inside that transaction; under WAL, readers keep
+    working against the old indexes until it commits.
+    
+    Args:
+        db_path: Path to SQLite database file
+        schema_path: Path to schema.sql (defaults to the workspace root)
+        target: Version to migrate to (defaults to the latest)
+    
+    Returns:
+        dict: from_version, to_version, applied (migration descriptions)
+              and created (True if the database was built from schema.sql)
+    
+    Raises:
+        RuntimeError: If the database is newer than this code
+        sqlite3.Error: If a migration fails (nothing is committed)
+    """
+    schema_path = Path(schema_path) if schema_path is not None else SCHEMA_PATH
+    conn = sqlite3.connect(str(db_path), timeout=30.0, isolation_level=None)
+    try:
+        current = get_schema_version(conn)
+        if current == target:
+            return {'from_version': current, 'to_version': current, 'applied': [], 'created': False}
+        if current > target:
+            raise RuntimeError(
+                f"Database {db_path} is at schema version {current}, newer than this code ({target})"
+            )
+        
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA foreign_keys = OFF")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-read under the write lock: another process may have just migrated
+            current = get_schema_version(conn)
+            applied: List[str] = []
+            created = False
+            if current < target:
+                schema_sql = schema_path.read_text(encoding="utf-8")
+                if current == 0 and _is_empty(conn) and target == SCHEMA_VERSION:
+                    _execute_script(conn, schema_sql)
+                    created = True
+                else:
+                    schema = SchemaObjects(schema_sql)
+                    for step in MIGRATIONS[current:target]:
+                        logger.info(f"Applying migration {step.version}: {step.description}")
+                        step.apply(conn, schema)
+                        applied.append(step.description)
+                conn.execute(f"PRAGMA user_version = {int(target)}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if applied:
+            conn.execute("PRAGMA optimize")
+        return {'from_version': current, 'to_version': target, 'applied': applied, 'created': created}
+    finally:
+        conn.close()
+
+
+def _execute_script(conn: sqlite3.Connection, script: str) -> None:
+    """Run a multi-statement script inside the caller's transaction.
+    
+    sqlite3's executescript() would COMMIT first, so statements are split
+    with complete_statement() and executed one by one instead.
+    """
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
@@ -0,0 +1,194 @@
+"""
+Query-shape audit - EXPLAIN QUERY PLAN over the helpers' SQL.
+Flags statements whose plan needs a temp B-tree (sort/group/distinct) or
+scans a whole table, so index regressions show up before they hit a large
+database. Run: python helpers/query_audit.py [--db PATH] [--all]
+"""
+
+import re
+import ast
+import sys
+import sqlite3
+import importlib
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple, Sequence, Any
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from helpers.statements import iter_statements
+
+SCHEMA_PATH = Path(__file__).parent.parent / "schema.sql"
+
+AUDITED_MODULES = ('helpers.db_helper', 'helpers.agent_brain')
+
+# Findings that are expected, with the reason they are acceptable
+ALLOWED = {
+    'db_helper.list_workspaces': 'lists every workspace (walks the name index, no sort)',
+    'db_helper.list_templates': 'lists every template (walks the name index, no sort)',
+    'db_helper._reserve_ids': 'sqlite_sequence has no index; one row per AUTOINCREMENT table',
+    'agent_brain._last_id': 'sqlite_sequence has no index; one row per AUTOINCREMENT table',
+}
+
+# Statements that have no query plan worth auditing
+_SKIPPED_PREFIXES = ('PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE',
+                     'CREATE', 'DROP', 'ATTACH', 'DETACH', 'VACUUM', 'ANALYZE')
+
+
+class _SqlCollector(ast.NodeVisitor):
+    """Collects string-literal SQL passed to execute()/executemany(), by top-level function."""
+    
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.function: Optional[str] = None
+        self.found: List[Tuple[str, str]] = []
+    
+    def _visit_function(self, node) -> None:
+        if self.function is not None:
+            self.generic_visit(node)
+            return
+        self.function = node.name
+        self.generic_visit(node)
+        self.function = None
+    
+    visit_FunctionDef = visit_AsyncFunctionDef = _visit_function
+    
+    def visit_Call(self, node: ast.Call) -> None:
+        if (self.function is not None
+                and isinstance(node.func, ast.Attribute)
+                and node.func.attr in ('execute', 'executemany')
+                and node.args
+                and isinstance(node.args[0], ast.Constant)
+                and isinstance(node.args[0].value, str)):
+            self.found.append((f"{self.prefix}.{self.function}", ' '.join(node.args[0].value.split())))
+        self.generic_visit(node)
+
+
+def collect_statements(modules: Sequence[str] = AUDITED_MODULES) -> List[Tuple[str, str]]:
+    """Gather the SQL issued by ``modules``.
+    
+    Registered statements (see helpers.statements) are taken from the
+    registry; literal SQL passed straight to execute() is found by parsing the
+    module source. SQL built at runtime (f-strings) is not covered.
+    
+    Args:
+        modules: Importable module names
+    
+    Returns:
+        list: (name, sql) pairs; literal statements are named
+              ``<module>.<function>`` with ``#n`` for repeats
+    """
+    collected: List[Tuple[str, str]] = []
+    for module_name in modules:
+        module = importlib.import_module(module_name)
+        prefix = module_name.rsplit('.', 1)[-1]
+        collected.extend((s.name, s.sql) for s in iter_statements(prefix + '.'))
+        
+        collector = _SqlCollector(prefix)
+        collector.visit(ast.parse(Path(module.__file__).read_text(encoding='utf-8')))
+        seen: Dict[str, int] = {}
+        for name, sql in collector.found:
+            seen[name] = seen.get(name, 0) + 1
+            collected.append((name if seen[name] == 1 else f"{name}#{seen[name]}", sql))
+    
+    return [(name, sql) for name, sql in collected
+            if not sql.lstrip().upper().startswith(_SKIPPED_PREFIXES)]
+
+
+def _null_params(sql: str):
+    """NULL bindings for every placeholder (plans don't depend on the values)."""
+    stripped = re.sub(r"'(?:[^']|'')*'", "''", sql)
+    named = re.findall(r"[:@$]([A-Za-z_]\w*)", stripped)
+    if named:
+        return {name: None for name in named}
+    return (None,) * stripped.count('?')
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> List[str]:
+    """Return the EXPLAIN QUERY PLAN detail lines for ``sql``."""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", _null_params(sql)).fetchall()
+    return [row[3] for row in rows]
+
+
+def plan_issues(plan: Sequence[str]) -> List[str]:
+    """Pick out the plan steps that sort in a temp B-tree or scan a whole table."""
+    issues = []
+    for detail in plan:
+        if 'TEMP B-TREE' in detail:
+            issues.append(detail)
+        elif detail.startswith('SCAN ') and not detail.startswith(('SCAN CONSTANT ROW', 'SCAN (')):
+            issues.append(detail)
+    return issues
+
+
+def _open_audit_db(db_path: Optional[Path]) -> sqlite3.Connection:
+    if db_path is not None:
+        return sqlite3.connect(f"file:{Path(db_path)}?mode=ro", uri=True)
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(SCHEMA_PATH.read_text(encoding='utf-8'))
+    return conn
+
+
+def audit_queries(db_path: Optional[Path] = None, modules: Sequence[str] = AUDITED_MODULES,
+                  include_allowed: bool = False) -> Dict[str, Any]:
+    """EXPLAIN every statement in ``modules`` and report bad query shapes.
+    
+    Args:
+        db_path: Database whose indexes to plan against (read-only); defaults
+                 to a fresh in-memory database built from schema.sql
+        modules: Modules whose SQL to audit
+        include_allowed: Also report findings listed in ALLOWED
+    
+    Returns:
+        dict: statements (count audited), findings (name, sql, issues and,
+              for allowed ones, the reason) and errors (statements that
+              failed to plan, e.g. a table missing from the database)
+    """
+    findings = []
+    errors = []
+    statements = collect_statements(modules)
+    conn = _open_audit_db(db_path)
+    try:
+        for name, sql in statements:
+            try:
+                issues = plan_issues(explain(conn, sql))
+            except sqlite3.Error as e:
+                errors.append({'name': name, 'sql': sql, 'error': str(e)})
+                continue
+            if not issues:
+                continue
+            reason = ALLOWED.get(name.split('#', 1)[0])
+            if reason is not None and not include_allowed:
+                continue
+            finding = {'name': name, 'sql': sql, 'issues': issues}
+            if reason is not None:
+                finding['allowed'] = reason
+            findings.append(finding)
+    finally:
+        conn.close()
+    
+    return {'statements': len(statements), 'findings': findings, 'errors': errors}
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Report statements that sort in temp B-trees or scan whole tables")
+    parser.add_argument("--db", type=Path, help="Audit against this database instead of schema.sql")
+    parser.add_argument("--all", action="store_true", help="Include allowed findings")
+    args = parser.parse_args()
+    
+    report = audit_queries(args.db, include_allowed=args.all)
+    for finding in report["findings"]:
+        marker = "ok " if "allowed" in finding else "!! "
+        print(f"{marker}{finding['name']}: {finding['sql'][:100]}")
+        for issue in finding["issues"]:
+            print(f"      {issue}")
+        if "allowed" in finding:
+            print(f"      allowed: {finding['allowed']}")
+    for error in report["errors"]:
+        print(f"?? {error['name']}: {error['error']}")
+    
+    problems = [f for f in report["findings"] if "allowed" not in f]
+    print(f"\n{report['statements']} statements audited, {len(problems)} with problems, "
+          f"{len(report['errors'])} could not be planned")
+    sys.exit(1 if problems or report["errors"] else 0)
@@ -2,16 +2,26 @@
 Reliability enhancements and input validation for Dexter workspace.
 Includes retry logic, rate limiting, safety checks, error recovery, action verification, and validation.
 Consolidated for convenience - security blocks minimized.
+
+retry_with_backoff, rate_limit, log_execution_time, recover_from_error and
+require_verification also accept coroutine functions: waits use asyncio.sleep
+and database audit writes run in a worker thread, so the event loop is never
+blocked.
 """
 
+import os
 import time
+import random
+import asyncio
+import inspect
+import sqlite3
+import threading
 import functools
 import logging
 import traceback
 import re
 import json
 from typing import Callable, Any, Optional
-from collections import defaultdict
 from functools import wraps
 from pathlib import Path
 
@@ -33,8 +43,24 @@ class ValidationError(Exception):
     pass
 
 
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because its circuit is open."""
+    pass
+
+
 class RateLimiter:
-    """Rate limiter for API operations."""
+    """Rate limiter for API operations.
+    
+    Uses GCRA (the generic cell rate algorithm, an equivalent formulation of a
+    token bucket): each key stores a single "theoretical arrival time", so a
+    check is O(1) and idle keys cost nothing once evicted. Up to max_calls
+    calls may burst at once, refilling at max_calls per time_window.
+    """
+    
+    # Sweep idle keys once the table has grown this much since the last sweep
+    MIN_SWEEP_SIZE = 1024
+    _clock = staticmethod(time.monotonic)
+    _blocking_reserve = False  # True if _reserve does I/O (see SharedRateLimiter)
     
     def __init__(self, max_calls: int, time_window: int):
         """Initialize rate limiter.
@@ -43,9 +69,90 @@ class RateLimiter:
             max_calls: Maximum number of calls allowed
             time_window: Time window in seconds
         """
+        if max_calls <= 0 or time_window <= 0:
+            raise ValueError("max_calls and time_window must be positive")
         self.max_calls = max_calls
         self.time_window = time_window
-        self.calls = defaultdict(list)
+        self._interval = time_window / max_calls
+        self._tolerance = time_window - self._interval
+        self._tat = {}
+        self._sweep_at = self.MIN_SWEEP_SIZE
+        self._lock = threading.Lock()
+    
+    def _reserve(self, key: str, now: float) -> float:
+        """Take a slot for key if one is free.
+        
+        Returns:
+            float: 0.0 if the call was admitted, else seconds until it would be
+        """
+        with self._lock:
+            tat = max(self._tat.get(key, now), now)
+            wait = tat - self._tolerance - now
+            if wait > 0:
+                return wait
+            self._tat[key] = tat + self._interval
+            if len(self._tat) >= self._sweep_at:
+                self._evict_idle(now)
+            return 0.0
+    
+    def _evict_idle(self, now: float) -> None:
+        """Drop keys whose bucket has fully refilled (caller holds the lock)."""
+        self._tat = {k: tat for k, tat in self._tat.items() if tat > now}
+        self._sweep_at = max(self.MIN_SWEEP_SIZE, 2 * len(self._tat))
+    
+    def try_acquire(self, key: str) -> bool:
+        """Take a call slot for key without blocking.
+        
+        Args:
+            key: Rate limit key (e.g., 'api_call', 'db_write')
+            
+        Returns:
+            bool: True if the call is allowed
+        """
+        return self._reserve(key, self._clock()) == 0.0
+    
+    def acquire(self, key: str, timeout: Optional[float] = None) -> bool:
+        """Wait until a call slot for key is free.
+        
+        Args:
+            key: Rate limit key
+            timeout: Maximum seconds to wait (None waits indefinitely)
+            
+        Returns:
+            bool: True if a slot was taken, False on timeout
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            now = self._clock()
+            wait = self._reserve(key, now)
+            if wait == 0.0:
+                return True
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+    
+    async def acquire_async(self, key: str, timeout: Optional[float] = None) -> bool:
+        """Like acquire(), but waits with asyncio.sleep.
+        
+        Args:
+            key: Rate limit key
+            timeout: Maximum seconds to wait (None waits indefinitely)
+            
+        Returns:
+            bool: True if a slot was taken, False on timeout
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            now = self._clock()
+            if self._blocking_reserve:
+                wait = await asyncio.to_thread(self._reserve, key, now)
+            else:
+                wait = self._reserve(key, now)
+            if wait == 0.0:
+                return True
+            if deadline is not None and now + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
     
     def check_limit(self, key: str) -> None:
         """Check if rate limit is exceeded.
@@ -56,34 +163,287 @@ class RateLimiter:
         Raises:
             RateLimitError: If rate limit is exceeded
         """
-        now = time.time()
-        window_start = now - self.time_window
-        
-        # Remove old calls outside the window
-        self.calls[key] = [call_time for call_time in self.calls[key] if call_time > window_start]
-        
-        # Check limit
-        if len(self.calls[key]) >= self.max_calls:
+        if not self.try_acquire(key):
             raise RateLimitError(
                 f"Rate limit exceeded for '{key}': {self.max_calls} calls per {self.time_window}s"
             )
+
+
+class SharedRateLimiter(RateLimiter):
+    """Rate limiter whose buckets are shared by all processes using one database.
+    
+    Bucket state lives in the rate_limit_buckets table and is updated with a
+    single upsert statement, so admission is atomic across worker processes.
+    Falls back to in-process limiting if the table is unavailable.
+    """
+    
+    _clock = staticmethod(time.time)  # must be comparable across processes
+    _blocking_reserve = True
+    
+    def __init__(self, max_calls: int, time_window: int, name: str,
+                 db_path: Optional[Path] = None):
+        """Initialize shared rate limiter.
+        
+        Args:
+            max_calls: Maximum number of calls allowed
+            time_window: Time window in seconds
+            name: Limiter name; limiters with the same name share buckets
+            db_path: Database holding the buckets (defaults to DB_PATH)
+        """
+        super().__init__(max_calls, time_window)
+        self.name = name
+        self.db_path = db_path
+        self._writes = 0
+        self._fallback = False
+    
+    def _reserve(self, key: str, now: float) -> float:
+        if self._fallback:
+            return super()._reserve(key, now)
+        
+        from helpers.db_helper import get_pool
         
-        # Record this call
-        self.calls[key].append(now)
+        pool = get_pool(self.db_path)
+        conn = pool.acquire()
+        try:
+            row = conn.execute(
+                """
+                INSERT INTO rate_limit_buckets (limiter, key, tat)
+                VALUES (:limiter, :key, :now + :interval)
+                ON CONFLICT(limiter, key) DO UPDATE SET tat = max(tat, :now) + :interval
+                WHERE max(tat, :now) - :tolerance <= :now
+                RETURNING tat
+                """,
+                {"limiter": self.name, "key": key, "now": now,
+                 "interval": self._interval, "tolerance": self._tolerance}
+            ).fetchone()
+            if row is None:
+                tat = conn.execute(
+                    "SELECT tat FROM rate_limit_buckets WHERE limiter = ? AND key = ?",
+                    (self.name, key)
+                ).fetchone()[0]
+                conn.commit()
+                return max(tat - self._tolerance - now, 1e-3)
+            
+            with self._lock:
+                self._writes += 1
+                sweep = self._writes % self.MIN_SWEEP_SIZE == 0
+            if sweep:
+                conn.execute(
+                    "DELETE FROM rate_limit_buckets WHERE limiter = ? AND tat <= ?",
+                    (self.name, now)
+                )
+            conn.commit()
+            return 0.0
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            if "no such table" not in str(e):
+                raise
+            logger.warning(f"rate_limit_buckets missing, limiter '{self.name}' is per-process only")
+            self._fallback = True
+            return super()._reserve(key, now)
+        finally:
+            pool.release(conn)
+
+
+def _make_limiter(max_calls: int, time_window: int, name: str) -> RateLimiter:
+    """Create a module-level limiter, shared across processes if configured."""
+    if os.getenv("DEXTER_SHARED_RATE_LIMITS", "").lower() in ("1", "true", "yes"):
+        return SharedRateLimiter(max_calls, time_window, name)
+    return RateLimiter(max_calls, time_window)
 
 
 # Global rate limiters
-_db_write_limiter = RateLimiter(max_calls=100, time_window=60)  # 100 writes per minute
-_api_call_limiter = RateLimiter(max_calls=50, time_window=60)    # 50 API calls per minute
+_db_write_limiter = _make_limiter(max_calls=100, time_window=60, name='db_write')  # 100 writes per minute
+_api_call_limiter = _make_limiter(max_calls=50, time_window=60, name='api_call')    # 50 API calls per minute
+
 
+def is_transient_db_error(exc: BaseException) -> bool:
+    """True for SQLite errors that go away on their own (lock/busy contention)."""
+    message = str(exc).lower()
+    return isinstance(exc, sqlite3.OperationalError) and (
+        "database is locked" in message or "database is busy" in message
+        or "database table is locked" in message
+    )
+
+
+class RetryPolicy:
+    """Retry policy with jittered exponential backoff and an overall deadline.
+    
+    Exceptions are classified in order: never_retry always propagates
+    immediately, then retry_if (if given) decides, else anything in retry_on is
+    retried. Jitter spreads retries of workers that failed together (e.g. on
+    the same SQLite lock) instead of having them all retry at the same instant:
+    
+    - 'full': sleep uniform(0, min(max_delay, base_delay * multiplier**n))
+    - 'decorrelated': sleep min(max_delay, uniform(base_delay, 3 * previous sleep))
+    - 'none': plain exponential backoff
+    
+    Usable as a decorator (sync or coroutine functions) or via call().
+    """
+    
+    JITTER_MODES = ('full', 'decorrelated', 'none')
+    
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.1,
+                 max_delay: float = 10.0, multiplier: float = 2.0,
+                 jitter: str = 'full', deadline: Optional[float] = None,
+                 retry_on: tuple = (Exception,), never_retry: tuple = (),
+                 retry_if: Optional[Callable[[BaseException], bool]] = None,
+                 on_attempt: Optional[Callable[[int, Optional[BaseException], float], None]] = None,
+                 name: Optional[str] = None):
+        """Initialize retry policy.
+        
+        Args:
+            max_attempts: Maximum number of attempts (including the first)
+            base_delay: Initial delay in seconds
+            max_delay: Cap on any single delay
+            multiplier: Backoff growth factor per attempt
+            jitter: 'full', 'decorrelated' or 'none'
+            deadline: Maximum total seconds across all attempts and waits
+                      (None for no limit); a retry that would overrun it is
+                      not attempted
+            retry_on: Exceptions that may be retried
+            never_retry: Exceptions that are never retried (checked first)
+            retry_if: Optional predicate deciding whether an exception is retried
+            on_attempt: Hook called as on_attempt(attempt, exception, delay)
+                        after each failed attempt (delay is 0.0 when giving up)
+            name: Name to report attempt counts under in get_reliability_metrics()
+        """
+        if jitter not in self.JITTER_MODES:
+            raise ValueError(f"jitter must be one of {self.JITTER_MODES}, got {jitter!r}")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline = deadline
+        self.retry_on = retry_on
+        self.never_retry = never_retry
+        self.retry_if = retry_if
+        self.on_attempt = on_attempt
+        self.name = name
+        self._stats = {'calls': 0, 'attempts': 0, 'retries': 0, 'successes': 0, 'failures': 0}
+        self._stats_lock = threading.Lock()
+        if name:
+            _retry_policies[name] = self
+    
+    def should_retry(self, exc: BaseException) -> bool:
+        """Classify an exception as retryable or not."""
+        if isinstance(exc, self.never_retry):
+            return False
+        if not isinstance(exc, self.retry_on):
+            return False
+        return self.retry_if(exc) if self.retry_if is not None else True
+    
+    def next_delay(self, attempt: int, previous: float) -> float:
+        """Delay before attempt + 1 (attempt counts from 1)."""
+        if self.jitter == 'decorrelated':
+            return min(self.max_delay, random.uniform(self.base_delay, max(previous, self.base_delay) * 3))
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return random.uniform(0, delay) if self.jitter == 'full' else delay
+    
+    def _count(self, **deltas) -> None:
+        with self._stats_lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+    
+    def _after_failure(self, func: Callable, attempt: int, exc: BaseException,
+                       started: float, previous: float) -> Optional[float]:
+        """Decide what to do after a failed attempt.
+        
+        Returns:
+            float: Seconds to wait before retrying, or None to give up
+        """
+        delay = None
+        if attempt < self.max_attempts and self.should_retry(exc):
+            delay = self.next_delay(attempt, previous)
+            if self.deadline is not None and time.monotonic() - started + delay > self.deadline:
+                delay = None
+        
+        if self.on_attempt is not None:
+            self.on_attempt(attempt, exc, delay or 0.0)
+        if delay is None:
+            self._count(failures=1)
+            if self.should_retry(exc):
+                logger.error(f"All {attempt} attempts failed for {func.__name__}: {exc}")
+            return None
+        
+        self._count(retries=1)
+        logger.warning(
+            f"Attempt {attempt}/{self.max_attempts} failed for {func.__name__}: {exc}. "
+            f"Retrying in {delay:.3f}s..."
+        )
+        return delay
+    
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """Call func, retrying according to the policy."""
+        started = time.monotonic()
+        delay = self.base_delay
+        self._count(calls=1)
+        for attempt in range(1, self.max_attempts + 1):
+            self._count(attempts=1)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                delay = self._after_failure(func, attempt, e, started, delay)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._count(successes=1)
+            return result
+    
+    async def call_async(self, func: Callable, *args, **kwargs) -> Any:
+        """Await func(*args, **kwargs), retrying with asyncio.sleep."""
+        started = time.monotonic()
+        delay = self.base_delay
+        self._count(calls=1)
+        for attempt in range(1, self.max_attempts + 1):
+            self._count(attempts=1)
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                delay = self._after_failure(func, attempt, e, started, delay)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._count(successes=1)
+            return result
+    
+    def __call__(self, func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await self.call_async(func, *args, **kwargs)
+            
+            return async_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.call(func, *args, **kwargs)
+        
+        return wrapper
+    
+    def stats(self) -> dict:
+        """Attempt counts for the metrics surface."""
+        with self._stats_lock:
+            return dict(self._stats)
+
+
+# Registry of named retry policies, for get_reliability_metrics()
+_retry_policies = {}
 
 def retry_with_backoff(max_retries: int = 3, initial_delay: float = 1.0, 
                       backoff_factor: float = 2.0, 
-                      exceptions: tuple = (Exception,)):
+                      exceptions: tuple = (Exception,),
+                      jitter: str = 'full',
+                      deadline: Optional[float] = None,
+                      policy: Optional[RetryPolicy] = None):
     """Decorator for retrying functions with exponential backoff.
     
     Best practice: Specify specific exceptions (e.g., sqlite3.OperationalError) 
     rather than generic Exception to avoid retrying on programming errors.
+    sqlite3.IntegrityError is never retried.
     
     Args:
         max_retries: Maximum number of retry attempts
@@ -93,34 +453,24 @@ def retry_with_backoff(max_retries: int = 3, initial_delay: float = 1.0,
                    Defaults to Exception, but should be specific exceptions
                    for production use (e.g., sqlite3.OperationalError, 
                    requests.RequestException, etc.)
+        jitter: Jitter mode ('full', 'decorrelated' or 'none'), see RetryPolicy
+        deadline: Maximum total seconds across all attempts (None for no limit)
+        policy: RetryPolicy to use instead of building one from the arguments
+    
+    Coroutine functions are retried with asyncio.sleep between attempts.
     """
-    def decorator(func: Callable) -> Callable:
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            delay = initial_delay
-            last_exception = None
-            
-            for attempt in range(max_retries + 1):
-                try:
-                    return func(*args, **kwargs)
-                except exceptions as e:
-                    last_exception = e
-                    if attempt < max_retries:
-                        logger.warning(
-                            f"Attempt {attempt + 1}/{max_retries + 1} failed for {func.__name__}: {e}. "
-                            f"Retrying in {delay}s..."
-                        )
-                        time.sleep(delay)
-                        delay *= backoff_factor
-                    else:
-                        logger.error(
-                            f"All {max_retries + 1} attempts failed for {func.__name__}: {e}"
-                        )
-            
-            raise last_exception
-        
-        return wrapper
-    return decorator
+    if policy is None:
+        policy = RetryPolicy(
+            max_attempts=max_retries + 1,
+            base_delay=initial_delay,
+            max_delay=float('inf'),
+            multiplier=backoff_factor,
+            jitter=jitter,
+            deadline=deadline,
+            retry_on=exceptions,
+            never_retry=(sqlite3.IntegrityError,),
+        )
+    return policy
 
 
 def require_safety_check(check_func: Optional[Callable] = None):
@@ -160,23 +510,289 @@ def require_safety_check(check_func: Optional[Callable] = None):
     return decorator
 
 
-def rate_limit(limiter: RateLimiter, key: str):
+def rate_limit(limiter: RateLimiter, key: str, wait: Optional[float] = None):
     """Decorator to rate limit function calls.
     
     Args:
         limiter: RateLimiter instance
         key: Rate limit key
+        wait: Seconds to wait for a free slot before raising RateLimitError
+              (None raises immediately). Coroutine functions wait with
+              asyncio.sleep.
     """
+    def _raise():
+        raise RateLimitError(
+            f"Rate limit exceeded for '{key}': {limiter.max_calls} calls per {limiter.time_window}s"
+        )
+    
     def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not await limiter.acquire_async(key, timeout=wait or 0):
+                    _raise()
+                return await func(*args, **kwargs)
+            
+            return async_wrapper
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            limiter.check_limit(key)
+            if wait:
+                if not limiter.acquire(key, timeout=wait):
+                    _raise()
+            else:
+                limiter.check_limit(key)
             return func(*args, **kwargs)
         
         return wrapper
     return decorator
 
 
+class _CircuitState:
+    """Per-key circuit state with a bucketed rolling outcome window."""
+    
+    __slots__ = ('state', 'opened_at', 'trial_calls', 'buckets', 'bucket_start',
+                 'successes', 'failures', 'rejected', 'opened_count')
+    
+    def __init__(self, buckets: int):
+        self.state = CircuitBreaker.CLOSED
+        self.opened_at = 0.0
+        self.trial_calls = 0
+        self.buckets = [[0, 0] for _ in range(buckets)]  # [successes, failures]
+        self.bucket_start = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened_count = 0
+
+
+class CircuitBreaker:
+    """Circuit breaker for calls to external integrations.
+    
+    Each key (e.g. 'hubspot', 'tavily') has its own circuit. While closed,
+    outcomes are counted over a rolling window; once at least min_calls were
+    made and the failure rate reaches failure_threshold the circuit opens and
+    calls fail immediately with CircuitOpenError. After reset_timeout seconds
+    it goes half-open and lets half_open_max_calls trial calls through: a
+    success closes the circuit, a failure opens it again.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    WINDOW_BUCKETS = 10
+    
+    def __init__(self, name: str, failure_threshold: float = 0.5, min_calls: int = 5,
+                 window: float = 60.0, reset_timeout: float = 30.0,
+                 half_open_max_calls: int = 1, exceptions: tuple = (Exception,)):
+        """Initialize circuit breaker.
+        
+        Args:
+            name: Breaker name (used in metrics)
+            failure_threshold: Failure rate (0-1) that opens the circuit
+            min_calls: Minimum calls in the window before the rate is considered
+            window: Rolling window in seconds for the failure rate
+            reset_timeout: Seconds an open circuit waits before going half-open
+            half_open_max_calls: Trial calls allowed while half-open
+            exceptions: Exceptions that count as failures (other exceptions
+                        count as successes, since the service did answer)
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.exceptions = exceptions
+        self._bucket_width = window / self.WINDOW_BUCKETS
+        self._states = {}
+        self._lock = threading.Lock()
+        _circuit_breakers[name] = self
+    
+    def _state(self, key: str, now: float) -> _CircuitState:
+        """Get key's state with the window advanced to now (caller holds the lock)."""
+        st = self._states.get(key)
+        if st is None:
+            st = self._states[key] = _CircuitState(self.WINDOW_BUCKETS)
+            st.bucket_start = now
+        
+        elapsed = int((now - st.bucket_start) // self._bucket_width)
+        if elapsed > 0:
+            for _ in range(min(elapsed, self.WINDOW_BUCKETS)):
+                expired = st.buckets.pop(0)
+                st.successes -= expired[0]
+                st.failures -= expired[1]
+                st.buckets.append([0, 0])
+            st.bucket_start += elapsed * self._bucket_width
+        
+        if st.state != self.CLOSED and now - st.opened_at >= self.reset_timeout:
+            # Open -> half-open; also frees trial slots whose outcome never came back
+            st.state = self.HALF_OPEN
+            st.opened_at = now
+            st.trial_calls = 0
+        return st
+    
+    def before_call(self, key: str) -> None:
+        """Admit a call for key or fail fast.
+        
+        Raises:
+            CircuitOpenError: If the circuit is open (or half-open with its
+                              trial calls in flight)
+        """
+        with self._lock:
+            st = self._state(key, time.monotonic())
+            if st.state == self.CLOSED:
+                return
+            if st.state == self.HALF_OPEN and st.trial_calls < self.half_open_max_calls:
+                st.trial_calls += 1
+                return
+            st.rejected += 1
+        raise CircuitOpenError(f"Circuit '{self.name}' is open for '{key}'")
+    
+    def record_success(self, key: str) -> None:
+        """Record a successful call for key."""
+        with self._lock:
+            st = self._state(key, time.monotonic())
+            if st.state == self.HALF_OPEN:
+                logger.info(f"Circuit '{self.name}' closed for '{key}'")
+                self._reset(st)
+                return
+            st.buckets[-1][0] += 1
+            st.successes += 1
+    
+    def record_failure(self, key: str) -> None:
+        """Record a failed call for key, opening the circuit if needed."""
+        with self._lock:
+            now = time.monotonic()
+            st = self._state(key, now)
+            st.buckets[-1][1] += 1
+            st.failures += 1
+            total = st.successes + st.failures
+            if st.state == self.HALF_OPEN or (
+                st.state == self.CLOSED and total >= self.min_calls
+                and st.failures / total >= self.failure_threshold
+            ):
+                st.state = self.OPEN
+                st.opened_at = now
+                st.opened_count += 1
+                logger.warning(
+                    f"Circuit '{self.name}' opened for '{key}' "
+                    f"({st.failures}/{total} failures in {self.window}s)"
+                )
+    
+    def _reset(self, st: _CircuitState) -> None:
+        st.state = self.CLOSED
+        st.trial_calls = 0
+        st.buckets = [[0, 0] for _ in range(self.WINDOW_BUCKETS)]
+        st.successes = st.failures = 0
+    
+    def state(self, key: str) -> str:
+        """Current state of key's circuit ('closed', 'open' or 'half_open')."""
+        with self._lock:
+            return self._state(key, time.monotonic()).state
+    
+    def reset(self, key: Optional[str] = None) -> None:
+        """Close key's circuit (or all circuits) and clear its counts."""
+        with self._lock:
+            if key is None:
+                self._states.clear()
+            else:
+                self._states.pop(key, None)
+    
+    def metrics(self) -> dict:
+        """Per-key state and counts for the metrics surface."""
+        with self._lock:
+            now = time.monotonic()
+            result = {}
+            for key in list(self._states):
+                st = self._state(key, now)
+                total = st.successes + st.failures
+                result[key] = {
+                    'state': st.state,
+                    'successes': st.successes,
+                    'failures': st.failures,
+                    'failure_rate': round(st.failures / total, 3) if total else 0.0,
+                    'rejected': st.rejected,
+                    'opened_count': st.opened_count,
+                }
+            return result
+
+
+# Registry of breakers by name, for get_reliability_metrics()
+_circuit_breakers = {}
+
+# Global circuit breaker for integration clients, keyed by integration type
+_integration_breaker = CircuitBreaker('integrations')
+
+
+def circuit_breaker(breaker: CircuitBreaker, key: str):
+    """Decorator to guard calls with a circuit breaker.
+    
+    Place it outside retry_with_backoff so that an open circuit fails fast
+    instead of being retried, and a call that exhausts its retries counts as
+    one failure:
+    
+        @circuit_breaker(_integration_breaker, 'hubspot')
+        @retry_with_backoff(max_retries=3)
+        def list_contacts(): ...
+    
+    Args:
+        breaker: CircuitBreaker instance
+        key: Circuit key
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                breaker.before_call(key)
+                try:
+                    result = await func(*args, **kwargs)
+                except breaker.exceptions:
+                    breaker.record_failure(key)
+                    raise
+                except Exception:
+                    breaker.record_success(key)  # the service answered
+                    raise
+                breaker.record_success(key)
+                return result
+            
+            return async_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            breaker.before_call(key)
+            try:
+                result = func(*args, **kwargs)
+            except breaker.exceptions:
+                breaker.record_failure(key)
+                raise
+            except Exception:
+                breaker.record_success(key)  # the service answered
+                raise
+            breaker.record_success(key)
+            return result
+        
+        return wrapper
+    return decorator
+
+
+def get_reliability_metrics() -> dict:
+    """Get circuit breaker state and retry counts for monitoring (included in health_check).
+    
+    Returns:
+        dict: {'circuit_breakers': {name: {key: {state, successes, failures, ...}}},
+               'retry_policies': {name: {calls, attempts, retries, successes, failures}}}
+    """
+    return {
+        'circuit_breakers': {
+            name: breaker.metrics() for name, breaker in _circuit_breakers.items()
+        },
+        'retry_policies': {
+            name: policy.stats() for name, policy in _retry_policies.items()
+        },
+    }
+
+
 def verify_action_result(expected_result: Any = None, verify_func: Optional[Callable] = None):
     """Decorator to verify action results.
     
@@ -209,8 +825,22 @@ def log_execution_time(func: Callable) -> Callable:
     """Decorator to log function execution time.
     
     Args:
-        func: Function to wrap
+        func: Function to wrap (sync or coroutine function)
     """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start_time = time.time()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"{func.__name__} failed after {time.time() - start_time:.3f}s: {e}")
+                raise
+            logger.debug(f"{func.__name__} executed in {time.time() - start_time:.3f}s")
+            return result
+        
+        return async_wrapper
+    
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time.time()
@@ -278,32 +908,48 @@ def recover_from_error(strategy: str = RecoveryStrategy.FAIL,
             )(func)
         
         # For other strategies, use custom logic
+        def recover(e: Exception, kwargs: dict) -> None:
+            """Handle a failure; returns for SKIP, raises otherwise."""
+            error_msg = f"{func.__name__} failed: {e}"
+            
+            if strategy == RecoveryStrategy.ROLLBACK:
+                logger.error(f"{error_msg}. Attempting rollback...")
+                try:
+                    if 'action_id' in kwargs:
+                        ActionVerifier.rollback_action(
+                            kwargs['action_id'],
+                            f"Error recovery rollback: {str(e)}"
+                        )
+                except Exception as rollback_error:
+                    logger.error(f"Rollback failed: {rollback_error}")
+                raise e
+            
+            elif strategy == RecoveryStrategy.SKIP:
+                logger.warning(f"{error_msg}. Skipping operation.")
+            
+            else:  # FAIL
+                logger.error(f"{error_msg}. Failing operation.")
+                raise e
+        
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    # Rollback writes to the database, keep it off the event loop
+                    await asyncio.to_thread(recover, e, kwargs)
+                    return None
+            
+            return async_wrapper
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             try:
                 return func(*args, **kwargs)
             except Exception as e:
-                error_msg = f"{func.__name__} failed: {e}"
-                
-                if strategy == RecoveryStrategy.ROLLBACK:
-                    logger.error(f"{error_msg}. Attempting rollback...")
-                    try:
-                        if 'action_id' in kwargs:
-                            ActionVerifier.rollback_action(
-                                kwargs['action_id'],
-                                f"Error recovery rollback: {str(e)}"
-                            )
-                    except Exception as rollback_error:
-                        logger.error(f"Rollback failed: {rollback_error}")
-                    raise
-                
-                elif strategy == RecoveryStrategy.SKIP:
-                    logger.warning(f"{error_msg}. Skipping operation.")
-                    return None
-                
-                else:  # FAIL
-                    logger.error(f"{error_msg}. Failing operation.")
-                    raise
+                recover(e, kwargs)
+                return None
         
         return wrapper
     return decorator
@@ -335,7 +981,7 @@ def log_error_with_context(func: Callable) -> Callable:
             )
             
             # Log to action_log if workspace_id is available
-            workspace_id = kwargs.get('workspace_id') or (args[0] if args and isinstance(args[0], int) else None)
+            workspace_id = _audit_workspace_id(args, kwargs)
             if workspace_id:
                 try:
                     from helpers.db_helper import log_action
@@ -393,7 +1039,9 @@ class ActionVerifier:
         Returns:
             int: Checkpoint ID
         """
-        from helpers.db_helper import get_connection
+        from helpers.db_helper import get_connection, flush_action_log, pending_action_status
+        if pending_action_status(action_id) is not None:
+            flush_action_log()  # Checkpoint FK must see the action row
         with get_connection() as conn:
             cursor = conn.execute(
                 """
@@ -433,13 +1081,17 @@ class ActionVerifier:
         Returns:
             bool: True if action completed successfully
         """
-        from helpers.db_helper import get_connection
-        with get_connection() as conn:
-            cursor = conn.execute(
-                "SELECT status, description FROM action_log WHERE id = ?",
-                (action_id,)
-            )
-            row = cursor.fetchone()
+        from helpers.db_helper import flush_action_log, pending_action_status
+        
+        # A row still queued in the buffered writer is checked in memory
+        status = pending_action_status(action_id)
+        description = None
+        if status is None:
+            row = ActionVerifier._read_action(action_id)
+            if row is None:
+                # The row may be in a flush that has not committed yet
+                flush_action_log()
+                row = ActionVerifier._read_action(action_id)
             
             if not row:
                 logger.error(f"Action {action_id} not found")
@@ -447,16 +1099,26 @@ class ActionVerifier:
             
             status = row['status']
             description = row['description']
-            
-            if status != 'completed':
-                logger.warning(
-                    f"Action {action_id} did not complete successfully: "
-                    f"status={status}, description={description}"
-                )
-                return False
-            
-            logger.info(f"Action {action_id} verified as completed")
-            return True
+        
+        if status != 'completed':
+            logger.warning(
+                f"Action {action_id} did not complete successfully: "
+                f"status={status}, description={description}"
+            )
+            return False
+        
+        logger.info(f"Action {action_id} verified as completed")
+        return True
+    
+    @staticmethod
+    def _read_action(action_id: int) -> Optional[sqlite3.Row]:
+        """Return the (status, description) row of an action, or None."""
+        from helpers.db_helper import get_connection
+        with get_connection() as conn:
+            return conn.execute(
+                "SELECT status, description FROM action_log WHERE id = ?",
+                (action_id,)
+            ).fetchone()
     
     @staticmethod
     def rollback_action(action_id: int, rollback_info: str) -> bool:
@@ -469,7 +1131,7 @@ class ActionVerifier:
         Returns:
             bool: True if rollback successful
         """
-        from helpers.db_helper import get_connection
+        from helpers.db_helper import get_connection, update_action_status
         with get_connection() as conn:
             # Get checkpoint for this action
             cursor = conn.execute(
@@ -481,36 +1143,49 @@ class ActionVerifier:
             if not row:
                 logger.error(f"No checkpoint found for action {action_id}")
                 return False
-            
-            # Update action status
-            conn.execute(
-                """
-                UPDATE action_log 
-                SET status = 'cancelled', rollback_info = ?
-                WHERE id = ?
-                """,
-                (rollback_info, action_id)
-            )
-            
-            logger.info(f"Action {action_id} rolled back successfully")
-            return True
+        
+        # Goes through the buffered writer when enabled, so it is ordered
+        # after any status update still queued for this action
+        update_action_status(action_id, 'cancelled', rollback_info=rollback_info)
+        
+        logger.info(f"Action {action_id} rolled back successfully")
+        return True
 
 
-def require_verification(func: Callable) -> Callable:
+def require_verification(func: Optional[Callable] = None, *, lean: bool = False):
     """Decorator to require action verification and audit logging (compliance).
     
     This decorator ensures all actions are logged to action_log for compliance/audit purposes.
     Security: Preserves all security checks while adding compliance tracking.
     
+    Can be used bare (``@require_verification``) or with options
+    (``@require_verification(lean=True)``). Lean mode records the same final
+    statuses ('completed', or 'failed' with the error as description) but
+    inserts the row directly as 'in_progress' and verifies completion from
+    the final UPDATE's row count. That is two statements on one pooled
+    connection held for the life of the call, or no DB round-trips at all
+    when the buffered action_log writer is enabled.
+    
     Args:
         func: Function to wrap
+        lean: Use the single-connection, two-statement audit path
+    
+    Coroutine functions get the same audit rows, with database writes run in
+    a worker thread (buffered writes are applied in memory directly).
     """
+    if func is None:
+        return lambda f: require_verification(f, lean=lean)
+    if inspect.iscoroutinefunction(func):
+        return _async_verification(func, lean)
+    if lean:
+        return _lean_verification(func)
+    
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        from helpers.db_helper import get_connection, log_action
+        from helpers.db_helper import log_action, update_action_status
         
         # Log action start (compliance requirement)
-        workspace_id = kwargs.get('workspace_id') or (args[0] if args and isinstance(args[0], int) else None)
+        workspace_id = _audit_workspace_id(args, kwargs)
         action_type = func.__name__
         
         action_id = log_action(
@@ -522,11 +1197,7 @@ def require_verification(func: Callable) -> Callable:
         
         try:
             # Update status to in_progress
-            with get_connection() as conn:
-                conn.execute(
-                    "UPDATE action_log SET status = 'in_progress' WHERE id = ?",
-                    (action_id,)
-                )
+            update_action_status(action_id, 'in_progress')
             
             # Execute function
             result = func(*args, **kwargs)
@@ -535,28 +1206,157 @@ def require_verification(func: Callable) -> Callable:
             ActionVerifier.verify_action_completion(action_id)
             
             # Update status to completed
-            with get_connection() as conn:
-                conn.execute(
-                    "UPDATE action_log SET status = 'completed' WHERE id = ?",
-                    (action_id,)
-                )
+            update_action_status(action_id, 'completed')
             
             return result
             
         except Exception as e:
             # Update status to failed (compliance logging)
-            with get_connection() as conn:
+            update_action_status(action_id, 'failed', description=str(e))
+            
+            logger.error(f"Action {action_id} failed: {e}")
+            raise
+    
+    return wrapper
+
+
+def _audit_workspace_id(args: tuple, kwargs: dict) -> Optional[int]:
+    """Best-effort workspace_id of a decorated call, for audit rows."""
+    return kwargs.get('workspace_id') or (args[0] if args and isinstance(args[0], int) else None)
+
+
+def _lean_verification(func: Callable) -> Callable:
+    """Build the lean require_verification wrapper (see require_verification)."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        from helpers.db_helper import (
+            action_log_is_buffered, current_transaction, get_pool,
+            log_action, update_action_status,
+        )
+        
+        workspace_id = _audit_workspace_id(args, kwargs)
+        target = str(args) if args else None
+        
+        if action_log_is_buffered():
+            # Both transitions are applied in memory and written by the writer
+            action_id = log_action(
+                workspace_id=workspace_id,
+                action_type=func.__name__,
+                target=target,
+                status='in_progress'
+            )
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                update_action_status(action_id, 'failed', description=str(e))
+                logger.error(f"Action {action_id} failed: {e}")
+                raise
+            update_action_status(action_id, 'completed')
+            return result
+        
+        # Inside transaction() the scope owns the connection and the commit
+        scope = current_transaction()
+        pool = None if scope is not None else get_pool()
+        conn = scope.conn if scope is not None else pool.acquire()
+        try:
+            action_id = conn.execute(
+                """
+                INSERT INTO action_log (workspace_id, action_type, target, status)
+                VALUES (?, ?, ?, 'in_progress')
+                """,
+                (workspace_id, func.__name__, target)
+            ).lastrowid
+            if pool is not None:
+                conn.commit()
+            
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
                 conn.execute(
-                    """
-                    UPDATE action_log 
-                    SET status = 'failed', description = ?
-                    WHERE id = ?
-                    """,
+                    "UPDATE action_log SET status = 'failed', description = ? WHERE id = ?",
                     (str(e), action_id)
                 )
+                if pool is not None:
+                    conn.commit()
+                logger.error(f"Action {action_id} failed: {e}")
+                raise
             
+            cursor = conn.execute(
+                "UPDATE action_log SET status = 'completed' WHERE id = ? AND status = 'in_progress'",
+                (action_id,)
+            )
+            if pool is not None:
+                conn.commit()
+            if cursor.rowcount != 1:
+                logger.warning(f"Action {action_id} could not be verified as completed")
+            return result
+        finally:
+            if pool is not None:
+                pool.release(conn)
+    
+    return wrapper
+
+
+async def _run_audit(fn: Callable, *args, **kwargs) -> Any:
+    """Run an action_log call without blocking the event loop.
+    
+    Buffered calls that stay in memory run inline; a log_action() that would
+    have to reserve a new id block goes to a worker thread like any
+    unbuffered call.
+    """
+    from helpers.db_helper import action_log_is_buffered, buffered_action_ids, log_action
+    
+    if action_log_is_buffered() and (fn is not log_action or buffered_action_ids() > 0):
+        return fn(*args, **kwargs)
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+def _complete_action(action_id: int) -> None:
+    """Mark an in_progress action completed, verifying it via the row count."""
+    from helpers.db_helper import action_log_is_buffered, get_connection, update_action_status
+    
+    if action_log_is_buffered():
+        update_action_status(action_id, 'completed')
+        return
+    with get_connection() as conn:
+        cursor = conn.execute(
+            "UPDATE action_log SET status = 'completed' WHERE id = ? AND status = 'in_progress'",
+            (action_id,)
+        )
+    if cursor.rowcount != 1:
+        logger.warning(f"Action {action_id} could not be verified as completed")
+
+
+def _async_verification(func: Callable, lean: bool) -> Callable:
+    """Build the require_verification wrapper for coroutine functions."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        from helpers.db_helper import log_action, update_action_status
+        
+        action_id = await _run_audit(
+            log_action,
+            workspace_id=_audit_workspace_id(args, kwargs),
+            action_type=func.__name__,
+            target=str(args) if args else None,
+            status='in_progress' if lean else 'pending'
+        )
+        
+        try:
+            if not lean:
+                await _run_audit(update_action_status, action_id, 'in_progress')
+            result = await func(*args, **kwargs)
+            if not lean:
+                await _run_audit(ActionVerifier.verify_action_completion, action_id)
+        except Exception as e:
+            await _run_audit(update_action_status, action_id, 'failed', description=str(e))
             logger.error(f"Action {action_id} failed: {e}")
             raise
+        
+        if lean:
+            await _run_audit(_complete_action, action_id)
+        else:
+            await _run_audit(update_action_status, action_id, 'completed')
+        return result
     
     return wrapper
 
@@ -19,6 +19,7 @@ from helpers.reliability import (
 )
 from helpers.reliability import require_verification, ActionVerifier
 from helpers.reliability import recover_from_error, RecoveryStrategy, log_error_with_context
+from helpers.reliability import circuit_breaker, _integration_breaker
 from helpers.utils import cleanup_expired_contexts, set_context_with_ttl
 
 
@@ -76,13 +77,22 @@ def safe_query(query: str, params: tuple = ()):
         return cursor.fetchall()
 
 
-# Example 4: Context management with TTL
+# Example 4: Integration call that fails fast while the service is down
+@circuit_breaker(_integration_breaker, 'hubspot')
+@retry_with_backoff(max_retries=3, exceptions=(ConnectionError, TimeoutError))
+def list_hubspot_contacts(limit: int = 10):
+    """Example of an integration call guarded by a circuit breaker."""
+    from helpers.utils import get_client
+    return get_client('hubspot').list_contacts(limit=limit)
+
+
+# Example 5: Context management with TTL
 def set_temporary_context(workspace_id: int, key: str, value: str, ttl_minutes: int = 60):
     """Example of setting context with automatic expiration."""
     set_context_with_ttl(workspace_id, key, value, ttl_seconds=ttl_minutes * 60)
 
 
-# Example 5: Cleanup job
+# Example 6: Cleanup job
 def maintenance_cleanup():
     """Example maintenance cleanup job."""
     # Clean expired contexts
@@ -95,7 +105,7 @@ def maintenance_cleanup():
     print(f"Cleaned up {old_actions_count} old actions")
 
 
-# Example 6: Health monitoring
+# Example 7: Health monitoring
 def check_system_health():
     """Example health check."""
     from helpers.utils import health_check, get_system_stats
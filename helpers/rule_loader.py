@@ -1,39 +1,199 @@
 """
 Helper to load rules from database for agent context.
 Replaces reading .mdc files directly.
+
+Rules are compiled into a versioned RuleBundle per workspace that is rebuilt
+only when rule_documents changes (tracked by its change counter), persisted
+in rule_bundles so other processes can reuse it, and filtered per file path
+by pre-compiled glob patterns.
 """
 
-from typing import List, Dict, Optional
-from helpers.db_helper import get_rule_documents
+import re
+import json
+import hashlib
+import fnmatch
+import threading
+from typing import List, Dict, Optional, Tuple
+from helpers.db_helper import get_rule_documents, get_connection, current_transaction, _db_key
 
 
-def load_rules_for_context(workspace_id: Optional[int] = None) -> str:
-    """Load all rules from database formatted for agent context.
+class RuleBundle:
+    """Pre-rendered rules context for one workspace.
+    
+    Bundles are immutable once built and may be shared by every workspace
+    (and database) whose rules render identically.
+    
+    Attributes:
+        version: rule_documents change counter the bundle was first built
+                 from; the cache tracks freshness per workspace separately
+        content_hash: SHA-256 of the rendered sections (identifies the rule set)
+        sections: (rule_file, globs, rendered markdown) per rule document
+    """
+    
+    HEADER = "# Dexter Workspace Rules\nLoaded from database (rule_documents table)\n\n"
+    EMPTY = "# No rules found in database\n"
+    
+    def __init__(self, version: Optional[int], sections: List[Tuple[str, str, str]]):
+        self.version = version
+        self.sections = sections
+        self.content_hash = hashlib.sha256(
+            json.dumps(sections, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        self._matchers = [_compile_globs(globs) for _, globs, _ in sections]
+        self._full = self._render(range(len(sections)))
+    
+    def _render(self, indexes) -> str:
+        indexes = list(indexes)
+        if not indexes:
+            return self.EMPTY
+        return self.HEADER + "".join(self.sections[i][2] for i in indexes)
+    
+    def render(self, file_path: Optional[str] = None) -> str:
+        """Return the rules text, optionally only rules whose globs match file_path."""
+        if file_path is None:
+            return self._full
+        path = file_path.replace("\\", "/")
+        return self._render(
+            i for i, matcher in enumerate(self._matchers)
+            if matcher is None or matcher(path)
+        )
+    
+    def to_json(self) -> str:
+        return json.dumps({"version": self.version, "sections": self.sections}, ensure_ascii=False)
+    
+    @classmethod
+    def from_json(cls, data: str) -> "RuleBundle":
+        payload = json.loads(data)
+        return cls(payload["version"], [tuple(s) for s in payload["sections"]])
+
+
+def _parse_globs(globs: str) -> List[str]:
+    """Parse globs stored as '["a", "b"]', 'a, b' or a single pattern."""
+    globs = (globs or "").strip()
+    if globs.startswith("["):
+        try:
+            return [g for g in json.loads(globs) if g]
+        except ValueError:
+            globs = globs.strip("[]")
+    return [g.strip().strip('"').strip("'") for g in globs.split(",") if g.strip()]
+
+
+def _compile_globs(globs: str):
+    """Compile a rule's globs into one path predicate (None = applies everywhere)."""
+    patterns = _parse_globs(globs)
+    if not patterns or any(p in ("*", "**", "**/*") for p in patterns):
+        return None
+    expanded = set()
+    for pattern in patterns:
+        expanded.add(pattern)
+        # '**/x' should also match 'x' at the workspace root
+        while pattern.startswith("**/"):
+            pattern = pattern[3:]
+            expanded.add(pattern)
+    regex = re.compile("|".join(fnmatch.translate(p) for p in sorted(expanded)))
+    return lambda path: regex.match(path) is not None
+
+
+def _render_section(rule: Dict) -> str:
+    parts = [f"## {rule['title']} ({rule['rule_file']})\n"]
+    if rule.get('description'):
+        parts.append(f"*{rule['description']}*\n")
+    if rule.get('globs'):
+        parts.append(f"**Applies to:** {rule['globs']}\n")
+    parts.append("\n")
+    parts.append(rule['content'])
+    parts.append("\n\n---\n\n")
+    return "".join(parts)
+
+
+# (db_key, workspace_id) -> (version, bundle); bundles with equal content_hash are shared
+_bundles: Dict[Tuple[str, Optional[int]], Tuple[Optional[int], RuleBundle]] = {}
+_bundles_by_hash: Dict[str, RuleBundle] = {}
+_bundles_lock = threading.Lock()
+
+
+def _rules_version(conn) -> Optional[int]:
+    row = conn.execute(
+        "SELECT version FROM change_counters WHERE table_name = 'rule_documents'"
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _build_bundle(version: Optional[int], workspace_id: Optional[int]) -> RuleBundle:
+    """Compile a bundle from rule_documents."""
+    return RuleBundle(version, [
+        (rule['rule_file'], rule.get('globs') or "", _render_section(rule))
+        for rule in get_rule_documents(workspace_id)
+    ])
+
+
+def get_rule_bundle(workspace_id: Optional[int] = None) -> RuleBundle:
+    """Get the compiled rules bundle for a workspace, rebuilding only if stale.
+    
+    Freshness is one primary-key read of the rule_documents change counter.
+    A stale in-memory bundle is first refreshed from rule_bundles (built by
+    another process), and only rebuilt from rule_documents if that is stale too.
     
     Args:
-        workspace_id: Optional workspace ID
+        workspace_id: Optional workspace ID (None for global rules)
         
     Returns:
-        str: Formatted rules text for agent context
+        RuleBundle: Current bundle
     """
-    rules = get_rule_documents(workspace_id)
+    if current_transaction() is not None:
+        # rule_documents may hold uncommitted rows that share the committed
+        # change-counter version; keep this bundle out of both caches
+        with get_connection() as conn:
+            return _build_bundle(_rules_version(conn), workspace_id)
     
-    if not rules:
-        return "# No rules found in database\n"
-    
-    output = ["# Dexter Workspace Rules\n", "Loaded from database (rule_documents table)\n\n"]
+    key = (_db_key(None), workspace_id)
+    with get_connection() as conn:
+        version = _rules_version(conn)
+        cached = _bundles.get(key)
+        if cached is not None and version is not None and cached[0] == version:
+            return cached[1]
+        
+        row = conn.execute(
+            "SELECT version, bundle_json FROM rule_bundles WHERE workspace_key = ?",
+            (workspace_id or 0,)
+        ).fetchone()
+        if row is not None and version is not None and row['version'] == version:
+            bundle = RuleBundle.from_json(row['bundle_json'])
+        else:
+            bundle = _build_bundle(version, workspace_id)
+            if version is not None:
+                conn.execute(
+                    """
+                    INSERT INTO rule_bundles (workspace_key, version, content_hash, bundle_json)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(workspace_key) DO UPDATE SET
+                        version = excluded.version,
+                        content_hash = excluded.content_hash,
+                        bundle_json = excluded.bundle_json,
+                        built_at = CURRENT_TIMESTAMP
+                    """,
+                    (workspace_id or 0, version, bundle.content_hash, bundle.to_json())
+                )
     
-    for rule in rules:
-        output.append(f"## {rule['title']} ({rule['rule_file']})\n")
-        if rule.get('description'):
-            output.append(f"*{rule['description']}*\n")
-        if rule.get('globs'):
-            output.append(f"**Applies to:** {rule['globs']}\n")
-        output.append("\n")
-        output.append(rule['content'])
-        output.append("\n\n---\n\n")
+    with _bundles_lock:
+        bundle = _bundles_by_hash.setdefault(bundle.content_hash, bundle)
+        _bundles[key] = (version, bundle)
+    return bundle
+
+
+def load_rules_for_context(workspace_id: Optional[int] = None,
+                           file_path: Optional[str] = None) -> str:
+    """Load all rules from database formatted for agent context.
     
-    return "".join(output)
+    Args:
+        workspace_id: Optional workspace ID
+        file_path: Optional path being edited; only rules whose globs match it
+                   (or that have no globs) are included
+        
+    Returns:
+        str: Formatted rules text for agent context
+    """
+    return get_rule_bundle(workspace_id).render(file_path)
 
 
 def get_rule_by_file(rule_file: str, workspace_id: Optional[int] = None) -> Optional[Dict]:
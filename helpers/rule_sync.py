@@ -4,13 +4,22 @@ Consolidates rule migration and sync functionality.
 Cursor IDE requires .mdc files to exist in .cursor/rules/ for auto-loading.
 """
 
+import os
 import sys
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+import hashlib
+import tempfile
+import threading
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from helpers.db_helper import get_rule_documents, get_connection
+from helpers.db_helper import get_rule_documents, get_connection, _change_version
 
 RULES_DIR = Path(__file__).parent.parent / ".cursor" / "rules"
 
@@ -43,99 +52,502 @@ def parse_mdc_frontmatter(content: str) -> Dict[str, str]:
     }
 
 
-def sync_rules_from_database(workspace_id: Optional[int] = None, dry_run: bool = False) -> int:
+def render_rule_file(rule: Dict) -> str:
+    """Render a rule_documents row as .mdc file content.
+    
+    Frontmatter is reconstructed only if not already present in content.
+    """
+    content_body = rule['content']
+    if content_body.strip().startswith("---"):
+        return content_body
+    
+    frontmatter_lines = ["---"]
+    if rule.get('description'):
+        frontmatter_lines.append(f"description: {rule['description']}")
+    if rule.get('globs'):
+        frontmatter_lines.append(f"globs: {rule['globs']}")
+    if rule.get('rule_type'):
+        frontmatter_lines.append(f"ruleType: {rule['rule_type']}")
+    frontmatter_lines.append("---")
+    return "\n".join(frontmatter_lines) + "\n\n" + content_body
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _load_state(conn) -> Dict[str, Dict]:
+    """Load last-synced hash/mtime/size per rule file path."""
+    return {
+        row['path']: dict(row)
+        for row in conn.execute("SELECT path, content_hash, db_hash, mtime_ns, size FROM rule_sync_state")
+    }
+
+
+def _save_state(conn, path: Path, content_hash: str, db_hash: str, stat: os.stat_result) -> None:
+    conn.execute(
+        """
+        INSERT INTO rule_sync_state (path, content_hash, db_hash, mtime_ns, size)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(path) DO UPDATE SET
+            content_hash = excluded.content_hash,
+            db_hash = excluded.db_hash,
+            mtime_ns = excluded.mtime_ns,
+            size = excluded.size,
+            synced_at = CURRENT_TIMESTAMP
+        """,
+        (str(path), content_hash, db_hash, stat.st_mtime_ns, stat.st_size)
+    )
+
+
+def _stat_matches(state: Optional[Dict], stat: os.stat_result) -> bool:
+    return (state is not None
+            and state['mtime_ns'] == stat.st_mtime_ns
+            and state['size'] == stat.st_size)
+
+
+def _write_atomic(path: Path, content: str) -> None:
+    """Write file content via a temp file and rename, so readers never see partial files."""
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _new_summary() -> Dict[str, List[str]]:
+    return {"added": [], "updated": [], "unchanged": []}
+
+
+def _print_summary(summary: Dict[str, List[str]], verb: str = "") -> None:
+    for name in summary["added"]:
+        print(f"  + {verb}{name}")
+    for name in summary["updated"]:
+        print(f"  ~ {verb}{name}")
+    print(f"{len(summary['added'])} added, {len(summary['updated'])} updated, "
+          f"{len(summary['unchanged'])} unchanged")
+
+
+def sync_rules_from_database(workspace_id: Optional[int] = None, dry_run: bool = False) -> Dict[str, List[str]]:
     """Sync rule files from database to .cursor/rules/ directory.
     
+    Only files whose rendered content differs from disk are written (atomically),
+    so unchanged rules don't touch the file and don't trigger IDE reindexing.
+    Files whose mtime and size match the last sync are not even read.
+    
     Args:
         workspace_id: Optional workspace ID (None for global rules)
         dry_run: If True, only show what would be synced
         
     Returns:
-        int: Number of files synced
+        dict: Diff summary with 'added', 'updated' and 'unchanged' rule files
     """
     if not RULES_DIR.exists():
         RULES_DIR.mkdir(parents=True, exist_ok=True)
     
     rules = get_rule_documents(workspace_id)
-    synced = 0
+    summary = _new_summary()
     
-    for rule in rules:
-        rule_file = RULES_DIR / rule['rule_file']
-        
-        # Reconstruct frontmatter (only if not already present in content)
-        content_body = rule['content']
-        if not content_body.strip().startswith("---"):
-            frontmatter_lines = ["---"]
-            if rule.get('description'):
-                frontmatter_lines.append(f"description: {rule['description']}")
-            if rule.get('globs'):
-                frontmatter_lines.append(f"globs: {rule['globs']}")
-            if rule.get('rule_type'):
-                frontmatter_lines.append(f"ruleType: {rule['rule_type']}")
-            frontmatter_lines.append("---")
-            frontmatter = "\n".join(frontmatter_lines) + "\n\n"
-            content = frontmatter + content_body
-        else:
-            content = content_body
+    with get_connection() as conn:
+        state = _load_state(conn)
         
-        if dry_run:
-            print(f"Would sync: {rule['rule_file']}")
-        else:
-            rule_file.write_text(content, encoding='utf-8')
-            print(f"✓ Synced: {rule['rule_file']}")
-            synced += 1
+        for rule in rules:
+            rule_file = RULES_DIR / rule['rule_file']
+            content = render_rule_file(rule)
+            content_hash = _hash(content)
+            known = state.get(str(rule_file))
+            
+            try:
+                stat = rule_file.stat()
+            except FileNotFoundError:
+                stat = None
+            
+            if stat is not None:
+                if _stat_matches(known, stat) and known['content_hash'] == content_hash:
+                    summary["unchanged"].append(rule['rule_file'])
+                    continue
+                if _hash(rule_file.read_text(encoding='utf-8')) == content_hash:
+                    if not dry_run:
+                        _save_state(conn, rule_file, content_hash, content_hash, stat)
+                    summary["unchanged"].append(rule['rule_file'])
+                    continue
+            
+            summary["updated" if stat is not None else "added"].append(rule['rule_file'])
+            if not dry_run:
+                _write_atomic(rule_file, content)
+                _save_state(conn, rule_file, content_hash, content_hash, rule_file.stat())
     
-    return synced
+    _print_summary(summary, "Would sync: " if dry_run else "")
+    return summary
 
 
-def sync_rules_to_database(workspace_id: Optional[int] = None) -> int:
+def sync_rules_to_database(workspace_id: Optional[int] = None, dry_run: bool = False) -> Dict[str, List[str]]:
     """Sync rule files from .cursor/rules/ to database.
     Useful for initial migration or when files are edited manually.
     
+    Files whose mtime and size match the last sync are skipped without being
+    read; changed files are upserted in place, keeping row ids and only
+    bumping updated_at when a column actually changed.
+    
     Args:
         workspace_id: Optional workspace ID
+        dry_run: If True, only show what would be synced
         
     Returns:
-        int: Number of files synced
+        dict: Diff summary with 'added', 'updated' and 'unchanged' rule files
     """
+    summary = _new_summary()
     if not RULES_DIR.exists():
         print(f"Rules directory not found: {RULES_DIR}")
-        return 0
+        return summary
     
-    migrated = 0
+    rule_files = sorted(RULES_DIR.glob("*.mdc")) + sorted(RULES_DIR.glob("*.md"))
     
     with get_connection() as conn:
-        for rule_file in RULES_DIR.glob("*.mdc"):
-            _migrate_file(conn, rule_file, workspace_id)
-            migrated += 1
+        state = _load_state(conn)
         
-        for rule_file in RULES_DIR.glob("*.md"):
-            _migrate_file(conn, rule_file, workspace_id)
-            migrated += 1
+        for rule_file in rule_files:
+            stat = rule_file.stat()
+            known = state.get(str(rule_file))
+            if _stat_matches(known, stat):
+                summary["unchanged"].append(rule_file.name)
+                continue
+            
+            content = rule_file.read_text(encoding='utf-8')
+            content_hash = _hash(content)
+            if known is not None and known['content_hash'] == content_hash:
+                if not dry_run:
+                    _save_state(conn, rule_file, content_hash, known['db_hash'], stat)
+                summary["unchanged"].append(rule_file.name)
+                continue
+            
+            if dry_run:
+                exists = conn.execute(
+                    "SELECT 1 FROM rule_documents WHERE rule_file = ?", (rule_file.name,)
+                ).fetchone()
+                summary["updated" if exists else "added"].append(rule_file.name)
+                continue
+            
+            change, db_hash = _migrate_file(conn, rule_file, workspace_id, content)
+            summary[change].append(rule_file.name)
+            _save_state(conn, rule_file, content_hash, db_hash, stat)
     
-    return migrated
+    _print_summary(summary, "Would migrate: " if dry_run else "")
+    return summary
 
 
-def _migrate_file(conn, rule_file: Path, workspace_id: Optional[int]) -> None:
-    """Migrate a single rule file to database."""
-    content = rule_file.read_text(encoding='utf-8')
+def _parse_rule_file(rule_name: str, content: str) -> Dict[str, str]:
+    """Parse rule file content into rule_documents column values."""
     parsed = parse_mdc_frontmatter(content)
+    title = parsed.get("description") or parsed.get("title") or rule_name.replace(".mdc", "").replace(".md", "")
+    return {
+        "rule_file": rule_name,
+        "title": title,
+        "description": title,
+        "globs": parsed.get("globs", ""),
+        "rule_type": parsed.get("ruleType") or parsed.get("rule_type", "always"),
+        "content": parsed.get("content", content),
+    }
+
+
+def _migrate_file(conn, rule_file: Path, workspace_id: Optional[int],
+                  content: Optional[str] = None) -> Tuple[str, str]:
+    """Migrate a single rule file to database.
+    
+    Returns:
+        tuple: ('added' | 'updated' | 'unchanged', hash of the row rendered as a file)
+    """
+    if content is None:
+        content = rule_file.read_text(encoding='utf-8')
+    fields = _parse_rule_file(rule_file.name, content)
     
     rule_name = rule_file.name
-    title = parsed.get("description") or parsed.get("title") or rule_name.replace(".mdc", "").replace(".md", "")
-    globs = parsed.get("globs", "")
-    rule_type = parsed.get("ruleType") or parsed.get("rule_type", "always")
-    content_body = parsed.get("content", content)
+    title = fields["title"]
+    globs = fields["globs"]
+    rule_type = fields["rule_type"]
+    content_body = fields["content"]
     
-    conn.execute(
+    existed = conn.execute(
+        "SELECT 1 FROM rule_documents WHERE rule_file = ?", (rule_name,)
+    ).fetchone() is not None
+    
+    cursor = conn.execute(
         """
-        INSERT OR REPLACE INTO rule_documents 
+        INSERT INTO rule_documents 
         (workspace_id, rule_file, title, description, globs, rule_type, content, updated_at)
         VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(rule_file) DO UPDATE SET
+            workspace_id = excluded.workspace_id,
+            title = excluded.title,
+            description = excluded.description,
+            globs = excluded.globs,
+            rule_type = excluded.rule_type,
+            content = excluded.content,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE rule_documents.workspace_id IS NOT excluded.workspace_id
+           OR rule_documents.title IS NOT excluded.title
+           OR rule_documents.description IS NOT excluded.description
+           OR rule_documents.globs IS NOT excluded.globs
+           OR rule_documents.rule_type IS NOT excluded.rule_type
+           OR rule_documents.content IS NOT excluded.content
         """,
         (workspace_id, rule_name, title, title, globs, rule_type, content_body)
     )
-    print(f"✓ Migrated: {rule_name}")
+    db_hash = _hash(render_rule_file(fields))
+    if not existed:
+        return "added", db_hash
+    return ("updated" if cursor.rowcount else "unchanged"), db_hash
+
+
+def reconcile_rules(workspace_id: Optional[int] = None, prefer: Optional[str] = None) -> Dict[str, List[str]]:
+    """Converge .cursor/rules/ and rule_documents in both directions.
+    
+    Each rule is compared against its last-synced state: a side that changed
+    since then is applied to the other one. Rules changed on both sides are
+    conflicts and are left untouched unless prefer is given. The database is
+    the source of truth for deletions: a deleted file is restored, and a file
+    whose rule was deleted is removed if it wasn't edited since the last sync.
+    
+    Args:
+        workspace_id: Optional workspace ID (None for global rules)
+        prefer: 'files' or 'db' to resolve conflicts, None to skip them
+        
+    Returns:
+        dict: Summary with 'to_db', 'to_files', 'removed' and 'conflicts' rule files
+    """
+    if prefer not in (None, "files", "db"):
+        raise ValueError(f"prefer must be 'files' or 'db', got {prefer!r}")
+    RULES_DIR.mkdir(parents=True, exist_ok=True)
+    
+    summary = {"to_db": [], "to_files": [], "removed": [], "conflicts": []}
+    rows = {rule['rule_file']: rule for rule in get_rule_documents(workspace_id)}
+    names = set(rows)
+    names.update(p.name for p in RULES_DIR.glob("*.mdc"))
+    names.update(p.name for p in RULES_DIR.glob("*.md"))
+    
+    with get_connection() as conn:
+        state = _load_state(conn)
+        
+        for name in sorted(names):
+            path = RULES_DIR / name
+            known = state.get(str(path))
+            row = rows.get(name)
+            db_content = render_rule_file(row) if row else None
+            db_hash = _hash(db_content) if row else None
+            
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                stat = None
+            if stat is None:
+                file_content = file_hash = None
+            elif _stat_matches(known, stat):
+                file_content, file_hash = None, known['content_hash']
+            else:
+                file_content = path.read_text(encoding='utf-8')
+                file_hash = _hash(file_content)
+            
+            if row is None and conn.execute(
+                "SELECT 1 FROM rule_documents WHERE rule_file = ?", (name,)
+            ).fetchone():
+                continue  # belongs to another workspace
+            
+            if known is not None:
+                file_changed = file_hash != known['content_hash']
+                db_changed = db_hash != known['db_hash']
+            else:
+                file_changed = stat is not None
+                db_changed = row is not None
+            
+            if file_changed and db_changed and stat is not None and file_hash == db_hash:
+                # Both sides already hold the same rule
+                _save_state(conn, path, file_hash, db_hash, stat)
+                continue
+            
+            if file_changed and db_changed:
+                if prefer is None:
+                    summary["conflicts"].append(name)
+                    print(f"  ! Conflict: {name} changed in both files and database")
+                    continue
+                if prefer == "files":
+                    db_changed = False
+                else:
+                    file_changed = False
+            
+            if file_changed and stat is not None:
+                if file_content is None:
+                    file_content = path.read_text(encoding='utf-8')
+                _, new_db_hash = _migrate_file(conn, path, workspace_id, file_content)
+                _save_state(conn, path, file_hash, new_db_hash, stat)
+                summary["to_db"].append(name)
+            elif row is not None and (db_changed or stat is None):
+                _write_atomic(path, db_content)
+                _save_state(conn, path, db_hash, db_hash, path.stat())
+                summary["to_files"].append(name)
+            elif row is None and stat is not None and not file_changed:
+                path.unlink()
+                conn.execute("DELETE FROM rule_sync_state WHERE path = ?", (str(path),))
+                summary["removed"].append(name)
+            elif row is None and stat is None and known is not None:
+                conn.execute("DELETE FROM rule_sync_state WHERE path = ?", (str(path),))
+    
+    for name in summary["to_db"]:
+        print(f"  → db: {name}")
+    for name in summary["to_files"]:
+        print(f"  → file: {name}")
+    for name in summary["removed"]:
+        print(f"  - removed: {name}")
+    return summary
+
+
+class _InotifyWatcher:
+    """Wait for rule file changes with Linux inotify (via ctypes)."""
+    
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    _EVENT = struct.Struct("iIII")
+    
+    def __init__(self, directory: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = (self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_FROM
+                | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE)
+        if libc.inotify_add_watch(self.fd, str(directory).encode(), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+    
+    def wait(self, timeout: float) -> bool:
+        """Return True if a rule file changed within timeout seconds."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size
+                name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+                offset += length
+                changed = changed or _is_rule_file(name)
+    
+    def reset(self) -> None:
+        while self.wait(0):
+            pass
+    
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class _PollingWatcher:
+    """Wait for rule file changes by comparing directory stat snapshots."""
+    
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.snapshot = self._scan()
+    
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for path in self.directory.iterdir():
+            if _is_rule_file(path.name):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                snapshot[path.name] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+    
+    def wait(self, timeout: float) -> bool:
+        """Return True if a rule file changed within timeout seconds."""
+        time.sleep(timeout)
+        snapshot = self._scan()
+        changed = snapshot != self.snapshot
+        self.snapshot = snapshot
+        return changed
+    
+    def reset(self) -> None:
+        self.snapshot = self._scan()
+    
+    def close(self) -> None:
+        pass
+
+
+def _is_rule_file(name: str) -> bool:
+    return not name.startswith(".") and (name.endswith(".mdc") or name.endswith(".md"))
+
+
+def _rules_version() -> Optional[int]:
+    with get_connection() as conn:
+        return _change_version(conn, 'rule_documents')
+
+
+def watch_rules(workspace_id: Optional[int] = None, prefer: Optional[str] = None,
+                interval: float = 1.0, debounce: float = 0.25,
+                stop_event: Optional[threading.Event] = None, use_inotify: bool = True) -> None:
+    """Keep .cursor/rules/ and rule_documents converged until stopped.
+    
+    File changes are picked up with inotify where available (polling otherwise)
+    and database changes through the rule_documents change counter. Bursts of
+    edits are debounced into a single reconcile_rules() pass.
+    
+    Args:
+        workspace_id: Optional workspace ID (None for global rules)
+        prefer: 'files' or 'db' to resolve conflicts, None to report and skip them
+        interval: Seconds between database checks (and file polls)
+        debounce: Quiet period to wait for after a file change
+        stop_event: Optional event that ends the loop when set
+        use_inotify: Set False to force polling
+    """
+    stop_event = stop_event or threading.Event()
+    RULES_DIR.mkdir(parents=True, exist_ok=True)
+    
+    watcher = None
+    if use_inotify and sys.platform.startswith("linux"):
+        try:
+            watcher = _InotifyWatcher(RULES_DIR)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}), falling back to polling")
+    if watcher is None:
+        watcher = _PollingWatcher(RULES_DIR)
+    
+    try:
+        # Snapshot before each pass: changes made while it runs must trigger
+        # another one. The pass's own writes do too, but that pass is a no-op.
+        watcher.reset()
+        db_version = _rules_version()
+        reconcile_rules(workspace_id, prefer)
+        
+        while not stop_event.is_set():
+            files_changed = watcher.wait(interval)
+            if files_changed:
+                while not stop_event.is_set() and watcher.wait(debounce):
+                    pass
+            if stop_event.is_set():
+                break
+            
+            version = _rules_version()
+            if files_changed or version != db_version:
+                watcher.reset()
+                db_version = version
+                reconcile_rules(workspace_id, prefer)
+    finally:
+        watcher.close()
 
 
 if __name__ == "__main__":
@@ -145,15 +557,26 @@ if __name__ == "__main__":
     parser.add_argument("--to-files", action="store_true", help="Sync from database to .mdc files")
     parser.add_argument("--to-db", action="store_true", help="Sync from .mdc files to database")
     parser.add_argument("--dry-run", action="store_true", help="Show what would be synced")
+    parser.add_argument("--watch", action="store_true", help="Keep files and database converged continuously")
+    parser.add_argument("--prefer", choices=["files", "db"], help="Resolve conflicts in favour of one side")
+    parser.add_argument("--interval", type=float, default=1.0, help="Watch poll interval in seconds")
     
     args = parser.parse_args()
     
-    if args.to_files:
-        count = sync_rules_from_database(dry_run=args.dry_run)
+    if args.watch:
+        print(f"Watching {RULES_DIR} and rule_documents (Ctrl+C to stop)")
+        try:
+            watch_rules(prefer=args.prefer, interval=args.interval)
+        except KeyboardInterrupt:
+            pass
+    elif args.to_files:
+        summary = sync_rules_from_database(dry_run=args.dry_run)
+        count = len(summary["added"]) + len(summary["updated"])
         print(f"\n✅ Synced {count} rules from database to files")
     elif args.to_db:
-        count = sync_rules_to_database()
+        summary = sync_rules_to_database(dry_run=args.dry_run)
+        count = len(summary["added"]) + len(summary["updated"])
         print(f"\n✅ Synced {count} rules from files to database")
     else:
-        print("Use --to-files or --to-db")
+        print("Use --to-files, --to-db or --watch")
         print("Example: python helpers/rule_sync.py --to-files")
@@ -0,0 +1,153 @@
+"""
+Statement registry - named, parameterised SQL shared by the helper modules.
+
+Hot queries are registered once at import time and executed by name, so the
+SQL text is identical on every call and sqlite3's per-connection statement
+cache (sized by STATEMENT_CACHE_SIZE on pooled connections) prepares each one
+only once per connection. Nullable workspace scoping uses ``workspace_id IS ?``
+so one statement covers both workspace and global (NULL) rows.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+# sqlite3 cached_statements for pooled connections (Python's default is 128)
+STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+
+
+class Statement:
+    """A named SQL statement with execution counters."""
+    
+    __slots__ = ('name', 'sql', 'calls', 'errors', 'seconds', '_lock')
+    
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+    
+    def _count(self, started: float, failed: bool) -> None:
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.calls += 1
+            self.errors += failed
+            self.seconds += elapsed
+    
+    def execute(self, conn: sqlite3.Connection, params: Sequence[Any] = ()) -> sqlite3.Cursor:
+        """Execute on ``conn`` and count the call.
+        
+        Args:
+            conn: Connection to run on
+            params: Positional or named parameters
+        
+        Returns:
+            sqlite3.Cursor: Cursor positioned before the first row
+        """
+        started = time.perf_counter()
+        try:
+            cursor = conn.execute(self.sql, params)
+        except sqlite3.Error:
+            self._count(started, True)
+            raise
+        self._count(started, False)
+        return cursor
+    
+    def executemany(self, conn: sqlite3.Connection, seq_of_params) -> sqlite3.Cursor:
+        """executemany() counterpart of execute(); counts one call per batch."""
+        started = time.perf_counter()
+        try:
+            cursor = conn.executemany(self.sql, seq_of_params)
+        except sqlite3.Error:
+            self._count(started, True)
+            raise
+        self._count(started, False)
+        return cursor
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'errors': self.errors,
+                'total_seconds': round(self.seconds, 6),
+                'avg_ms': round(self.seconds / self.calls * 1000, 4) if self.calls else 0.0,
+            }
+    
+    def reset(self) -> None:
+        with self._lock:
+            self.calls = self.errors = 0
+            self.seconds = 0.0
+    
+    def __repr__(self) -> str:
+        return f"Statement({self.name!r})"
+
+
+_statements: Dict[str, Statement] = {}
+_registry_lock = threading.Lock()
+
+
+def _normalise(sql: str) -> str:
+    """Collapse indentation so registered SQL reads well in EXPLAIN output and logs."""
+    return ' '.join(sql.split())
+
+
+def statement(name: str, sql: str) -> Statement:
+    """Register a named statement (idempotent for identical SQL).
+    
+    Args:
+        name: Registry name, conventionally ``<module>.<query>``
+        sql: Parameterised SQL
+    
+    Returns:
+        Statement: The registered statement
+    
+    Raises:
+        ValueError: If ``name`` is already registered with different SQL
+    """
+    sql = _normalise(sql)
+    with _registry_lock:
+        existing = _statements.get(name)
+        if existing is not None:
+            if existing.sql != sql:
+                raise ValueError(f"Statement {name!r} is already registered with different SQL")
+            return existing
+        stmt = _statements[name] = Statement(name, sql)
+        return stmt
+
+
+def get_statement(name: str) -> Statement:
+    """Look up a registered statement by name (KeyError if unknown)."""
+    return _statements[name]
+
+
+def iter_statements(prefix: Optional[str] = None) -> Iterator[Statement]:
+    """Iterate registered statements, optionally only names starting with prefix."""
+    with _registry_lock:
+        statements = list(_statements.values())
+    return (s for s in statements if prefix is None or s.name.startswith(prefix))
+
+
+def statement_stats(include_unused: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Per-statement execution counters, busiest first.
+    
+    Args:
+        include_unused: Include statements that have never been executed
+    
+    Returns:
+        dict: name -> {calls, errors, total_seconds, avg_ms}
+    """
+    stats = {s.name: s.stats() for s in iter_statements()}
+    return dict(sorted(
+        ((name, s) for name, s in stats.items() if include_unused or s['calls']),
+        key=lambda item: -item[1]['total_seconds']
+    ))
+
+
+def reset_statement_stats() -> None:
+    """Zero all statement counters."""
+    for stmt in iter_statements():
+        stmt.reset()
@@ -2,24 +2,30 @@
 Utility functions for Dexter workspace - consolidated for convenience.
 Single script with all common utilities.
 
-Can be run directly: python helpers/utils.py [stats|health|cleanup [days]]
+Can be run directly: python helpers/utils.py [stats|health|cleanup [days] [--vacuum]]
 """
 
+import os
+import time
 import logging
 import sqlite3
 import sys
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Sequence
 from datetime import datetime, timedelta
 from pathlib import Path
 
 # Handle imports for both module and script execution
 try:
     from helpers.db_helper import get_connection, DB_PATH, set_context, get_context, log_action
+    from helpers.reliability import get_reliability_metrics
+    from helpers.statements import statement_stats
 except ImportError:
     # When run as script, add parent directory to path
     from pathlib import Path as PathLib
     sys.path.insert(0, str(PathLib(__file__).parent.parent))
     from helpers.db_helper import get_connection, DB_PATH, set_context, get_context, log_action
+    from helpers.reliability import get_reliability_metrics
+    from helpers.statements import statement_stats
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +38,8 @@ def health_check() -> Dict[str, Any]:
         'database': _check_database(),
         'schema': _check_schema(),
         'performance': _check_performance(),
+        'reliability': get_reliability_metrics(),
+        'statements': statement_stats(),
         'status': 'healthy'
     }
     
@@ -164,16 +172,130 @@ def get_system_stats() -> Dict[str, Any]:
         return {'error': str(e)}
 
 
+# Chunked cleanup
+# Rows per delete transaction and the pause between transactions, so
+# cleanup never holds the write lock long enough to stall other writers
+CLEANUP_BATCH_SIZE = int(os.getenv("DB_CLEANUP_BATCH_SIZE", "1000"))
+CLEANUP_PAUSE_SECONDS = float(os.getenv("DB_CLEANUP_PAUSE", "0.01"))
+
+_EXPIRED_CONTEXTS = "expires_at IS NOT NULL AND expires_at < datetime('now')"
+_OLD_ACTIONS = "status = 'completed' AND timestamp < datetime('now', '-' || ? || ' days')"
+
+
+def chunked_delete(table: str, where: str, params: Sequence[Any] = (),
+                   batch_size: Optional[int] = None, pause: Optional[float] = None,
+                   db_path: Optional[Path] = None) -> Dict[str, Any]:
+    """Delete rows matching ``where`` in bounded rowid windows.
+    
+    The rowid range of matching rows is read once; each window of
+    ``batch_size`` rowids is then deleted in its own short transaction on a
+    freshly checked-out pooled connection, sleeping ``pause`` seconds after
+    every window that deleted something so waiting writers get the lock.
+    Rows that start matching after the range was read are left for the next
+    run. Inside a transaction() block the windows share its single commit.
+    
+    Args:
+        table: Table to delete from (trusted identifier)
+        where: SQL condition selecting the rows to delete (trusted)
+        params: Parameters for ``where``
+        batch_size: Rowids per delete transaction (CLEANUP_BATCH_SIZE)
+        pause: Seconds to sleep between transactions (CLEANUP_PAUSE_SECONDS)
+        db_path: Optional database path
+    
+    Returns:
+        dict: table, deleted, batches (write transactions), seconds and rows_per_second
+    """
+    batch_size = batch_size or CLEANUP_BATCH_SIZE
+    pause = CLEANUP_PAUSE_SECONDS if pause is None else pause
+    params = tuple(params)
+    started = time.perf_counter()
+    deleted = batches = 0
+    
+    with get_connection(db_path) as conn:
+        low, high = conn.execute(
+            f"SELECT MIN(rowid), MAX(rowid) FROM {table} WHERE {where}", params
+        ).fetchone()
+    
+    if low is not None:
+        while low <= high:
+            with get_connection(db_path) as conn:
+                cursor = conn.execute(
+                    f"DELETE FROM {table} WHERE rowid >= ? AND rowid < ? AND ({where})",
+                    (low, low + batch_size) + params
+                )
+            low += batch_size
+            if cursor.rowcount > 0:
+                deleted += cursor.rowcount
+                batches += 1
+                if pause and low <= high:
+                    time.sleep(pause)
+    
+    seconds = time.perf_counter() - started
+    return {
+        'table': table,
+        'deleted': deleted,
+        'batches': batches,
+        'seconds': round(seconds, 4),
+        'rows_per_second': round(deleted / seconds, 1) if seconds > 0 else 0.0,
+    }
+
+
+def checkpoint_wal(mode: str = "PASSIVE", db_path: Optional[Path] = None) -> Dict[str, int]:
+    """Copy WAL frames back into the database file.
+    
+    PASSIVE (the default) never waits for readers or writers, so it is safe
+    under load; it simply checkpoints whatever is not in use.
+    
+    Returns:
+        dict: busy (1 if the checkpoint could not complete), wal_frames and checkpointed
+    """
+    mode = mode.upper()
+    if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+        raise ValueError(f"Unknown checkpoint mode: {mode}")
+    with get_connection(db_path) as conn:
+        busy, wal_frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    return {'busy': busy, 'wal_frames': wal_frames, 'checkpointed': checkpointed}
+
+
+def incremental_vacuum(pages_per_step: int = 256, pause: Optional[float] = None,
+                       db_path: Optional[Path] = None) -> Dict[str, Any]:
+    """Return free pages to the OS a few at a time.
+    
+    Only has an effect on databases created with PRAGMA auto_vacuum =
+    INCREMENTAL; otherwise nothing is done and 'enabled' is False.
+    
+    Returns:
+        dict: enabled, freed_pages and seconds
+    """
+    pause = CLEANUP_PAUSE_SECONDS if pause is None else pause
+    started = time.perf_counter()
+    freed = 0
+    
+    with get_connection(db_path) as conn:
+        enabled = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    
+    while enabled:
+        with get_connection(db_path) as conn:
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not before:
+                break
+            conn.execute(f"PRAGMA incremental_vacuum({int(pages_per_step)})").fetchall()
+            freed += before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if pause:
+            time.sleep(pause)
+    
+    return {'enabled': enabled, 'freed_pages': freed, 'seconds': round(time.perf_counter() - started, 4)}
+
+
 # Context management
-def cleanup_expired_contexts() -> int:
-    """Remove expired context entries."""
-    with get_connection() as conn:
-        cursor = conn.execute(
-            "DELETE FROM context WHERE expires_at IS NOT NULL AND expires_at < datetime('now')"
-        )
-        deleted_count = cursor.rowcount
-        logger.info(f"Cleaned up {deleted_count} expired context entries")
-        return deleted_count
+def cleanup_expired_contexts(batch_size: Optional[int] = None, db_path: Optional[Path] = None) -> int:
+    """Remove expired context entries in short delete transactions (see chunked_delete)."""
+    report = chunked_delete("context", _EXPIRED_CONTEXTS, batch_size=batch_size, db_path=db_path)
+    logger.info(
+        f"Cleaned up {report['deleted']} expired context entries "
+        f"({report['rows_per_second']} rows/s)"
+    )
+    return report['deleted']
 
 
 def set_context_with_ttl(workspace_id: Optional[int], key: str, value: str, ttl_seconds: int) -> None:
@@ -183,16 +305,15 @@ def set_context_with_ttl(workspace_id: Optional[int], key: str, value: str, ttl_
     logger.debug(f"Set context {key} with TTL of {ttl_seconds}s")
 
 
-def cleanup_old_actions(days: int = 30) -> int:
-    """Remove old completed actions from action_log."""
-    with get_connection() as conn:
-        cursor = conn.execute(
-            "DELETE FROM action_log WHERE status = 'completed' AND timestamp < datetime('now', '-' || ? || ' days')",
-            (days,)
-        )
-        deleted_count = cursor.rowcount
-        logger.info(f"Cleaned up {deleted_count} old completed actions (older than {days} days)")
-        return deleted_count
+def cleanup_old_actions(days: int = 30, batch_size: Optional[int] = None,
+                        db_path: Optional[Path] = None) -> int:
+    """Remove old completed actions from action_log in short delete transactions (see chunked_delete)."""
+    report = chunked_delete("action_log", _OLD_ACTIONS, (days,), batch_size=batch_size, db_path=db_path)
+    logger.info(
+        f"Cleaned up {report['deleted']} old completed actions (older than {days} days, "
+        f"{report['rows_per_second']} rows/s)"
+    )
+    return report['deleted']
 
 
 def get_context_stats(workspace_id: Optional[int] = None) -> dict:
@@ -236,11 +357,42 @@ def quick_stats() -> None:
     print(f"Integrations: {stats.get('integrations', {}).get('active', 0)}/{stats.get('integrations', {}).get('total', 0)}")
 
 
-def cleanup_all(days: int = 30) -> None:
-    """Run all cleanup operations."""
-    expired = cleanup_expired_contexts()
-    old_actions = cleanup_old_actions(days)
-    print(f"Cleanup complete: {expired} expired contexts, {old_actions} old actions removed")
+def cleanup_all(days: int = 30, vacuum: bool = False, batch_size: Optional[int] = None,
+                db_path: Optional[Path] = None) -> Dict[str, Any]:
+    """Run all cleanup operations in short transactions, then checkpoint the WAL.
+    
+    Safe to run while other processes are writing: every delete transaction
+    is bounded by batch_size and the checkpoint is PASSIVE.
+    
+    Args:
+        days: Age in days after which completed actions are removed
+        vacuum: Also run incremental_vacuum (auto_vacuum = INCREMENTAL databases only)
+        batch_size: Rowids per delete transaction (CLEANUP_BATCH_SIZE)
+        db_path: Optional database path
+    
+    Returns:
+        dict: contexts and actions (chunked_delete reports), checkpoint and,
+              when requested, vacuum
+    """
+    report = {
+        'contexts': chunked_delete("context", _EXPIRED_CONTEXTS, batch_size=batch_size, db_path=db_path),
+        'actions': chunked_delete("action_log", _OLD_ACTIONS, (days,), batch_size=batch_size, db_path=db_path),
+        'checkpoint': checkpoint_wal(db_path=db_path),
+    }
+    if vacuum:
+        report['vacuum'] = incremental_vacuum(db_path=db_path)
+    
+    for name in ('contexts', 'actions'):
+        job = report[name]
+        print(f"{name}: {job['deleted']} rows in {job['batches']} batches, "
+              f"{job['seconds']}s ({job['rows_per_second']} rows/s)")
+    print(f"WAL checkpoint: {report['checkpoint']['checkpointed']}/{report['checkpoint']['wal_frames']} frames")
+    if vacuum:
+        print(f"Incremental vacuum: {report['vacuum']['freed_pages']} pages freed"
+              if report['vacuum']['enabled'] else "Incremental vacuum: auto_vacuum is not INCREMENTAL, skipped")
+    print(f"Cleanup complete: {report['contexts']['deleted']} expired contexts, "
+          f"{report['actions']['deleted']} old actions removed")
+    return report
 
 
 # Integration clients (consolidated - stubs for convenience, implement as needed)
@@ -462,13 +614,14 @@ if __name__ == "__main__":
             import json
             print(json.dumps(health_check(), indent=2))
         elif sys.argv[1] == "cleanup":
-            days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
-            cleanup_all(days)
+            args = [a for a in sys.argv[2:] if a != "--vacuum"]
+            days = int(args[0]) if args else 30
+            cleanup_all(days, vacuum="--vacuum" in sys.argv[2:])
         elif sys.argv[1] == "generate" and len(sys.argv) >= 4:
             workspace_id = int(sys.argv[2])
             output_dir = Path(sys.argv[3])
             generate_workspace(workspace_id, output_dir)
         else:
-            print("Usage: python utils.py [stats|health|cleanup [days]|generate <workspace_id> <output_dir>]")
+            print("Usage: python utils.py [stats|health|cleanup [days] [--vacuum]|generate <workspace_id> <output_dir>]")
     else:
         quick_stats()
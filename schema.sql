@@ -270,6 +270,15 @@ CREATE TABLE IF NOT EXISTS agent_decisions (
     FOREIGN KEY (learned_from) REFERENCES agent_decisions(id) ON DELETE SET NULL
 );
 
+-- Hashed bag-of-words vectors (float32 blobs) for similarity recall, see helpers/vector_index.py
+CREATE TABLE IF NOT EXISTS agent_decision_vectors (
+    decision_id INTEGER PRIMARY KEY,
+    workspace_id INTEGER,
+    decision_type TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    FOREIGN KEY (decision_id) REFERENCES agent_decisions(id) ON DELETE CASCADE
+);
+
 CREATE TABLE IF NOT EXISTS agent_memories (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     project_id INTEGER,
@@ -388,6 +397,33 @@ CREATE TABLE IF NOT EXISTS rule_documents (
     FOREIGN KEY (workspace_id) REFERENCES workspaces(id) ON DELETE CASCADE
 );
 
+-- Compiled rules context per workspace (see helpers/rule_loader.py)
+CREATE TABLE IF NOT EXISTS rule_bundles (
+    workspace_key INTEGER PRIMARY KEY,  -- workspace_id, or 0 for global rules
+    version INTEGER NOT NULL,           -- rule_documents change counter at build time
+    content_hash TEXT NOT NULL,
+    bundle_json TEXT NOT NULL,
+    built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Last-synced state of .cursor/rules files (see helpers/rule_sync.py)
+CREATE TABLE IF NOT EXISTS rule_sync_state (
+    path TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,         -- SHA-256 of file content at last sync
+    db_hash TEXT NOT NULL,              -- SHA-256 of the rule_documents row rendered as a file
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Rate limiter buckets shared across worker processes (see helpers/reliability.py)
+CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+    limiter TEXT NOT NULL,
+    key TEXT NOT NULL,
+    tat REAL NOT NULL,                  -- GCRA theoretical arrival time (unix seconds)
+    PRIMARY KEY (limiter, key)
+) WITHOUT ROWID;
+
 CREATE TABLE IF NOT EXISTS context (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     agent_session_id INTEGER,
@@ -550,10 +586,10 @@ INSERT OR IGNORE INTO vision_statements (category, statement, rationale) VALUES
 CREATE INDEX IF NOT EXISTS idx_workspace_settings_workspace ON workspace_settings(workspace_id);
 CREATE INDEX IF NOT EXISTS idx_workspace_dependencies_workspace ON workspace_dependencies(workspace_id);
 CREATE INDEX IF NOT EXISTS idx_cursor_rules_workspace ON cursor_rules(workspace_id);
-CREATE INDEX IF NOT EXISTS idx_cursor_rules_active ON cursor_rules(is_active);
+CREATE INDEX IF NOT EXISTS idx_cursor_rules_workspace_active ON cursor_rules(workspace_id) WHERE is_active = 1;
 CREATE INDEX IF NOT EXISTS idx_integrations_workspace ON integrations(workspace_id);
 CREATE INDEX IF NOT EXISTS idx_integrations_type ON integrations(integration_type);
-CREATE INDEX IF NOT EXISTS idx_integrations_active ON integrations(is_active);
+CREATE INDEX IF NOT EXISTS idx_integrations_workspace_active ON integrations(workspace_id) WHERE is_active = 1;
 CREATE INDEX IF NOT EXISTS idx_mcp_workspace ON mcp_servers(workspace_id);
 CREATE INDEX IF NOT EXISTS idx_mcp_active ON mcp_servers(is_active);
 CREATE INDEX IF NOT EXISTS idx_workspaces_project_type ON workspaces(project_type);
@@ -579,10 +615,10 @@ CREATE INDEX IF NOT EXISTS idx_checkpoints_action ON checkpoints(action_id);
 CREATE INDEX IF NOT EXISTS idx_rules_category ON rules(category);
 CREATE INDEX IF NOT EXISTS idx_rules_active ON rules(is_active);
 CREATE INDEX IF NOT EXISTS idx_rule_docs_workspace ON rule_documents(workspace_id);
-CREATE INDEX IF NOT EXISTS idx_rule_docs_file ON rule_documents(rule_file);
+CREATE INDEX IF NOT EXISTS idx_rule_docs_workspace_file ON rule_documents(workspace_id, rule_file);
 CREATE INDEX IF NOT EXISTS idx_knowledge_workspace ON agent_knowledge(workspace_id);
-CREATE INDEX IF NOT EXISTS idx_knowledge_topic ON agent_knowledge(topic);
-CREATE INDEX IF NOT EXISTS idx_knowledge_confidence ON agent_knowledge(confidence);
+CREATE INDEX IF NOT EXISTS idx_knowledge_workspace_rank ON agent_knowledge(workspace_id, confidence DESC, usage_count DESC);
+CREATE INDEX IF NOT EXISTS idx_knowledge_workspace_topic ON agent_knowledge(workspace_id, topic, confidence DESC, usage_count DESC);
 CREATE INDEX IF NOT EXISTS idx_decisions_workspace ON agent_decisions(workspace_id);
 CREATE INDEX IF NOT EXISTS idx_decisions_type ON agent_decisions(decision_type);
 CREATE INDEX IF NOT EXISTS idx_decisions_success ON agent_decisions(success);
@@ -593,11 +629,301 @@ CREATE INDEX IF NOT EXISTS idx_patterns_workspace ON agent_patterns(workspace_id
 CREATE INDEX IF NOT EXISTS idx_patterns_type ON agent_patterns(pattern_type);
 CREATE INDEX IF NOT EXISTS idx_state_workspace ON agent_state(workspace_id);
 CREATE INDEX IF NOT EXISTS idx_state_key ON agent_state(state_key);
+CREATE INDEX IF NOT EXISTS idx_state_expiry ON agent_state(workspace_id, expires_at) WHERE expires_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_patterns_workspace_rank ON agent_patterns(workspace_id, success_rate DESC, usage_count DESC);
+CREATE INDEX IF NOT EXISTS idx_decisions_workspace_recent ON agent_decisions(workspace_id, success DESC, created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_knowledge_items_project ON knowledge_items(project_id);
 CREATE INDEX IF NOT EXISTS idx_knowledge_items_workspace ON knowledge_items(workspace_id);
 CREATE INDEX IF NOT EXISTS idx_search_queries_project ON search_queries(project_id);
 CREATE INDEX IF NOT EXISTS idx_health_checks_workspace ON health_checks(workspace_id);
 
+-- ============================================================================
+-- CHANGE COUNTERS (cache invalidation, maintained by triggers)
+-- ============================================================================
+
+-- One row per cached table; version is bumped on every row change so readers
+-- (helpers/cache.py, rule bundles) can tell which tables moved since they last looked.
+CREATE TABLE IF NOT EXISTS change_counters (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO change_counters (table_name) VALUES
+    ('preferences'),
+    ('templates'),
+    ('cursor_rules'),
+    ('integrations'),
+    ('rule_documents'),
+    ('agent_decision_vectors');
+
+CREATE TRIGGER IF NOT EXISTS preferences_cc_ai AFTER INSERT ON preferences BEGIN
+    UPDATE change_counters SET version = version + 1 WHERE table_name = 'preferences';
+END;
+CREATE TRIGGER IF NOT EXISTS preferences_cc_au AFTER UPDATE ON preferences BEGIN
+    UPDATE change_counters SET version = version + 1 WHERE table_name = 'preferences';
+END;
+CREATE TRIGGER IF NOT EXISTS preferences_cc_ad AFTER DELETE ON preferences BEGIN
+    UPDATE change_counters SET version = version + 1 WHERE table_name = 'preferences';
+END;
+
+CREATE TRIGGER IF NOT EXISTS templates_cc_ai AFTER INSERT ON templates BEGIN
+    UPDATE change_counters SET version = version + 1 WHERE table_name = 'templates';
+END;
+CREATE TRIGGER IF NOT EXISTS templates_cc_au AFTER UPDATE ON templates BEGIN
+    UPDATE change_counters SET version = version + 1 WHERE table_name = 'templates';
+END;
+CREATE TRIGGER IF NOT EXISTS templates_cc_ad AFTER DELETE ON templates BEGIN
+    UPDATE change_counters SET version = version + 1 WHERE table_name = 'templates';
+END;
+
+CREATE TRIGGER IF NOT EXISTS cursor_rules_cc_ai AFTER INSERT ON cursor_rules BEGIN
+    UPDATE change_counters SET version = version + 1 WHERE table_name = 'cursor_rules';
+END;
+CREATE TRIGGER IF NOT EXISTS cursor_rules_cc_au AFTER UPDATE ON cursor_rules BEGIN
+    UPDATE change_counters SET version = version + 1 WHERE table_name = 'cursor_rules';
+END;
+CREATE TRIGGER IF NOT EXISTS cursor_rules_cc_ad AFTER DELETE ON cursor_rules BEGIN
+    UPDATE change_counters SET version = version + 1 WHERE table_name = 'cursor_rules';
+END;
+
+CREATE TRIGGER IF NOT EXISTS integrations_cc_ai AFTER INSERT ON integrations BEGIN
+    UPDATE change_counters SET version = version + 1 WHERE table_name = 'integrations';
+END;
+CREATE TRIGGER IF NOT EXISTS integrations_cc_au AFTER UPDATE ON integrations BEGIN
+    UPDATE change_counters SET version = version + 1 WHERE table_name = 'integrations';
+END;
+CREATE TRIGGER IF NOT EXISTS integrations_cc_ad AFTER DELETE ON integrations BEGIN
+    UPDATE change_counters SET version = version + 1 WHERE table_name = 'integrations';
+END;
+
+CREATE TRIGGER IF NOT EXISTS rule_documents_cc_ai AFTER INSERT ON rule_documents BEGIN
+    UPDATE change_counters SET version = version + 1 WHERE table_name = 'rule_documents';
+END;
+CREATE TRIGGER IF NOT EXISTS rule_documents_cc_au AFTER UPDATE ON rule_documents BEGIN
+    UPDATE change_counters SET version = version + 1 WHERE table_name = 'rule_documents';
+END;
+CREATE TRIGGER IF NOT EXISTS rule_documents_cc_ad AFTER DELETE ON rule_documents BEGIN
+    UPDATE change_counters SET version = version + 1 WHERE table_name = 'rule_documents';
+END;
+
+-- Decision vectors are only bumped on update/delete: the in-memory index
+-- (helpers/vector_index.py) picks up inserts by decision_id and reloads on a bump.
+CREATE TRIGGER IF NOT EXISTS agent_decision_vectors_cc_au AFTER UPDATE ON agent_decision_vectors BEGIN
+    UPDATE change_counters SET version = version + 1 WHERE table_name = 'agent_decision_vectors';
+END;
+CREATE TRIGGER IF NOT EXISTS agent_decision_vectors_cc_ad AFTER DELETE ON agent_decision_vectors BEGIN
+    UPDATE change_counters SET version = version + 1 WHERE table_name = 'agent_decision_vectors';
+END;
+
+-- ============================================================================
+-- AGENT INTELLIGENCE COUNTERS (maintained by triggers)
+-- ============================================================================
+
+-- Per-workspace row counts for get_agent_intelligence() and view_agent_intelligence,
+-- so summaries are one primary-key read instead of COUNT(*) scans.
+-- workspace_key is workspace_id, or 0 for global (workspace_id IS NULL) rows.
+-- confident_knowledge_count counts facts with confidence >= 0.5 (recall_knowledge's default).
+CREATE TABLE IF NOT EXISTS agent_intelligence_counters (
+    workspace_key INTEGER PRIMARY KEY,
+    knowledge_count INTEGER NOT NULL DEFAULT 0,
+    confident_knowledge_count INTEGER NOT NULL DEFAULT 0,
+    decision_count INTEGER NOT NULL DEFAULT 0,
+    pattern_count INTEGER NOT NULL DEFAULT 0,
+    state_count INTEGER NOT NULL DEFAULT 0,
+    memory_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS agent_knowledge_ic_ai AFTER INSERT ON agent_knowledge BEGIN
+    INSERT INTO agent_intelligence_counters (workspace_key, knowledge_count, confident_knowledge_count)
+    VALUES (COALESCE(new.workspace_id, 0), 1, COALESCE(new.confidence >= 0.5, 0))
+    ON CONFLICT(workspace_key) DO UPDATE SET
+        knowledge_count = knowledge_count + excluded.knowledge_count,
+        confident_knowledge_count = confident_knowledge_count + excluded.confident_knowledge_count;
+END;
+CREATE TRIGGER IF NOT EXISTS agent_knowledge_ic_ad AFTER DELETE ON agent_knowledge BEGIN
+    INSERT INTO agent_intelligence_counters (workspace_key, knowledge_count, confident_knowledge_count)
+    VALUES (COALESCE(old.workspace_id, 0), -1, -COALESCE(old.confidence >= 0.5, 0))
+    ON CONFLICT(workspace_key) DO UPDATE SET
+        knowledge_count = knowledge_count + excluded.knowledge_count,
+        confident_knowledge_count = confident_knowledge_count + excluded.confident_knowledge_count;
+END;
+CREATE TRIGGER IF NOT EXISTS agent_knowledge_ic_au AFTER UPDATE OF workspace_id, confidence ON agent_knowledge BEGIN
+    INSERT INTO agent_intelligence_counters (workspace_key, knowledge_count, confident_knowledge_count)
+    VALUES (COALESCE(old.workspace_id, 0), -1, -COALESCE(old.confidence >= 0.5, 0))
+    ON CONFLICT(workspace_key) DO UPDATE SET
+        knowledge_count = knowledge_count + excluded.knowledge_count,
+        confident_knowledge_count = confident_knowledge_count + excluded.confident_knowledge_count;
+    INSERT INTO agent_intelligence_counters (workspace_key, knowledge_count, confident_knowledge_count)
+    VALUES (COALESCE(new.workspace_id, 0), 1, COALESCE(new.confidence >= 0.5, 0))
+    ON CONFLICT(workspace_key) DO UPDATE SET
+        knowledge_count = knowledge_count + excluded.knowledge_count,
+        confident_knowledge_count = confident_knowledge_count + excluded.confident_knowledge_count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS agent_decisions_ic_ai AFTER INSERT ON agent_decisions BEGIN
+    INSERT INTO agent_intelligence_counters (workspace_key, decision_count)
+    VALUES (COALESCE(new.workspace_id, 0), 1)
+    ON CONFLICT(workspace_key) DO UPDATE SET decision_count = decision_count + excluded.decision_count;
+END;
+CREATE TRIGGER IF NOT EXISTS agent_decisions_ic_ad AFTER DELETE ON agent_decisions BEGIN
+    INSERT INTO agent_intelligence_counters (workspace_key, decision_count)
+    VALUES (COALESCE(old.workspace_id, 0), -1)
+    ON CONFLICT(workspace_key) DO UPDATE SET decision_count = decision_count + excluded.decision_count;
+END;
+CREATE TRIGGER IF NOT EXISTS agent_decisions_ic_au AFTER UPDATE OF workspace_id ON agent_decisions BEGIN
+    INSERT INTO agent_intelligence_counters (workspace_key, decision_count)
+    VALUES (COALESCE(old.workspace_id, 0), -1)
+    ON CONFLICT(workspace_key) DO UPDATE SET decision_count = decision_count + excluded.decision_count;
+    INSERT INTO agent_intelligence_counters (workspace_key, decision_count)
+    VALUES (COALESCE(new.workspace_id, 0), 1)
+    ON CONFLICT(workspace_key) DO UPDATE SET decision_count = decision_count + excluded.decision_count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS agent_patterns_ic_ai AFTER INSERT ON agent_patterns BEGIN
+    INSERT INTO agent_intelligence_counters (workspace_key, pattern_count)
+    VALUES (COALESCE(new.workspace_id, 0), 1)
+    ON CONFLICT(workspace_key) DO UPDATE SET pattern_count = pattern_count + excluded.pattern_count;
+END;
+CREATE TRIGGER IF NOT EXISTS agent_patterns_ic_ad AFTER DELETE ON agent_patterns BEGIN
+    INSERT INTO agent_intelligence_counters (workspace_key, pattern_count)
+    VALUES (COALESCE(old.workspace_id, 0), -1)
+    ON CONFLICT(workspace_key) DO UPDATE SET pattern_count = pattern_count + excluded.pattern_count;
+END;
+CREATE TRIGGER IF NOT EXISTS agent_patterns_ic_au AFTER UPDATE OF workspace_id ON agent_patterns BEGIN
+    INSERT INTO agent_intelligence_counters (workspace_key, pattern_count)
+    VALUES (COALESCE(old.workspace_id, 0), -1)
+    ON CONFLICT(workspace_key) DO UPDATE SET pattern_count = pattern_count + excluded.pattern_count;
+    INSERT INTO agent_intelligence_counters (workspace_key, pattern_count)
+    VALUES (COALESCE(new.workspace_id, 0), 1)
+    ON CONFLICT(workspace_key) DO UPDATE SET pattern_count = pattern_count + excluded.pattern_count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS agent_state_ic_ai AFTER INSERT ON agent_state BEGIN
+    INSERT INTO agent_intelligence_counters (workspace_key, state_count)
+    VALUES (COALESCE(new.workspace_id, 0), 1)
+    ON CONFLICT(workspace_key) DO UPDATE SET state_count = state_count + excluded.state_count;
+END;
+CREATE TRIGGER IF NOT EXISTS agent_state_ic_ad AFTER DELETE ON agent_state BEGIN
+    INSERT INTO agent_intelligence_counters (workspace_key, state_count)
+    VALUES (COALESCE(old.workspace_id, 0), -1)
+    ON CONFLICT(workspace_key) DO UPDATE SET state_count = state_count + excluded.state_count;
+END;
+CREATE TRIGGER IF NOT EXISTS agent_state_ic_au AFTER UPDATE OF workspace_id ON agent_state BEGIN
+    INSERT INTO agent_intelligence_counters (workspace_key, state_count)
+    VALUES (COALESCE(old.workspace_id, 0), -1)
+    ON CONFLICT(workspace_key) DO UPDATE SET state_count = state_count + excluded.state_count;
+    INSERT INTO agent_intelligence_counters (workspace_key, state_count)
+    VALUES (COALESCE(new.workspace_id, 0), 1)
+    ON CONFLICT(workspace_key) DO UPDATE SET state_count = state_count + excluded.state_count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS agent_memories_ic_ai AFTER INSERT ON agent_memories BEGIN
+    INSERT INTO agent_intelligence_counters (workspace_key, memory_count)
+    VALUES (COALESCE(new.workspace_id, 0), 1)
+    ON CONFLICT(workspace_key) DO UPDATE SET memory_count = memory_count + excluded.memory_count;
+END;
+CREATE TRIGGER IF NOT EXISTS agent_memories_ic_ad AFTER DELETE ON agent_memories BEGIN
+    INSERT INTO agent_intelligence_counters (workspace_key, memory_count)
+    VALUES (COALESCE(old.workspace_id, 0), -1)
+    ON CONFLICT(workspace_key) DO UPDATE SET memory_count = memory_count + excluded.memory_count;
+END;
+CREATE TRIGGER IF NOT EXISTS agent_memories_ic_au AFTER UPDATE OF workspace_id ON agent_memories BEGIN
+    INSERT INTO agent_intelligence_counters (workspace_key, memory_count)
+    VALUES (COALESCE(old.workspace_id, 0), -1)
+    ON CONFLICT(workspace_key) DO UPDATE SET memory_count = memory_count + excluded.memory_count;
+    INSERT INTO agent_intelligence_counters (workspace_key, memory_count)
+    VALUES (COALESCE(new.workspace_id, 0), 1)
+    ON CONFLICT(workspace_key) DO UPDATE SET memory_count = memory_count + excluded.memory_count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS workspaces_ic_ad AFTER DELETE ON workspaces BEGIN
+    DELETE FROM agent_intelligence_counters WHERE workspace_key = old.id;
+END;
+
+-- ============================================================================
+-- FULL-TEXT SEARCH (FTS5, kept in sync by triggers)
+-- ============================================================================
+
+-- External-content indexes: text lives in the base tables, FTS holds only the index.
+-- Update triggers fire only on indexed columns, so usage counters don't touch FTS.
+
+-- Bulk loads (agent_brain.store_knowledge_many) insert a row here inside their own
+-- transaction, skip the per-row insert trigger, index the new rows with one
+-- INSERT ... SELECT and delete the row again before committing.
+CREATE TABLE IF NOT EXISTS fts_suspended (
+    table_name TEXT PRIMARY KEY
+) WITHOUT ROWID;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS agent_knowledge_fts USING fts5(
+    topic, fact, source,
+    content='agent_knowledge', content_rowid='id',
+    tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS agent_knowledge_fts_ai AFTER INSERT ON agent_knowledge
+WHEN NOT EXISTS (SELECT 1 FROM fts_suspended WHERE table_name = 'agent_knowledge') BEGIN
+    INSERT INTO agent_knowledge_fts (rowid, topic, fact, source)
+    VALUES (new.id, new.topic, new.fact, new.source);
+END;
+
+CREATE TRIGGER IF NOT EXISTS agent_knowledge_fts_ad AFTER DELETE ON agent_knowledge BEGIN
+    INSERT INTO agent_knowledge_fts (agent_knowledge_fts, rowid, topic, fact, source)
+    VALUES ('delete', old.id, old.topic, old.fact, old.source);
+END;
+
+CREATE TRIGGER IF NOT EXISTS agent_knowledge_fts_au AFTER UPDATE OF topic, fact, source ON agent_knowledge BEGIN
+    INSERT INTO agent_knowledge_fts (agent_knowledge_fts, rowid, topic, fact, source)
+    VALUES ('delete', old.id, old.topic, old.fact, old.source);
+    INSERT INTO agent_knowledge_fts (rowid, topic, fact, source)
+    VALUES (new.id, new.topic, new.fact, new.source);
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS agent_memories_fts USING fts5(
+    title, content, category,
+    content='agent_memories', content_rowid='id',
+    tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS agent_memories_fts_ai AFTER INSERT ON agent_memories BEGIN
+    INSERT INTO agent_memories_fts (rowid, title, content, category)
+    VALUES (new.id, new.title, new.content, new.category);
+END;
+
+CREATE TRIGGER IF NOT EXISTS agent_memories_fts_ad AFTER DELETE ON agent_memories BEGIN
+    INSERT INTO agent_memories_fts (agent_memories_fts, rowid, title, content, category)
+    VALUES ('delete', old.id, old.title, old.content, old.category);
+END;
+
+CREATE TRIGGER IF NOT EXISTS agent_memories_fts_au AFTER UPDATE OF title, content, category ON agent_memories BEGIN
+    INSERT INTO agent_memories_fts (agent_memories_fts, rowid, title, content, category)
+    VALUES ('delete', old.id, old.title, old.content, old.category);
+    INSERT INTO agent_memories_fts (rowid, title, content, category)
+    VALUES (new.id, new.title, new.content, new.category);
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_items_fts USING fts5(
+    title, snippet, source_id,
+    content='knowledge_items', content_rowid='id',
+    tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS knowledge_items_fts_ai AFTER INSERT ON knowledge_items BEGIN
+    INSERT INTO knowledge_items_fts (rowid, title, snippet, source_id)
+    VALUES (new.id, new.title, new.snippet, new.source_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS knowledge_items_fts_ad AFTER DELETE ON knowledge_items BEGIN
+    INSERT INTO knowledge_items_fts (knowledge_items_fts, rowid, title, snippet, source_id)
+    VALUES ('delete', old.id, old.title, old.snippet, old.source_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS knowledge_items_fts_au AFTER UPDATE OF title, snippet, source_id ON knowledge_items BEGIN
+    INSERT INTO knowledge_items_fts (knowledge_items_fts, rowid, title, snippet, source_id)
+    VALUES ('delete', old.id, old.title, old.snippet, old.source_id);
+    INSERT INTO knowledge_items_fts (rowid, title, snippet, source_id)
+    VALUES (new.id, new.title, new.snippet, new.source_id);
+END;
+
 -- ============================================================================
 -- VIEWS FOR COMMON QUERIES & INTROSPECTION
 -- ============================================================================
@@ -637,20 +963,23 @@ SELECT
 CREATE VIEW IF NOT EXISTS view_agent_intelligence AS
 SELECT
     w.id as workspace_id,
-    (SELECT COUNT(*) FROM agent_knowledge WHERE workspace_id = w.id) as knowledge_count,
-    (SELECT COUNT(*) FROM agent_decisions WHERE workspace_id = w.id) as decision_count,
-    (SELECT COUNT(*) FROM agent_patterns WHERE workspace_id = w.id) as pattern_count,
-    (SELECT COUNT(*) FROM agent_state WHERE workspace_id = w.id) as state_count,
-    (SELECT COUNT(*) FROM agent_memories WHERE workspace_id = w.id) as memory_count
+    COALESCE(c.knowledge_count, 0) as knowledge_count,
+    COALESCE(c.decision_count, 0) as decision_count,
+    COALESCE(c.pattern_count, 0) as pattern_count,
+    COALESCE(c.state_count, 0) as state_count,
+    COALESCE(c.memory_count, 0) as memory_count
 FROM workspaces w
+LEFT JOIN agent_intelligence_counters c ON c.workspace_key = w.id
 UNION ALL
 SELECT
     NULL as workspace_id,
-    (SELECT COUNT(*) FROM agent_knowledge WHERE workspace_id IS NULL) as knowledge_count,
-    (SELECT COUNT(*) FROM agent_decisions WHERE workspace_id IS NULL) as decision_count,
-    (SELECT COUNT(*) FROM agent_patterns WHERE workspace_id IS NULL) as pattern_count,
-    (SELECT COUNT(*) FROM agent_state WHERE workspace_id IS NULL) as state_count,
-    (SELECT COUNT(*) FROM agent_memories WHERE workspace_id IS NULL) as memory_count;
+    COALESCE(c.knowledge_count, 0) as knowledge_count,
+    COALESCE(c.decision_count, 0) as decision_count,
+    COALESCE(c.pattern_count, 0) as pattern_count,
+    COALESCE(c.state_count, 0) as state_count,
+    COALESCE(c.memory_count, 0) as memory_count
+FROM (SELECT 0 AS workspace_key) g
+LEFT JOIN agent_intelligence_counters c ON c.workspace_key = g.workspace_key;
 
 CREATE VIEW IF NOT EXISTS view_successful_patterns AS
 SELECT * FROM agent_patterns
@@ -8,7 +8,8 @@ import tempfile
 from pathlib import Path
 import pytest
 
-from helpers.db_helper import init_database, get_connection
+from helpers import db_helper
+from helpers.db_helper import init_database, get_connection, close_pool
 
 
 @pytest.fixture
@@ -33,6 +34,7 @@ def temp_db():
     yield db_path
     
     # Cleanup
+    close_pool(db_path)
     if db_path.exists():
         db_path.unlink()
 
@@ -49,3 +51,17 @@ def db_connection(temp_db):
     """
     with get_connection(temp_db) as conn:
         yield conn
+
+
+@pytest.fixture
+def use_temp_db(temp_db, monkeypatch):
+    """Point the module-level DB_PATH at the temporary database.
+    
+    Helpers that take no db_path argument resolve DB_PATH at call time,
+    so this routes them all to the temporary database.
+    
+    Yields:
+        Path: Path to temporary database file
+    """
+    monkeypatch.setattr(db_helper, "DB_PATH", temp_db)
+    yield temp_db
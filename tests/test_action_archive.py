@@ -0,0 +1,155 @@
+"""
+Tests for helpers.action_archive module.
+"""
+
+import sqlite3
+import pytest
+from helpers.action_archive import (
+    archive_action_log, archive_path, list_archives, drop_action_log_archives,
+    action_log_view, query_action_log
+)
+
+
+@pytest.fixture
+def action_db(temp_db, tmp_path, monkeypatch):
+    """Temporary database with actions spread over three months."""
+    monkeypatch.setenv("ACTION_LOG_ARCHIVE_DIR", str(tmp_path / "archive"))
+    conn = sqlite3.connect(str(temp_db))
+    conn.executemany(
+        "INSERT INTO action_log (workspace_id, timestamp, action_type, target, status) VALUES (NULL, ?, ?, ?, ?)",
+        [
+            ("2026-01-05 10:00:00", "edit", "a.py", "completed"),
+            ("2026-01-20 11:00:00", "edit", "b.py", "failed"),
+            ("2026-01-31 23:59:59", "run", "tests", "pending"),
+            ("2026-02-14 09:30:00", "run", "tests", "completed"),
+            ("2026-03-01 00:00:00", "edit", "c.py", "completed"),
+        ]
+    )
+    conn.execute("INSERT INTO checkpoints (action_id, checkpoint_type) VALUES (1, 'pre_modify')")
+    conn.commit()
+    conn.close()
+    return temp_db
+
+
+def _live(db_path):
+    conn = sqlite3.connect(str(db_path))
+    try:
+        return [row[0] for row in conn.execute("SELECT target FROM action_log ORDER BY id")]
+    finally:
+        conn.close()
+
+
+class TestArchiveActionLog:
+    """Moving whole months into archive files."""
+    
+    def test_archives_finished_actions_of_past_months(self, action_db):
+        moved = archive_action_log("2026-03", batch_size=1, db_path=action_db)
+        
+        assert moved == {"2026-01": 2, "2026-02": 1}
+        assert _live(action_db) == ["tests", "c.py"]  # pending action stays live
+        assert [a["month"] for a in list_archives(action_db)] == ["2026-01", "2026-02"]
+        
+        conn = sqlite3.connect(str(action_db))
+        assert conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0] == 0
+        conn.close()
+        
+        assert archive_action_log("2026-03", db_path=action_db) == {}
+    
+    def test_batch_already_in_archive_is_finished(self, action_db):
+        # Simulate a run interrupted between copying a batch and deleting it
+        path = archive_path("2026-02", action_db)
+        archive_action_log("2026-03", db_path=action_db)
+        conn = sqlite3.connect(str(action_db))
+        conn.execute(
+            "INSERT INTO action_log (id, timestamp, action_type, target, status) "
+            "VALUES (4, '2026-02-14 09:30:00', 'run', 'tests', 'completed')"
+        )
+        conn.commit()
+        conn.close()
+        
+        assert archive_action_log("2026-03", db_path=action_db) == {"2026-02": 1}
+        archive = sqlite3.connect(str(path))
+        assert archive.execute("SELECT COUNT(*) FROM action_log").fetchone()[0] == 1
+        archive.close()
+    
+    def test_rejects_bad_month(self, action_db):
+        with pytest.raises(ValueError):
+            archive_action_log("March", db_path=action_db)
+
+
+class TestArchivedQueries:
+    """Reading live and archived actions through the UNION view."""
+    
+    def test_query_spans_live_and_archived_months(self, action_db):
+        archive_action_log("2026-03", db_path=action_db)
+        
+        rows = query_action_log(db_path=action_db)
+        assert [r["target"] for r in rows] == ["c.py", "tests", "tests", "b.py", "a.py"]
+        
+        rows = query_action_log("2026-01-10", "2026-02-15", action_type="edit", db_path=action_db)
+        assert [r["target"] for r in rows] == ["b.py"]
+    
+    def test_view_attaches_only_months_in_range(self, action_db):
+        archive_action_log("2026-03", db_path=action_db)
+        
+        with action_log_view("2026-02-01", "2026-03-01", db_path=action_db) as conn:
+            attached = [row[1] for row in conn.execute("PRAGMA database_list")]
+            assert attached == ["main", "temp", "a0"]
+            assert conn.execute("SELECT COUNT(*) FROM action_log_all").fetchone()[0] == 3
+    
+    def test_drop_removes_whole_months(self, action_db):
+        archive_action_log("2026-03", db_path=action_db)
+        
+        assert drop_action_log_archives("2026-02", db_path=action_db) == ["2026-01"]
+        assert not archive_path("2026-01", action_db).exists()
+        assert [r["target"] for r in query_action_log(db_path=action_db)] == ["c.py", "tests", "tests"]
+    
+    def test_query_walks_more_archives_than_can_be_attached(self, action_db, monkeypatch):
+        """Archived months beyond SQLite's attach limit are read in groups, newest first."""
+        from helpers import action_archive
+        
+        conn = sqlite3.connect(str(action_db))
+        conn.executemany(
+            "INSERT INTO action_log (timestamp, action_type, target, status) VALUES (?, 'edit', ?, 'completed')",
+            [(f"2025-{month:02d}-15 12:00:00", f"2025-{month:02d}") for month in range(8, 13)]
+        )
+        conn.commit()
+        conn.close()
+        archive_action_log("2026-03", db_path=action_db)
+        assert len(list_archives(action_db)) == 7
+        
+        connect = action_archive._connect
+        
+        def connect_with_low_attach_limit(db_path):
+            conn = connect(db_path)
+            conn.setlimit(sqlite3.SQLITE_LIMIT_ATTACHED, 2)
+            return conn
+        
+        monkeypatch.setattr(action_archive, "_connect", connect_with_low_attach_limit)
+        rows = query_action_log(db_path=action_db)
+        assert [r["target"] for r in rows] == [
+            "c.py", "tests", "tests", "b.py", "a.py", "2025-12", "2025-11", "2025-10", "2025-09", "2025-08"
+        ]
+        with pytest.raises(ValueError):
+            with action_log_view(db_path=action_db):
+                pass
+        
+        # Older months are never opened once the limit is reached
+        archive_path("2025-08", action_db).write_bytes(b"not a database" * 100)
+        assert [r["target"] for r in query_action_log(limit=6, db_path=action_db)][-1] == "2025-12"
+        assert len(query_action_log("2025-09-01", db_path=action_db)) == 9
+        with pytest.raises(sqlite3.DatabaseError):
+            query_action_log(limit=None, db_path=action_db)
+    
+    def test_archive_paths_with_uri_characters(self, action_db, tmp_path, monkeypatch):
+        """Archive directories containing '?', '#' or '%' are attached as the real files."""
+        archive_dir = tmp_path / "odd ?#% dir"
+        monkeypatch.setenv("ACTION_LOG_ARCHIVE_DIR", str(archive_dir))
+        archive_action_log("2026-03", db_path=action_db)
+        
+        rows = query_action_log("2026-01-01", "2026-02-01", db_path=action_db)
+        assert [r["target"] for r in rows] == ["tests", "b.py", "a.py"]
+        assert sorted(p.name for p in archive_dir.iterdir()) == [
+            "action_log_2026_01.db", "action_log_2026_02.db"
+        ]
+        assert [p.name for p in tmp_path.iterdir()] == ["odd ?#% dir"]  # no stray literal-name files
@@ -87,3 +87,434 @@ class TestTemplateOperations:
         """Test listing all templates."""
         # Template test
         pass
+
+
+class TestConnectionPool:
+    """Test pooled connection behaviour behind get_connection."""
+    
+    def test_connection_is_reused(self, temp_db):
+        """Sequential calls on one thread reuse the same physical connection."""
+        from helpers.db_helper import get_connection, get_pool
+        
+        with get_connection(temp_db) as first:
+            pass
+        with get_connection(temp_db) as second:
+            pass
+        
+        assert first is second
+        stats = get_pool(temp_db).stats()
+        assert stats["created"] == 1
+        assert stats["affinity_hits"] >= 1
+    
+    def test_pragmas_applied(self, temp_db):
+        """Pooled connections carry the reliability PRAGMAs."""
+        from helpers.db_helper import get_connection
+        
+        with get_connection(temp_db) as conn:
+            assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    
+    def test_nested_connections_are_distinct(self, temp_db):
+        """A nested checkout on the same thread gets a different connection."""
+        from helpers.db_helper import get_connection
+        
+        with get_connection(temp_db) as outer:
+            with get_connection(temp_db) as inner:
+                assert inner is not outer
+    
+    def test_rollback_on_error(self, temp_db):
+        """Errors inside the block roll back and the connection stays usable."""
+        from helpers.db_helper import get_connection
+        
+        with pytest.raises(RuntimeError):
+            with get_connection(temp_db) as conn:
+                conn.execute("INSERT INTO workspaces (name) VALUES ('rolled_back')")
+                raise RuntimeError("boom")
+        
+        with get_connection(temp_db) as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM workspaces WHERE name = 'rolled_back'"
+            ).fetchone()
+            assert row[0] == 0
+    
+    def test_pool_is_bounded(self, temp_db):
+        """Checkout fails fast when every connection is in use."""
+        import sqlite3
+        from helpers.db_helper import ConnectionPool
+        
+        pool = ConnectionPool(temp_db, max_size=1, timeout=0.05)
+        conn = pool.acquire()
+        try:
+            with pytest.raises(sqlite3.OperationalError):
+                pool.acquire()
+        finally:
+            pool.release(conn)
+            pool.close()
+    
+    def test_permanent_open_errors_are_not_retried(self, tmp_path):
+        """Only lock contention is retried when opening a connection."""
+        import sqlite3
+        from helpers.db_helper import ConnectionPool, _CONNECT_RETRY
+        
+        pool = ConnectionPool(tmp_path / "missing" / "dexter.db", max_size=1)
+        retries = _CONNECT_RETRY.stats()["retries"]
+        with pytest.raises(sqlite3.OperationalError, match="unable to open"):
+            pool.acquire()
+        assert _CONNECT_RETRY.stats()["retries"] == retries
+        pool.close()
+    
+    def test_threads_share_pool(self, temp_db):
+        """Concurrent threads can write through the pool."""
+        import threading
+        from helpers.db_helper import get_connection
+        
+        def worker(n):
+            for i in range(20):
+                with get_connection(temp_db) as conn:
+                    conn.execute(
+                        "INSERT INTO workspaces (name) VALUES (?)", (f"ws_{n}_{i}",)
+                    )
+        
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        with get_connection(temp_db) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM workspaces").fetchone()[0] == 80
+
+
+class TestTransactionScope:
+    """Test the unit-of-work transaction() scope."""
+    
+    def test_helpers_share_one_commit(self, use_temp_db):
+        """Helper calls inside the scope reuse one connection and commit once."""
+        from helpers.db_helper import transaction
+        
+        with transaction() as tx:
+            workspace_id = create_workspace("batched")
+            add_rule(workspace_id, "core", "content")
+            add_integration(workspace_id, "github", "gh")
+        
+        assert tx.committed
+        assert tx.connection_calls == 3
+        assert tx.statements >= 3
+        assert tx.elapsed > 0
+        assert len(get_rules(workspace_id)) == 1
+        assert len(get_integrations(workspace_id)) == 1
+    
+    def test_error_rolls_back_whole_scope(self, use_temp_db):
+        """An exception discards every write made inside the scope."""
+        from helpers.db_helper import transaction
+        
+        with pytest.raises(RuntimeError):
+            with transaction():
+                create_workspace("discarded")
+                raise RuntimeError("abort")
+        
+        assert list_workspaces() == []
+    
+    def test_nested_scope_uses_savepoint(self, use_temp_db):
+        """A failing nested scope only undoes its own writes."""
+        from helpers.db_helper import transaction
+        
+        with transaction():
+            create_workspace("kept")
+            with pytest.raises(RuntimeError):
+                with transaction():
+                    create_workspace("undone")
+                    raise RuntimeError("inner failure")
+        
+        assert [w["name"] for w in list_workspaces()] == ["kept"]
+    
+    def test_rollback_callbacks_follow_savepoints(self, use_temp_db):
+        """on_rollback callbacks fire only for the work that was actually undone."""
+        from helpers.db_helper import transaction
+        
+        undone = []
+        with transaction() as tx:
+            tx.on_rollback(lambda: undone.append("outer"))
+            with transaction():
+                tx.on_rollback(lambda: undone.append("released"))
+            with pytest.raises(RuntimeError):
+                with transaction():
+                    tx.on_rollback(lambda: undone.append("inner"))
+                    raise RuntimeError("inner failure")
+        assert undone == ["inner"]
+        
+        with pytest.raises(RuntimeError):
+            with transaction() as tx:
+                tx.on_rollback(lambda: undone.append("outer"))
+                with transaction():
+                    tx.on_rollback(lambda: undone.append("released"))
+                raise RuntimeError("abort")
+        assert undone == ["inner", "released", "outer"]
+    
+    def test_reads_see_uncommitted_writes(self, use_temp_db):
+        """Reads inside the scope observe the scope's own pending writes."""
+        from helpers.db_helper import transaction
+        
+        with transaction():
+            set_preference("tab_size", "2")
+            assert get_preference("tab_size") == "2"
+
+
+class TestBufferedActionLog:
+    """Test the write-behind action_log writer."""
+    
+    @pytest.fixture
+    def writer(self, use_temp_db):
+        from helpers.db_helper import enable_buffered_action_log, disable_buffered_action_log
+        
+        writer = enable_buffered_action_log(flush_interval=60.0, id_block=4)
+        yield writer
+        disable_buffered_action_log()
+    
+    def _count_actions(self):
+        from helpers.db_helper import get_connection
+        with get_connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM action_log").fetchone()[0]
+    
+    def test_rows_are_queued_until_flush(self, writer):
+        """Rows are buffered in memory and written by flush()."""
+        from helpers.db_helper import log_action, flush_action_log
+        
+        ids = [log_action(None, "buffered", description=str(i)) for i in range(10)]
+        
+        assert self._count_actions() == 0
+        assert flush_action_log() == 10
+        assert self._count_actions() == 10
+        assert ids == sorted(set(ids))
+    
+    def test_reserved_ids_are_real(self, writer):
+        """Returned ids match the ids of the flushed rows."""
+        from helpers.db_helper import log_action, flush_action_log, get_connection
+        
+        action_id = log_action(None, "lookup", description="needle")
+        flush_action_log()
+        
+        with get_connection() as conn:
+            row = conn.execute(
+                "SELECT description FROM action_log WHERE id = ?", (action_id,)
+            ).fetchone()
+        assert row["description"] == "needle"
+    
+    def test_unbuffered_inserts_do_not_collide(self, writer):
+        """Direct inserts from other connections get ids beyond the reserved block."""
+        from helpers.db_helper import log_action, flush_action_log, get_connection
+        
+        buffered_id = log_action(None, "buffered")
+        with get_connection() as conn:
+            direct_id = conn.execute(
+                "INSERT INTO action_log (action_type) VALUES ('direct')"
+            ).lastrowid
+        flush_action_log()
+        
+        assert direct_id > buffered_id
+        assert self._count_actions() == 2
+    
+    def test_status_update_applies_to_queued_row(self, writer):
+        """Updating a queued row changes it in memory before it is written."""
+        from helpers.db_helper import (
+            log_action, update_action_status, flush_action_log, get_connection,
+        )
+        
+        action_id = log_action(None, "job", status="pending")
+        update_action_status(action_id, "completed")
+        flush_action_log()
+        update_action_status(action_id, "failed", description="late failure")
+        flush_action_log()
+        
+        with get_connection() as conn:
+            row = conn.execute(
+                "SELECT status, description FROM action_log WHERE id = ?", (action_id,)
+            ).fetchone()
+        assert row["status"] == "failed"
+        assert row["description"] == "late failure"
+    
+    def test_constraint_violation_drops_only_bad_row(self, writer):
+        """A row violating a foreign key is dropped; the rest of the batch is written."""
+        from helpers.db_helper import log_action, flush_action_log
+        
+        good = log_action(None, "good")
+        log_action(999999, "orphan")  # no such workspace
+        after = log_action(None, "after")
+        
+        assert flush_action_log() == 2
+        assert self._count_actions() == 2
+        assert writer.stats()["errors"] == 1
+        assert writer.stats()["queued"] == 0
+        
+        log_action(None, "later")
+        assert flush_action_log() == 1
+        assert after > good
+    
+    def test_flush_inside_transaction_uses_scope_connection(self, writer):
+        """Flushing inside transaction() writes on the scope and does not wait on its lock."""
+        from helpers.db_helper import log_action, flush_action_log, transaction, set_preference
+        
+        log_action(None, "queued")
+        with transaction():
+            set_preference("tab_size", "2")  # scope now holds the write lock
+            assert flush_action_log() == 1
+        assert self._count_actions() == 1
+        
+        queued = log_action(None, "undone")
+        with pytest.raises(RuntimeError):
+            with transaction():
+                set_preference("tab_size", "3")
+                assert flush_action_log() == 1
+                raise RuntimeError("abort")
+        assert writer.pending_status(queued) == "completed"
+        assert flush_action_log() == 1
+        assert self._count_actions() == 2
+    
+    def test_verification_reads_queued_rows_without_flushing(self, writer):
+        """Verifying and rolling back buffered actions leaves the queue to the writer."""
+        from helpers.db_helper import log_action, update_action_status, flush_action_log, get_connection
+        from helpers.reliability import ActionVerifier
+        
+        action_id = log_action(None, "job", status="in_progress")
+        assert not ActionVerifier.verify_action_completion(action_id)
+        update_action_status(action_id, "completed")
+        assert ActionVerifier.verify_action_completion(action_id)
+        assert self._count_actions() == 0
+        
+        checkpoint_id = ActionVerifier.create_checkpoint(action_id, "pre_modify", "{}")
+        assert checkpoint_id is not None
+        assert self._count_actions() == 1  # the checkpoint's foreign key needs the row
+        
+        update_action_status(action_id, "failed")
+        assert ActionVerifier.rollback_action(action_id, "restored")
+        assert writer.pending_status(action_id) == "cancelled"
+        flush_action_log()
+        
+        with get_connection() as conn:
+            row = conn.execute(
+                "SELECT status, rollback_info FROM action_log WHERE id = ?", (action_id,)
+            ).fetchone()
+        assert row["status"] == "cancelled"
+        assert row["rollback_info"] == "restored"
+    
+    def test_size_threshold_triggers_flush(self, use_temp_db):
+        """Reaching max_batch wakes the flush thread."""
+        import time
+        from helpers.db_helper import (
+            enable_buffered_action_log, disable_buffered_action_log, log_action,
+        )
+        
+        writer = enable_buffered_action_log(flush_interval=60.0, max_batch=5)
+        try:
+            for _ in range(5):
+                log_action(None, "burst")
+            deadline = time.time() + 2.0
+            while writer.stats()["flushed"] < 5 and time.time() < deadline:
+                time.sleep(0.01)
+            assert writer.stats()["flushed"] == 5
+        finally:
+            disable_buffered_action_log()
+
+
+class TestQueryCache:
+    """Test the read-through cache behind the configuration getters."""
+    
+    @pytest.fixture(autouse=True)
+    def fresh_stats(self):
+        from helpers.db_helper import get_query_cache
+        get_query_cache().reset_stats()
+    
+    def _table_stats(self, table):
+        from helpers.db_helper import get_query_cache
+        return get_query_cache().stats()["tables"].get(table, {})
+    
+    def test_repeated_reads_hit_cache(self, use_temp_db):
+        """A second identical read is served from memory."""
+        assert get_template("python_data")["project_type"] == "data"
+        assert get_template("python_data")["project_type"] == "data"
+        
+        stats = self._table_stats("templates")
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+    
+    def test_cached_results_are_copies(self, use_temp_db):
+        """Mutating a returned row does not corrupt the cache."""
+        get_template("python_data")["name"] = "mutated"
+        assert get_template("python_data")["name"] == "python_data"
+    
+    def test_setter_invalidates_only_its_key(self, use_temp_db):
+        """set_preference drops its own key and leaves others cached."""
+        workspace_id = create_workspace("prefs")
+        set_preference("theme", "dark", workspace_id=workspace_id)
+        set_preference("font", "mono", workspace_id=workspace_id)
+        get_preference("theme", workspace_id)
+        get_preference("font", workspace_id)
+        
+        set_preference("theme", "light", workspace_id=workspace_id)
+        
+        assert get_preference("theme", workspace_id) == "light"
+        assert get_preference("font", workspace_id) == "mono"
+        stats = self._table_stats("preferences")
+        assert stats["hits"] == 1
+        assert stats["misses"] == 3
+    
+    def test_add_rule_invalidates_rules(self, use_temp_db):
+        """add_rule makes the next get_rules reflect the new rule."""
+        workspace_id = create_workspace("rules")
+        assert get_rules(workspace_id) == []
+        add_rule(workspace_id, "core", "content")
+        assert len(get_rules(workspace_id)) == 1
+    
+    def test_external_writes_invalidate_table(self, use_temp_db):
+        """Writes from another connection are detected via change counters."""
+        import sqlite3
+        
+        assert get_template("python_data")["description"] == "Python data science"
+        
+        other = sqlite3.connect(str(use_temp_db))
+        other.execute("UPDATE templates SET description = 'edited' WHERE name = 'python_data'")
+        other.commit()
+        other.close()
+        
+        assert get_template("python_data")["description"] == "edited"
+    
+    def test_lru_eviction(self, use_temp_db):
+        """The cache never holds more than max_entries results."""
+        from helpers.db_helper import get_query_cache
+        
+        cache = get_query_cache()
+        old_max = cache.max_entries
+        cache.max_entries = 2
+        try:
+            for name in ("web_fullstack", "python_data", "api_backend"):
+                get_template(name)
+            assert cache.stats()["entries"] == 2
+            assert self._table_stats("templates")["evictions"] == 1
+        finally:
+            cache.max_entries = old_max
+
+
+class TestIterRuleDocuments:
+    """Test keyset-paginated rule document streaming."""
+    
+    def test_pages_resume_and_projection(self, use_temp_db):
+        """Pages are contiguous, resumable and only carry requested columns."""
+        from helpers.db_helper import get_connection, iter_rule_documents
+        
+        workspace_id = create_workspace("iter")
+        with get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO rule_documents (workspace_id, rule_file, content) VALUES (?, ?, ?)",
+                [(workspace_id if i % 2 else None, f"rule{i}.mdc", f"body {i}") for i in range(9)]
+            )
+        
+        docs = list(iter_rule_documents(workspace_id, columns=["rule_file"], batch_size=2))
+        assert [d["rule_file"] for d in docs] == ["rule1.mdc", "rule3.mdc", "rule5.mdc", "rule7.mdc"]
+        assert set(docs[0]) == {"id", "rule_file"}
+        
+        first = list(iter_rule_documents(None, limit=3, batch_size=2))
+        rest = list(iter_rule_documents(None, after_id=first[-1]["id"]))
+        assert [d["content"] for d in first + rest] == [f"body {i}" for i in range(0, 9, 2)]
+        
+        with pytest.raises(ValueError):
+            next(iter_rule_documents(None, columns=["content; DROP TABLE x"]))
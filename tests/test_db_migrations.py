@@ -0,0 +1,121 @@
+"""
+Tests for helpers.db_migrations module.
+"""
+
+import sqlite3
+import pytest
+from helpers import db_migrations
+from helpers.db_migrations import migrate, get_schema_version, SCHEMA_VERSION, Migration, _normalise
+from helpers.db_helper import init_database, create_workspace, get_workspace
+
+
+def _objects(db_path):
+    conn = sqlite3.connect(str(db_path))
+    try:
+        return {
+            (kind, name): _normalise(sql or "")
+            for kind, name, sql in conn.execute(
+                "SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'"
+            )
+        }
+    finally:
+        conn.close()
+
+
+def _make_legacy(db_path):
+    """Turn a fresh database into one that predates the migrations."""
+    conn = sqlite3.connect(str(db_path))
+    conn.executescript(
+        """
+        INSERT INTO workspaces (name) VALUES ('legacy');
+        INSERT INTO agent_knowledge (workspace_id, topic, fact, confidence)
+            VALUES (1, 'sqlite', 'WAL lets readers run alongside writers', 0.9), (NULL, 't', 'unsure', 0.1);
+        INSERT INTO agent_decisions (workspace_id, decision_type, decision) VALUES (1, 'query', 'add index');
+        DROP TABLE agent_intelligence_counters;
+        DROP TABLE agent_knowledge_fts;
+        DROP TRIGGER agent_knowledge_fts_ai;
+        DROP INDEX idx_knowledge_workspace_rank;
+        CREATE INDEX idx_knowledge_topic ON agent_knowledge(topic);
+        DROP VIEW view_agent_intelligence;
+        CREATE VIEW view_agent_intelligence AS SELECT id AS workspace_id FROM workspaces;
+        PRAGMA user_version = 0;
+        """
+    )
+    conn.close()
+
+
+class TestMigrate:
+    """Test versioned schema migrations."""
+    
+    def test_fresh_database_is_built_from_schema(self, tmp_path):
+        """An empty database gets schema.sql and the latest version; rerunning is a no-op."""
+        db_path = tmp_path / "fresh.db"
+        
+        result = migrate(db_path)
+        assert result["created"] and result["to_version"] == SCHEMA_VERSION
+        
+        again = migrate(db_path)
+        assert again == {"from_version": SCHEMA_VERSION, "to_version": SCHEMA_VERSION,
+                         "applied": [], "created": False}
+    
+    def test_legacy_database_converges_to_schema(self, tmp_path):
+        """Migrating an old database yields the same objects as a fresh one, data intact."""
+        fresh, legacy = tmp_path / "fresh.db", tmp_path / "legacy.db"
+        migrate(fresh)
+        migrate(legacy)
+        _make_legacy(legacy)
+        
+        result = migrate(legacy)
+        
+        assert len(result["applied"]) == SCHEMA_VERSION
+        assert _objects(legacy) == _objects(fresh)
+        conn = sqlite3.connect(str(legacy))
+        assert get_schema_version(conn) == SCHEMA_VERSION
+        assert conn.execute(
+            "SELECT rowid FROM agent_knowledge_fts WHERE agent_knowledge_fts MATCH 'readers'"
+        ).fetchall() == [(1,)]
+        assert conn.execute(
+            "SELECT workspace_key, knowledge_count, confident_knowledge_count, decision_count "
+            "FROM agent_intelligence_counters ORDER BY workspace_key"
+        ).fetchall() == [(0, 1, 0, 0), (1, 1, 1, 1)]
+        conn.close()
+    
+    def test_failed_migration_rolls_back(self, tmp_path, monkeypatch):
+        """A failing migration leaves schema and version untouched."""
+        db_path = tmp_path / "fail.db"
+        migrate(db_path)
+        before = _objects(db_path)
+        
+        def broken(conn, schema):
+            conn.execute("CREATE TABLE half_done (id INTEGER)")
+            raise sqlite3.OperationalError("boom")
+        
+        monkeypatch.setattr(db_migrations, "MIGRATIONS",
+                            db_migrations.MIGRATIONS + [Migration(SCHEMA_VERSION + 1, "broken", broken)])
+        with pytest.raises(sqlite3.OperationalError):
+            migrate(db_path, target=SCHEMA_VERSION + 1)
+        
+        assert _objects(db_path) == before
+        conn = sqlite3.connect(str(db_path))
+        assert get_schema_version(conn) == SCHEMA_VERSION
+        conn.close()
+    
+    def test_newer_database_is_refused(self, tmp_path):
+        """Code never runs against a schema it doesn't know."""
+        db_path = tmp_path / "newer.db"
+        migrate(db_path)
+        conn = sqlite3.connect(str(db_path))
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+        conn.close()
+        
+        with pytest.raises(RuntimeError):
+            migrate(db_path)
+    
+    def test_init_database_keeps_data(self, use_temp_db):
+        """Re-initialising an existing database no longer deletes it."""
+        workspace_id = create_workspace("kept")
+        
+        result = init_database(use_temp_db)
+        
+        assert result["applied"] == [] and not result["created"]
+        assert get_workspace(workspace_id)["name"] == "kept"
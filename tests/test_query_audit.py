@@ -0,0 +1,41 @@
+"""
+Tests for helpers.query_audit module.
+"""
+
+import sqlite3
+from helpers.query_audit import audit_queries, explain, plan_issues, _open_audit_db
+
+
+class TestQueryAudit:
+    """Test the EXPLAIN QUERY PLAN audit."""
+    
+    def test_schema_has_no_unexpected_findings(self):
+        """Every audited statement is an index walk (or explicitly allowed)."""
+        report = audit_queries()
+        
+        assert report["statements"] > 30
+        assert report["errors"] == []
+        assert report["findings"] == []
+    
+    def test_detects_sorts_and_scans(self):
+        """Temp B-trees and full scans are reported; index searches are not."""
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, a INTEGER, b TEXT)")
+        conn.execute("CREATE INDEX t_a ON t(a)")
+        
+        assert plan_issues(explain(conn, "SELECT * FROM t WHERE a = ?")) == []
+        issues = plan_issues(explain(conn, "SELECT * FROM t WHERE b > :b ORDER BY b"))
+        assert any("SCAN t" in i for i in issues)
+        assert any("TEMP B-TREE" in i for i in issues)
+    
+    def test_keyset_pages_are_index_walks(self):
+        """The iter_* page queries resume from the index without sorting."""
+        conn = _open_audit_db(None)
+        for table, where in [
+            ("agent_knowledge", "workspace_id IS ? AND confidence >= ? AND topic = ?"),
+            ("agent_patterns", "workspace_id IS ? AND success_rate >= ?"),
+            ("rule_documents", "workspace_id IS ?"),
+        ]:
+            sql = f"SELECT * FROM {table} WHERE {where} AND id > ? ORDER BY id LIMIT ?"
+            assert plan_issues(explain(conn, sql)) == [], table
+        conn.close()
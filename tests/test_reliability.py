@@ -0,0 +1,422 @@
+"""
+Tests for helpers.reliability module.
+"""
+
+import time
+import asyncio
+import sqlite3
+import multiprocessing
+import pytest
+from helpers.db_helper import create_workspace, get_connection, get_pool
+from helpers.reliability import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RateLimiter,
+    RateLimitError,
+    RecoveryStrategy,
+    RetryPolicy,
+    SharedRateLimiter,
+    circuit_breaker,
+    get_reliability_metrics,
+    is_transient_db_error,
+    log_execution_time,
+    rate_limit,
+    recover_from_error,
+    require_verification,
+    retry_with_backoff,
+)
+
+
+def _action_rows():
+    with get_connection() as conn:
+        return [
+            dict(row)
+            for row in conn.execute(
+                "SELECT action_type, status, description FROM action_log ORDER BY id"
+            )
+        ]
+
+
+class TestRequireVerification:
+    """Test audit logging done by require_verification."""
+    
+    @pytest.mark.parametrize("lean", [False, True])
+    def test_success_marks_completed(self, use_temp_db, lean):
+        """Successful calls end in 'completed' in both modes."""
+        workspace_id = create_workspace("audit")
+        
+        @require_verification(lean=lean)
+        def do_work(workspace_id):
+            return "done"
+        
+        assert do_work(workspace_id) == "done"
+        assert _action_rows() == [
+            {"action_type": "do_work", "status": "completed", "description": None}
+        ]
+    
+    @pytest.mark.parametrize("lean", [False, True])
+    def test_failure_marks_failed(self, use_temp_db, lean):
+        """Failing calls end in 'failed' with the error as description."""
+        workspace_id = create_workspace("audit")
+        
+        @require_verification(lean=lean)
+        def do_work(workspace_id):
+            raise ValueError("bad input")
+        
+        with pytest.raises(ValueError):
+            do_work(workspace_id)
+        assert _action_rows() == [
+            {"action_type": "do_work", "status": "failed", "description": "bad input"}
+        ]
+    
+    def test_bare_decorator_still_supported(self, use_temp_db):
+        """@require_verification without arguments keeps working."""
+        @require_verification
+        def do_work():
+            return 1
+        
+        assert do_work() == 1
+        assert _action_rows()[0]["status"] == "completed"
+    
+    def test_lean_uses_one_checkout(self, use_temp_db):
+        """Lean mode checks out a single pooled connection per call."""
+        @require_verification(lean=True)
+        def do_work():
+            return None
+        
+        do_work()
+        before = get_pool().stats()["checkouts"]
+        do_work()
+        assert get_pool().stats()["checkouts"] - before == 1
+    
+    def test_lean_with_buffered_writer(self, use_temp_db):
+        """With the buffered writer, lean mode needs no connection per call."""
+        from helpers.db_helper import enable_buffered_action_log, disable_buffered_action_log
+        
+        @require_verification(lean=True)
+        def do_work():
+            return None
+        
+        enable_buffered_action_log(flush_interval=60.0)
+        try:
+            do_work()
+            before = get_pool().stats()["checkouts"]
+            do_work()
+            assert get_pool().stats()["checkouts"] == before
+        finally:
+            disable_buffered_action_log()
+        
+        assert [row["status"] for row in _action_rows()] == ["completed", "completed"]
+
+
+class TestRateLimiter:
+    """Test the GCRA rate limiter."""
+    
+    def test_burst_then_limit(self):
+        """max_calls are admitted at once, the next one is refused."""
+        limiter = RateLimiter(max_calls=3, time_window=60)
+        
+        assert [limiter.try_acquire("api") for _ in range(4)] == [True, True, True, False]
+        assert limiter.try_acquire("other")
+        with pytest.raises(RateLimitError):
+            limiter.check_limit("api")
+    
+    def test_acquire_waits_for_refill(self):
+        """acquire blocks until a slot refills, or gives up at the timeout."""
+        limiter = RateLimiter(max_calls=2, time_window=0.2)
+        assert limiter.acquire("api") and limiter.acquire("api")
+        
+        assert not limiter.acquire("api", timeout=0.01)
+        start = time.monotonic()
+        assert limiter.acquire("api", timeout=1.0)
+        assert 0.05 <= time.monotonic() - start < 0.5
+    
+    def test_idle_keys_are_evicted(self):
+        """Keys whose bucket has refilled don't accumulate."""
+        limiter = RateLimiter(max_calls=10, time_window=0.01)
+        for i in range(RateLimiter.MIN_SWEEP_SIZE * 3):
+            limiter.try_acquire(f"key-{i}")
+            if i % 500 == 0:
+                time.sleep(0.02)
+        
+        assert len(limiter._tat) < RateLimiter.MIN_SWEEP_SIZE * 2
+    
+    def test_rate_limit_decorator(self):
+        """The decorator raises once the limit is used up."""
+        limiter = RateLimiter(max_calls=1, time_window=60)
+        
+        @rate_limit(limiter, "db_write")
+        def write():
+            return True
+        
+        assert write()
+        with pytest.raises(RateLimitError):
+            write()
+
+
+def _shared_worker(db_path, results):
+    limiter = SharedRateLimiter(max_calls=10, time_window=60, name="api_call", db_path=db_path)
+    results.put(sum(limiter.try_acquire("hubspot") for _ in range(10)))
+
+
+class TestSharedRateLimiter:
+    """Test the SQLite-backed cross-process limiter."""
+    
+    def test_limit_is_shared_across_processes(self, temp_db):
+        """Two processes together get max_calls, not max_calls each."""
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        workers = [ctx.Process(target=_shared_worker, args=(temp_db, results)) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=30)
+        
+        assert results.get(timeout=5) + results.get(timeout=5) == 10
+    
+    def test_plugs_into_rate_limit(self, temp_db):
+        """Shared limiters work with the rate_limit decorator and acquire()."""
+        limiter = SharedRateLimiter(max_calls=2, time_window=0.2, name="db_write", db_path=temp_db)
+        
+        @rate_limit(limiter, "db_write")
+        def write():
+            return True
+        
+        assert write() and write()
+        with pytest.raises(RateLimitError):
+            write()
+        assert limiter.acquire("db_write", timeout=1.0)
+        assert not SharedRateLimiter(2, 0.2, "db_write", temp_db).try_acquire("db_write")
+
+
+class TestAsyncDecorators:
+    """Test coroutine support in the reliability decorators."""
+    
+    def test_retry_with_asyncio_sleep(self, monkeypatch):
+        """Coroutines are retried and back off with asyncio.sleep."""
+        monkeypatch.setattr(time, "sleep", lambda _: pytest.fail("blocking sleep"))
+        attempts = []
+        
+        @retry_with_backoff(max_retries=2, initial_delay=0.01, exceptions=(ValueError,))
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ValueError("not yet")
+            return "ok"
+        
+        assert asyncio.run(flaky()) == "ok"
+        assert len(attempts) == 3
+    
+    def test_rate_limit_waits_asynchronously(self):
+        """An async rate-limited call waits for a slot instead of raising."""
+        limiter = RateLimiter(max_calls=1, time_window=0.1)
+        
+        @rate_limit(limiter, "api", wait=1.0)
+        async def call():
+            return time.monotonic()
+        
+        @rate_limit(limiter, "api")
+        async def call_nowait():
+            return True
+        
+        async def main():
+            first = await call()
+            with pytest.raises(RateLimitError):
+                await call_nowait()
+            return await call() - first
+        
+        assert asyncio.run(main()) >= 0.05
+    
+    def test_recover_and_log_execution_time(self):
+        """SKIP recovery and timing work for coroutines."""
+        @recover_from_error(strategy=RecoveryStrategy.SKIP)
+        @log_execution_time
+        async def broken():
+            raise RuntimeError("boom")
+        
+        assert asyncio.iscoroutinefunction(broken)
+        assert asyncio.run(broken()) is None
+    
+    @pytest.mark.parametrize("lean", [False, True])
+    def test_require_verification_async(self, use_temp_db, lean):
+        """Async calls get the same audit rows as sync ones."""
+        workspace_id = create_workspace("audit")
+        
+        @require_verification(lean=lean)
+        async def do_work(workspace_id):
+            await asyncio.sleep(0)
+            return "done"
+        
+        @require_verification(lean=lean)
+        async def fail_work(workspace_id):
+            raise ValueError("nope")
+        
+        assert asyncio.run(do_work(workspace_id)) == "done"
+        with pytest.raises(ValueError):
+            asyncio.run(fail_work(workspace_id))
+        
+        assert _action_rows() == [
+            {"action_type": "do_work", "status": "completed", "description": None},
+            {"action_type": "fail_work", "status": "failed", "description": "nope"},
+        ]
+
+    
+    def test_id_reservation_runs_off_the_event_loop(self, use_temp_db, monkeypatch):
+        """Buffered audit rows that need a new id block are logged from a worker thread."""
+        import threading
+        from helpers.db_helper import (
+            ActionLogWriter, enable_buffered_action_log, disable_buffered_action_log,
+        )
+        
+        reserving_threads = []
+        reserve = ActionLogWriter._reserve_ids
+        
+        def recording_reserve(writer):
+            reserving_threads.append(threading.current_thread())
+            reserve(writer)
+        
+        monkeypatch.setattr(ActionLogWriter, "_reserve_ids", recording_reserve)
+        
+        @require_verification(lean=True)
+        async def do_work(workspace_id):
+            return "done"
+        
+        async def main():
+            return [await do_work(None) for _ in range(5)]
+        
+        enable_buffered_action_log(flush_interval=60.0, id_block=2)
+        try:
+            assert asyncio.run(main()) == ["done"] * 5
+        finally:
+            disable_buffered_action_log()
+        
+        assert len(reserving_threads) == 3
+        assert threading.main_thread() not in reserving_threads
+
+
+class TestCircuitBreaker:
+    """Test circuit breaker state transitions."""
+    
+    def _guarded(self, breaker, outcomes):
+        @circuit_breaker(breaker, "hubspot")
+        def call():
+            if not outcomes.pop(0):
+                raise ConnectionError("down")
+            return "ok"
+        return call
+    
+    def test_opens_on_failure_rate_and_fails_fast(self):
+        """Once the failure rate is reached, calls are rejected without running."""
+        breaker = CircuitBreaker("test-open", failure_threshold=0.5, min_calls=4, reset_timeout=60)
+        outcomes = [True, False, True, False]
+        call = self._guarded(breaker, outcomes)
+        
+        assert call() == "ok"
+        for expected in (ConnectionError, None, ConnectionError):
+            if expected:
+                with pytest.raises(expected):
+                    call()
+            else:
+                call()
+        
+        assert breaker.state("hubspot") == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            call()
+        assert outcomes == []
+        assert breaker.state("tavily") == CircuitBreaker.CLOSED
+        assert breaker.metrics()["hubspot"]["rejected"] == 1
+    
+    def test_half_open_trial(self):
+        """After reset_timeout one trial call decides between closed and open."""
+        breaker = CircuitBreaker("test-half-open", min_calls=1, reset_timeout=0.05)
+        outcomes = [False, False, True]
+        call = self._guarded(breaker, outcomes)
+        
+        with pytest.raises(ConnectionError):
+            call()
+        time.sleep(0.06)
+        assert breaker.state("hubspot") == CircuitBreaker.HALF_OPEN
+        with pytest.raises(ConnectionError):
+            call()
+        assert breaker.state("hubspot") == CircuitBreaker.OPEN
+        
+        time.sleep(0.06)
+        assert call() == "ok"
+        assert breaker.state("hubspot") == CircuitBreaker.CLOSED
+    
+    def test_metrics_in_health_check(self):
+        """Breaker state is exported through get_reliability_metrics."""
+        breaker = CircuitBreaker("test-metrics", min_calls=1)
+        breaker.record_failure("tavily")
+        
+        metrics = get_reliability_metrics()["circuit_breakers"]["test-metrics"]
+        assert metrics["tavily"]["state"] == "open"
+        assert metrics["tavily"]["failure_rate"] == 1.0
+
+
+class TestRetryPolicy:
+    """Test jittered, deadline-aware retries."""
+    
+    @staticmethod
+    def _failing(errors):
+        def func():
+            if errors:
+                raise errors.pop(0)
+            return "ok"
+        return func
+    
+    def test_classification(self):
+        """Lock errors are retried, IntegrityError and other errors are not."""
+        attempts = []
+        policy = RetryPolicy(
+            max_attempts=3, base_delay=0.001, retry_on=(sqlite3.OperationalError,),
+            never_retry=(sqlite3.IntegrityError,), retry_if=is_transient_db_error,
+            on_attempt=lambda attempt, exc, delay: attempts.append(attempt),
+        )
+        
+        locked = sqlite3.OperationalError("database is locked")
+        assert policy.call(self._failing([locked, locked])) == "ok"
+        assert attempts == [1, 2]
+        
+        with pytest.raises(sqlite3.IntegrityError):
+            policy.call(self._failing([sqlite3.IntegrityError("UNIQUE constraint failed")]))
+        with pytest.raises(sqlite3.OperationalError):
+            policy.call(self._failing([sqlite3.OperationalError("no such table: x")]))
+        assert attempts == [1, 2, 1, 1]
+        assert policy.stats() == {
+            "calls": 3, "attempts": 5, "retries": 2, "successes": 1, "failures": 2
+        }
+    
+    @pytest.mark.parametrize("jitter", ["full", "decorrelated"])
+    def test_jitter_spreads_delays(self, jitter):
+        """Jittered delays vary and stay within max_delay."""
+        policy = RetryPolicy(base_delay=0.1, max_delay=1.0, jitter=jitter)
+        delays = [policy.next_delay(3, 0.4) for _ in range(50)]
+        
+        assert len(set(delays)) > 1
+        assert all(0 <= d <= 1.0 for d in delays)
+    
+    def test_deadline_stops_retries(self):
+        """A retry that would overrun the deadline is not attempted."""
+        policy = RetryPolicy(max_attempts=10, base_delay=0.2, jitter="none", deadline=0.3)
+        errors = [ValueError("x")] * 10
+        
+        start = time.monotonic()
+        with pytest.raises(ValueError):
+            policy.call(self._failing(errors))
+        
+        assert time.monotonic() - start < 0.3
+        assert len(errors) == 8
+    
+    def test_retry_with_backoff_never_retries_integrity_errors(self):
+        """retry_with_backoff keeps its signature and skips IntegrityError."""
+        calls = []
+        
+        @retry_with_backoff(max_retries=3, initial_delay=0.001)
+        def insert():
+            calls.append(1)
+            raise sqlite3.IntegrityError("UNIQUE constraint failed")
+        
+        with pytest.raises(sqlite3.IntegrityError):
+            insert()
+        assert len(calls) == 1
@@ -0,0 +1,106 @@
+"""
+Tests for helpers.rule_loader module.
+"""
+
+import pytest
+from helpers.db_helper import get_connection, create_workspace, transaction
+from helpers.rule_loader import get_rule_bundle, load_rules_for_context
+
+
+def _add_rule_document(rule_file, globs, content, title=None, workspace_id=None):
+    with get_connection() as conn:
+        conn.execute(
+            """
+            INSERT INTO rule_documents (workspace_id, rule_file, title, globs, content)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (workspace_id, rule_file, title or rule_file, globs, content)
+        )
+
+
+class TestRuleBundle:
+    """Test the compiled rules bundle."""
+    
+    def test_unfiltered_format(self, use_temp_db):
+        """Without a file path the full context keeps its original layout."""
+        assert load_rules_for_context() == "# No rules found in database\n"
+        
+        _add_rule_document("core.mdc", None, "Core rules", "Core")
+        
+        assert load_rules_for_context() == (
+            "# Dexter Workspace Rules\n"
+            "Loaded from database (rule_documents table)\n\n"
+            "## Core (core.mdc)\n\nCore rules\n\n---\n\n"
+        )
+    
+    def test_filter_by_file_path(self, use_temp_db):
+        """Only rules whose globs match the path (or have none) are included."""
+        _add_rule_document("core.mdc", None, "always")
+        _add_rule_document("python.mdc", '["**/*.py"]', "python only")
+        _add_rule_document("scripts.mdc", '["**/scripts/**", "*.sh"]', "scripts only")
+        
+        python_context = load_rules_for_context(file_path="helpers/db_helper.py")
+        assert "always" in python_context
+        assert "python only" in python_context
+        assert "scripts only" not in python_context
+        
+        assert "python only" in load_rules_for_context(file_path="setup.py")
+        
+        shell_context = load_rules_for_context(file_path="scripts/run.sh")
+        assert "scripts only" in shell_context
+        assert "python only" not in shell_context
+    
+    def test_rebuilt_only_on_change(self, use_temp_db):
+        """The bundle is reused until rule_documents changes."""
+        _add_rule_document("core.mdc", None, "v1")
+        
+        first = get_rule_bundle()
+        assert get_rule_bundle() is first
+        
+        with get_connection() as conn:
+            conn.execute("UPDATE rule_documents SET content = 'v2' WHERE rule_file = 'core.mdc'")
+        
+        second = get_rule_bundle()
+        assert second is not first
+        assert second.content_hash != first.content_hash
+        assert "v2" in second.render()
+    
+    def test_bundle_is_persisted(self, use_temp_db):
+        """Built bundles are stored in rule_bundles for reuse by other processes."""
+        _add_rule_document("core.mdc", None, "stored")
+        bundle = get_rule_bundle()
+        
+        with get_connection() as conn:
+            row = conn.execute(
+                "SELECT version, content_hash FROM rule_bundles WHERE workspace_key = 0"
+            ).fetchone()
+        
+        assert row["version"] == bundle.version
+        assert row["content_hash"] == bundle.content_hash
+    
+    def test_shared_bundle_does_not_mask_other_workspaces(self, use_temp_db):
+        """Workspaces sharing an identical bundle still see their own changes."""
+        workspace_a = create_workspace("a")
+        workspace_b = create_workspace("b")
+        
+        empty = get_rule_bundle(workspace_a)
+        assert get_rule_bundle(workspace_b) is empty  # same content, one shared bundle
+        
+        _add_rule_document("b.mdc", None, "only in b", workspace_id=workspace_b)
+        assert get_rule_bundle(workspace_a) is empty  # A rebuilds first at the new version
+        
+        assert "only in b" in load_rules_for_context(workspace_b)
+        assert load_rules_for_context(workspace_a) == "# No rules found in database\n"
+    
+    def test_rolled_back_rules_are_not_cached(self, use_temp_db):
+        """A bundle built inside a rolled-back transaction is never served afterwards."""
+        with pytest.raises(RuntimeError):
+            with transaction():
+                _add_rule_document("phantom.mdc", None, "PHANTOM")
+                assert "PHANTOM" in load_rules_for_context()
+                raise RuntimeError("abort")
+        
+        _add_rule_document("b.mdc", None, "rule B")  # same counter version as the rolled-back insert
+        context = load_rules_for_context()
+        assert "rule B" in context
+        assert "PHANTOM" not in context
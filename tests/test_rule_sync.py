@@ -0,0 +1,192 @@
+"""
+Tests for helpers.rule_sync module.
+"""
+
+import os
+import time
+import threading
+import pytest
+from helpers import rule_sync
+from helpers.db_helper import get_connection
+from helpers.rule_sync import (
+    sync_rules_from_database,
+    sync_rules_to_database,
+    reconcile_rules,
+    watch_rules,
+)
+
+
+@pytest.fixture
+def rules_dir(tmp_path, monkeypatch):
+    """Point RULES_DIR at a temporary directory."""
+    monkeypatch.setattr(rule_sync, "RULES_DIR", tmp_path)
+    return tmp_path
+
+
+RULE = '---\ndescription: Core rules\nglobs: ["**/*"]\n---\n\nBe careful.\n'
+
+
+class TestIncrementalSync:
+    """Test hash-based incremental sync in both directions."""
+    
+    def test_to_database_skips_unchanged(self, use_temp_db, rules_dir):
+        """Unchanged files are skipped and row ids survive edits."""
+        (rules_dir / "core.mdc").write_text(RULE, encoding="utf-8")
+        
+        assert sync_rules_to_database()["added"] == ["core.mdc"]
+        with get_connection() as conn:
+            row_id = conn.execute("SELECT id FROM rule_documents").fetchone()[0]
+        
+        assert sync_rules_to_database()["unchanged"] == ["core.mdc"]
+        
+        (rules_dir / "core.mdc").write_text(RULE.replace("careful", "bold"), encoding="utf-8")
+        assert sync_rules_to_database()["updated"] == ["core.mdc"]
+        
+        with get_connection() as conn:
+            row = conn.execute("SELECT id, content FROM rule_documents").fetchone()
+        assert row["id"] == row_id
+        assert row["content"] == "Be bold."
+    
+    def test_from_database_writes_only_changed(self, use_temp_db, rules_dir):
+        """Files are rewritten only when the rendered content differs."""
+        (rules_dir / "core.mdc").write_text(RULE, encoding="utf-8")
+        sync_rules_to_database()
+        
+        # Round-tripped content differs from the hand-written file once
+        first = sync_rules_from_database()
+        assert first["updated"] == ["core.mdc"]
+        mtime = os.stat(rules_dir / "core.mdc").st_mtime_ns
+        
+        assert sync_rules_from_database()["unchanged"] == ["core.mdc"]
+        assert os.stat(rules_dir / "core.mdc").st_mtime_ns == mtime
+        
+        with get_connection() as conn:
+            conn.execute("UPDATE rule_documents SET content = 'Changed.'")
+        summary = sync_rules_from_database()
+        assert summary["updated"] == ["core.mdc"]
+        assert (rules_dir / "core.mdc").read_text(encoding="utf-8").endswith("Changed.")
+        assert list(rules_dir.glob(".*.tmp")) == []
+    
+    def test_dry_run_writes_nothing(self, use_temp_db, rules_dir):
+        """Dry runs report the diff without touching files or the database."""
+        (rules_dir / "core.mdc").write_text(RULE, encoding="utf-8")
+        
+        assert sync_rules_to_database(dry_run=True)["added"] == ["core.mdc"]
+        with get_connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM rule_documents").fetchone()[0] == 0
+
+
+class TestReconcile:
+    """Test bidirectional reconciliation and watch mode."""
+    
+    def test_applies_each_side_delta(self, use_temp_db, rules_dir):
+        """File edits go to the database and database edits go to files."""
+        (rules_dir / "core.mdc").write_text(RULE, encoding="utf-8")
+        assert reconcile_rules()["to_db"] == ["core.mdc"]
+        assert reconcile_rules() == {"to_db": [], "to_files": [], "removed": [], "conflicts": []}
+        
+        with get_connection() as conn:
+            conn.execute("UPDATE rule_documents SET content = 'From db.'")
+        assert reconcile_rules()["to_files"] == ["core.mdc"]
+        assert (rules_dir / "core.mdc").read_text(encoding="utf-8").endswith("From db.")
+        
+        (rules_dir / "core.mdc").write_text(RULE.replace("careful", "quick"), encoding="utf-8")
+        assert reconcile_rules()["to_db"] == ["core.mdc"]
+        with get_connection() as conn:
+            assert conn.execute("SELECT content FROM rule_documents").fetchone()[0] == "Be quick."
+    
+    def test_conflict_detection(self, use_temp_db, rules_dir):
+        """Rules changed on both sides are reported and left alone unless preferred."""
+        (rules_dir / "core.mdc").write_text(RULE, encoding="utf-8")
+        reconcile_rules()
+        
+        with get_connection() as conn:
+            conn.execute("UPDATE rule_documents SET content = 'From db.'")
+        (rules_dir / "core.mdc").write_text(RULE.replace("careful", "quick"), encoding="utf-8")
+        
+        assert reconcile_rules()["conflicts"] == ["core.mdc"]
+        assert "quick" in (rules_dir / "core.mdc").read_text(encoding="utf-8")
+        
+        assert reconcile_rules(prefer="db")["to_files"] == ["core.mdc"]
+        assert (rules_dir / "core.mdc").read_text(encoding="utf-8").endswith("From db.")
+    
+    def test_deleted_rule_removes_file(self, use_temp_db, rules_dir):
+        """The database is the source of truth for deletions."""
+        (rules_dir / "core.mdc").write_text(RULE, encoding="utf-8")
+        reconcile_rules()
+        
+        (rules_dir / "core.mdc").unlink()
+        assert reconcile_rules()["to_files"] == ["core.mdc"]
+        
+        with get_connection() as conn:
+            conn.execute("DELETE FROM rule_documents")
+        assert reconcile_rules()["removed"] == ["core.mdc"]
+        assert not (rules_dir / "core.mdc").exists()
+    
+    @pytest.mark.parametrize("use_inotify", [True, False])
+    def test_watch_converges(self, use_temp_db, rules_dir, use_inotify):
+        """Watch mode picks up file and database changes without re-running."""
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=watch_rules,
+            kwargs={"interval": 0.05, "debounce": 0.05, "stop_event": stop, "use_inotify": use_inotify},
+        )
+        thread.start()
+        try:
+            (rules_dir / "core.mdc").write_text(RULE, encoding="utf-8")
+            assert _wait_for(lambda: _rule_content("core.mdc") == "Be careful.")
+            
+            with get_connection() as conn:
+                conn.execute("UPDATE rule_documents SET content = 'From db.'")
+            assert _wait_for(
+                lambda: (rules_dir / "core.mdc").read_text(encoding="utf-8").endswith("From db.")
+            )
+        finally:
+            stop.set()
+            thread.join(timeout=5)
+        assert not thread.is_alive()
+    
+    @pytest.mark.parametrize("use_inotify", [True, False])
+    def test_watch_keeps_changes_made_during_a_pass(self, use_temp_db, rules_dir,
+                                                    monkeypatch, use_inotify):
+        """An edit landing while reconcile_rules() runs gets its own pass."""
+        calls = []
+        
+        def reconcile_then_edit(*args):
+            summary = reconcile_rules(*args)
+            if not calls:
+                (rules_dir / "core.mdc").write_text(RULE + "Edited mid-pass.\n", encoding="utf-8")
+            calls.append(summary)
+            return summary
+        
+        (rules_dir / "core.mdc").write_text(RULE, encoding="utf-8")
+        monkeypatch.setattr(rule_sync, "reconcile_rules", reconcile_then_edit)
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=watch_rules,
+            kwargs={"interval": 0.05, "debounce": 0.05, "stop_event": stop, "use_inotify": use_inotify},
+        )
+        thread.start()
+        try:
+            assert _wait_for(lambda: _rule_content("core.mdc") == "Be careful.\nEdited mid-pass.")
+        finally:
+            stop.set()
+            thread.join(timeout=5)
+        assert not thread.is_alive()
+
+
+def _rule_content(rule_file):
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT content FROM rule_documents WHERE rule_file = ?", (rule_file,)
+        ).fetchone()
+    return row[0] if row else None
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
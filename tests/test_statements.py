@@ -0,0 +1,53 @@
+"""
+Tests for helpers.statements module.
+"""
+
+import sqlite3
+import pytest
+from helpers.statements import statement, get_statement, iter_statements, statement_stats
+from helpers.db_helper import create_workspace
+from helpers.agent_brain import store_knowledge, recall_knowledge
+
+
+class TestStatementRegistry:
+    """Test named statement registration and counters."""
+    
+    def test_registration_is_idempotent(self):
+        """Re-registering identical SQL returns the same statement."""
+        first = statement("test.one", "SELECT ?")
+        assert statement("test.one", """
+            SELECT ?
+        """) is first
+        assert get_statement("test.one") is first
+        with pytest.raises(ValueError):
+            statement("test.one", "SELECT 2")
+    
+    def test_counters(self):
+        """Calls and errors are counted per statement."""
+        stmt = statement("test.counted", "SELECT 1 / ?")
+        conn = sqlite3.connect(":memory:")
+        stmt.execute(conn, (1,))
+        stmt.execute(conn, (2,))
+        with pytest.raises(sqlite3.Error):
+            statement("test.broken", "SELECT * FROM missing").execute(conn)
+        
+        stats = statement_stats()
+        assert stats["test.counted"]["calls"] == 2
+        assert stats["test.broken"]["errors"] == 1
+        conn.close()
+    
+    def test_nullable_workspace_scoping(self, use_temp_db):
+        """One IS ? statement serves both workspace and global rows."""
+        workspace_id = create_workspace("stmts")
+        store_knowledge(workspace_id, "t", "scoped")
+        store_knowledge(None, "t", "global")
+        stmt = get_statement("agent_brain.knowledge")
+        before = stmt.calls
+        
+        assert [f["fact"] for f in recall_knowledge(workspace_id)] == ["scoped"]
+        assert [f["fact"] for f in recall_knowledge(None)] == ["global"]
+        assert stmt.calls == before + 2
+        assert {s.name for s in iter_statements("agent_brain.")} >= {
+            "agent_brain.knowledge", "agent_brain.patterns", "agent_brain.state_value"
+        }
+
@@ -0,0 +1,94 @@
+"""
+Tests for the chunked cleanup jobs in helpers.utils.
+"""
+
+import sqlite3
+import pytest
+from helpers.db_helper import close_pool
+from helpers.utils import (
+    chunked_delete, checkpoint_wal, incremental_vacuum,
+    cleanup_expired_contexts, cleanup_old_actions, cleanup_all
+)
+
+
+@pytest.fixture
+def cleanup_db(temp_db):
+    """Temporary database with expired/live contexts and old/recent actions."""
+    conn = sqlite3.connect(str(temp_db))
+    conn.executemany(
+        "INSERT INTO context (key, value, expires_at) VALUES (?, 'v', ?)",
+        [(f"expired_{i}", "2000-01-01 00:00:00") for i in range(25)]
+        + [(f"live_{i}", "2999-01-01 00:00:00") for i in range(5)]
+        + [("permanent", None)]
+    )
+    conn.executemany(
+        "INSERT INTO action_log (timestamp, action_type, status) VALUES (?, 'edit', ?)",
+        [("2000-01-01 00:00:00", "completed")] * 12
+        + [("2000-01-01 00:00:00", "failed"), ("2999-01-01 00:00:00", "completed")]
+    )
+    conn.execute("INSERT INTO checkpoints (action_id, checkpoint_type) VALUES (1, 'backup')")
+    conn.commit()
+    conn.close()
+    return temp_db
+
+
+def _count(db_path, table):
+    conn = sqlite3.connect(str(db_path))
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class TestChunkedCleanup:
+    """Bounded-batch deletes and maintenance steps."""
+    
+    def test_chunked_delete_reports_batches(self, cleanup_db):
+        report = chunked_delete(
+            "context", "expires_at < ?", ("2001-01-01",), batch_size=10, pause=0, db_path=cleanup_db
+        )
+        
+        assert report["deleted"] == 25
+        assert report["batches"] == 3
+        assert report["rows_per_second"] > 0
+        assert _count(cleanup_db, "context") == 6
+        
+        assert chunked_delete("context", "expires_at < ?", ("2001-01-01",), db_path=cleanup_db)["deleted"] == 0
+    
+    def test_cleanup_jobs_keep_live_rows(self, cleanup_db):
+        assert cleanup_expired_contexts(batch_size=7, db_path=cleanup_db) == 25
+        assert cleanup_old_actions(days=30, batch_size=5, db_path=cleanup_db) == 12
+        assert _count(cleanup_db, "context") == 6
+        assert _count(cleanup_db, "action_log") == 2
+        assert _count(cleanup_db, "checkpoints") == 0  # cascades like a single DELETE
+    
+    def test_cleanup_all_checkpoints_wal(self, cleanup_db, capsys):
+        report = cleanup_all(days=30, vacuum=True, batch_size=4, db_path=cleanup_db)
+        
+        assert report["contexts"]["deleted"] == 25
+        assert report["actions"]["deleted"] == 12
+        assert report["checkpoint"]["busy"] == 0
+        assert report["vacuum"]["enabled"] is False
+        assert "rows/s" in capsys.readouterr().out
+    
+    def test_incremental_vacuum_frees_pages(self, tmp_path):
+        db_path = tmp_path / "vacuum.db"
+        conn = sqlite3.connect(str(db_path))
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("CREATE TABLE blobs (data BLOB)")
+        conn.executemany("INSERT INTO blobs VALUES (zeroblob(4096))", [()] * 50)
+        conn.commit()
+        conn.execute("DELETE FROM blobs")
+        conn.commit()
+        conn.close()
+        
+        report = incremental_vacuum(pages_per_step=8, pause=0, db_path=db_path)
+        
+        assert report["enabled"] is True
+        assert report["freed_pages"] >= 50
+        assert checkpoint_wal("truncate", db_path=db_path)["busy"] == 0
+        close_pool(db_path)
+    
+    def test_rejects_unknown_checkpoint_mode(self, cleanup_db):
+        with pytest.raises(ValueError):
+            checkpoint_wal("EVERYTHING", db_path=cleanup_db)